@@ -4,4 +4,4 @@ popd
 
 CALL pipenv install
 mkdir build
-CALL pipenv run python ./src/parse.py
\ No newline at end of file
+CALL pipenv run python ./src/cli.py build
\ No newline at end of file
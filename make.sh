@@ -4,4 +4,4 @@ popd
 
 pipenv install
 mkdir -p build
-pipenv run python ./src/parse.py
\ No newline at end of file
+pipenv run python ./src/cli.py build
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""Versioned bundles for a range of upstream commits.
+
+Every commit is read straight from the git object database: its tree is
+listed with a single ``git ls-tree`` call and the documents are read as
+blobs, so no worktree is checked out. A document is extracted once per blob
+hash, later commits that did not change it reuse the record. The history of
+the newest commit is logged once, and the file dates of every older commit
+are replayed from it. The commits are split into consecutive chunks built in
+parallel.
+"""
+
+import copy
+import logging
+import time
+from functools import partial
+from pathlib import Path
+
+import git
+from bundle_io import write_bundle
+from cache import DocumentCache
+from constants import BUILD_PATH, INDEX_PATH, TMFK_PATH, Mode, ModeEnumAttribute
+from git_tools import GitHistoryIndex, GitLog, RepoContext
+from joblib import Parallel, delayed
+from parallel import extract_contents
+from parse import (
+    assemble_model,
+    build_collection,
+    build_tmfk,
+    list_documents,
+    stamp_dates,
+)
+from release_index import check_compressions, regenerate_index
+from serialization import canonical_json
+
+logger = logging.getLogger(__name__)
+
+
+class CommitTree:
+    """Folders and blobs of the documents of a commit."""
+
+    def __init__(self, repo: RepoContext, root: Path, rev: str) -> None:
+        self.repo = repo
+        self.root = Path(root)
+        self.blobs: dict[str, str] = {}
+        self.folders: dict[str, set[str]] = {}
+
+        output = repo.repo.git.ls_tree("-r", "-z", "--full-tree", rev, "docs")
+        for entry in filter(None, output.split("\0")):
+            info, path = entry.split("\t", 1)
+            _, kind, sha = info.split()
+            if kind != "blob":
+                continue
+            self.blobs[path] = sha
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                folder = "/".join(parts[:depth])
+                self.folders.setdefault(folder, set()).add(parts[depth])
+
+    def _relative(self, path: Path) -> str:
+        return Path(path).relative_to(self.root).as_posix()
+
+    def listdir(self, path: Path) -> list[str]:
+        try:
+            return sorted(self.folders[self._relative(path)])
+        except KeyError:
+            raise FileNotFoundError(path)
+
+    def blob(self, path: Path) -> str:
+        return self.blobs.get(self._relative(path))
+
+    def read(self, sha: str) -> str:
+        return self.repo.read_blob(sha)
+
+
+def bundle_paths(
+    output_path: Path, modes: list[ModeEnumAttribute], commit_hash: str
+) -> list[Path]:
+    return [
+        output_path / f"tmfk_{mode.name.lower()}_{commit_hash}.json" for mode in modes
+    ]
+
+
+def build_commit(
+    repo: RepoContext,
+    tmfk_path: Path,
+    rev: str,
+    modes: list[ModeEnumAttribute],
+    output_path: Path,
+    records_by_blob: dict,
+    cache: DocumentCache = None,
+    log: GitLog = None,
+) -> int:
+    """Write the bundles of the commit ``rev``.
+
+    File dates are replayed from ``log`` when its history contains ``rev``.
+
+    Returns
+    -------
+    int
+        number of documents extracted, the others were reused
+    """
+    tree = CommitTree(repo, tmfk_path, rev)
+    jobs = [
+        job
+        for job in list_documents(tmfk_path, listdir=tree.listdir)
+        if tree.blob(job.file_path) is not None
+    ]
+    keys = [(job.kind, tree.blob(job.file_path)) for job in jobs]
+
+    pending = [i for i, key in enumerate(keys) if key not in records_by_blob]
+    extracted = extract_contents(
+        [jobs[i] for i in pending],
+        [tree.read(keys[i][1]) for i in pending],
+        cache=cache,
+    )
+    for i, record in zip(pending, extracted):
+        records_by_blob[keys[i]] = record
+
+    # Dates are stamped on copies, they differ from one commit to the next.
+    records = [copy.copy(records_by_blob[key]) for key in keys]
+    stamp_dates(jobs, records, GitHistoryIndex(repo_path=repo.repo, rev=rev, log=log))
+    model = assemble_model(jobs, records, tmfk_path, rev=rev, repo=repo)
+
+    for mode, path in zip(modes, bundle_paths(output_path, modes, model.commit_hash)):
+        write_bundle(
+            path=path,
+            objects=build_tmfk(model, mode),
+            head=partial(build_collection, model=model, mode=mode),
+            serialize=canonical_json,
+        )
+    return len(pending)
+
+
+def backfill_chunk(
+    tmfk_path: Path,
+    revs: list[str],
+    modes: list[ModeEnumAttribute],
+    output_path: Path,
+    use_cache: bool = True,
+    force: bool = False,
+    tip: str = None,
+) -> dict:
+    """Build consecutive commits in one process, sharing extracted records.
+
+    ``tip`` is a commit whose history contains every commit of ``revs``, the
+    last one by default; its history is logged once for the whole chunk.
+    """
+    repo = RepoContext(tmfk_path)
+    log = None
+    cache = DocumentCache(path=output_path / ".cache", enabled=use_cache)
+    records_by_blob = {}
+    stats = {"built": 0, "skipped": 0, "failed": [], "documents": 0, "extracted": 0}
+
+    for rev in revs:
+        paths = bundle_paths(output_path, modes, rev[:7])
+        if not force and all(path.exists() for path in paths):
+            stats["skipped"] += 1
+            continue
+        try:
+            if log is None:
+                log = GitLog(repo.repo, tip or revs[-1])
+            extracted = build_commit(
+                repo, tmfk_path, rev, modes, output_path, records_by_blob, cache, log
+            )
+        except Exception as e:
+            stats["failed"].append((rev[:7], f"{type(e).__name__}: {e}"))
+            continue
+        stats["built"] += 1
+        stats["extracted"] += extracted
+
+    repo.close()
+    stats["documents"] = len(records_by_blob)
+    return stats
+
+
+def backfill(
+    rev_range: str = "main",
+    modes: list[ModeEnumAttribute] = tuple(Mode),
+    tmfk_path: Path = TMFK_PATH,
+    output_path: Path = BUILD_PATH,
+    use_cache: bool = True,
+    workers: int = 1,
+    force: bool = False,
+    index_path: Path = INDEX_PATH,
+    compressions: list[str] = (),
+) -> None:
+    """Write the versioned bundles of every commit of ``rev_range``.
+
+    ``index_path`` is then regenerated from the versioned bundles.
+
+    Parameters
+    ----------
+    rev_range : str
+        commits to build, as given to ``git rev-list``, such as ``a1b2c3d..main``
+    workers : int
+        number of processes, ``-1`` uses every core
+    force : bool
+        rebuild commits whose bundles already exist
+    compressions : list[str]
+        ``gz`` and ``zst``, the precompressed siblings of the bundles
+    """
+    check_compressions(compressions)
+    started = time.perf_counter()
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+    revs = git.Repo(tmfk_path).git.rev_list("--reverse", rev_range).split()
+
+    if workers == 1 or len(revs) < 2:
+        chunks = [revs]
+    else:
+        count = min(len(revs), Parallel(n_jobs=workers).n_jobs)
+        chunks = [
+            revs[i * len(revs) // count : (i + 1) * len(revs) // count]
+            for i in range(count)
+        ]
+    job = partial(
+        backfill_chunk,
+        tmfk_path,
+        modes=modes,
+        output_path=output_path,
+        use_cache=use_cache,
+        force=force,
+        tip=revs[-1] if revs else None,
+    )
+    if len(chunks) == 1:
+        results = [job(chunks[0])]
+    else:
+        results = Parallel(n_jobs=len(chunks))(delayed(job)(chunk) for chunk in chunks)
+
+    for rev, error in sum((result["failed"] for result in results), []):
+        logger.warning("Could not build commit %s: %s", rev, error)
+    logger.info(
+        "Backfilled %d commits in %.3fs (%d already built, %d failed); "
+        "%d documents extracted from %d distinct blobs",
+        sum(result["built"] for result in results),
+        time.perf_counter() - started,
+        sum(result["skipped"] for result in results),
+        sum(len(result["failed"]) for result in results),
+        sum(result["extracted"] for result in results),
+        sum(result["documents"] for result in results),
+    )
+    regenerate_index(index_path, output_path, compressions)
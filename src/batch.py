@@ -0,0 +1,151 @@
+"""Bulk construction of STIX objects sharing most of their properties.
+
+Building a ``stix2`` object checks every property, even when thousands of
+relationships share all of them but their ends. :class:`BatchFactory`
+validates the shared properties once, on the first object, and afterwards
+cleans only the properties that differ from one object to the next. The
+objects are the same as the ones built by the class itself.
+
+The fast path writes the private state of ``stix2`` objects. That state is
+checked once at import time, on a throwaway object; when it moved, as it may
+in another ``stix2`` release, every object is built by its class.
+"""
+
+import logging
+import time
+
+from stix2 import __version__ as STIX2_VERSION
+from stix2.utils import NOW
+from stix2.v21 import Identity
+
+logger = logging.getLogger(__name__)
+
+
+def has_expected_internals() -> bool:
+    """Whether ``stix2`` objects keep their state where :class:`BatchFactory`
+    writes it."""
+    try:
+        probe = Identity(name="probe", identity_class="system")
+        cleaned = Identity._properties["name"].clean("probe", False)
+    except Exception:
+        return False
+    return (
+        isinstance(getattr(probe, "_inner", None), dict)
+        and isinstance(getattr(probe, "_defaulted_optional_properties", None), list)
+        and hasattr(probe, "_STIXBase__now")
+        and hasattr(probe, "_STIXBase__has_custom")
+        and cleaned == ("probe", False)
+    )
+
+
+FAST_PATH = has_expected_internals()
+if not FAST_PATH:
+    logger.warning(
+        "Unexpected internals in stix2 %s, objects are built one by one",
+        STIX2_VERSION,
+    )
+
+
+class BatchFactory:
+    """Objects of ``cls`` built from ``shared`` properties.
+
+    Parameters
+    ----------
+    cls : type
+        ``stix2`` object class
+    name : str
+        name of the objects in the throughput report
+    shared : dict
+        properties common to every object
+    """
+
+    def __init__(self, cls: type, name: str = None, **shared) -> None:
+        self.cls = cls
+        self.name = name or cls.__name__
+        self.shared = shared
+        self.count = 0
+        self.seconds = 0.0
+        self._prototype = None
+        self._varying = None
+        self._defaulted = ()
+
+    def _clean(self, name: str, value):
+        value, has_custom = self.cls._properties[name].clean(value, False)
+        if has_custom:
+            raise ValueError(f"custom content in {name} of {self.cls.__name__}")
+        return value
+
+    def _has_constant_default(self, name: str) -> bool:
+        prop = self.cls._properties.get(name)
+        if hasattr(prop, "_fixed_value"):
+            return True
+        default = getattr(prop, "default", None)
+        if default is None:
+            return False
+        value = default()
+        return value is not NOW and value == default()
+
+    def _is_default(self, name: str, value) -> bool:
+        prop = self.cls._properties[name]
+        if prop.required or hasattr(prop, "_fixed_value"):
+            return False
+        default = getattr(prop, "default", None)
+        return default is not None and default() == value
+
+    def build(self, **properties):
+        """Build one object from the properties it does not share."""
+        started = time.perf_counter()
+        try:
+            return self._build(properties)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+    def _build(self, properties: dict):
+        prototype = self._prototype
+        if (
+            not FAST_PATH
+            or prototype is None
+            or properties.keys() != self._varying
+            or any(value in (None, []) for value in properties.values())
+        ):
+            obj = self.cls(**self.shared, **properties)
+            if prototype is None:
+                self._prototype = obj
+                # Values generated by the class, such as ids and timestamps,
+                # must be given for every object, or they would be copied.
+                self._varying = {
+                    name
+                    for name in obj._inner
+                    if name in properties
+                    or name not in self.shared
+                    and not self._has_constant_default(name)
+                }
+                self._defaulted = tuple(
+                    name
+                    for name in obj._defaulted_optional_properties
+                    if name not in self._varying
+                )
+            return obj
+
+        cleaned = {name: self._clean(name, value) for name, value in properties.items()}
+        obj = object.__new__(self.cls)
+        obj._inner = {
+            name: cleaned.get(name, value) for name, value in prototype._inner.items()
+        }
+        obj._defaulted_optional_properties = list(self._defaulted) + [
+            name for name, value in cleaned.items() if self._is_default(name, value)
+        ]
+        obj._STIXBase__now = prototype._STIXBase__now
+        obj._STIXBase__has_custom = False
+        return obj
+
+    def log_throughput(self) -> None:
+        if self.count:
+            logger.info(
+                "Built %d %s in %.3fs (%.0f/s)",
+                self.count,
+                self.name,
+                self.seconds,
+                self.count / self.seconds if self.seconds else float("inf"),
+            )
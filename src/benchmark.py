@@ -0,0 +1,322 @@
+"""Benchmark of the build pipeline on synthetic upstream repositories.
+
+:func:`generate_upstream` writes a git repository shaped like
+Threat-Matrix-for-Kubernetes with a given number of techniques, mitigations
+and commits. :func:`run_benchmark` builds both modes from it and times every
+stage of the pipeline separately.
+
+The suite sweeps the upstream size at a fixed history depth, then the history
+depth at a fixed size, and writes the timings as JSON::
+
+    python src/benchmark.py --sizes 50,200,800 --depths 10,100,1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import git
+from bundle_io import write_bundle
+from constants import BUILD_PATH, TMFK_TACTICS_MAP, Mode
+from git_tools import GitHistoryIndex
+from parallel import extract_documents
+from parse import (
+    assemble_model,
+    build_collection,
+    build_tmfk,
+    list_documents,
+    stamp_dates,
+)
+from serialization import SerializationCache
+
+STAGES = [
+    "git_index",
+    "git_lookups",
+    "markdown",
+    "stix_objects",
+    "collection",
+    "serialization",
+]
+
+FIRST_COMMIT_DATE = int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp())
+COMMIT_INTERVAL = 3600
+
+ATTACK_TECHNIQUES = ["T1078.004", "T1609", "T1610", "T1611", "T1552.001"]
+ATTACK_MITIGATIONS = ["M1026", "M1035", "M1042", "M1047"]
+
+
+def display_name(tactic_name: str) -> str:
+    return " ".join(
+        re.sub("([A-Z][a-z]+)", r" \1", re.sub("([A-Z]+)", r" \1", tactic_name)).split()
+    )
+
+
+def tactic_document(tactic_name: str) -> str:
+    return (
+        f"# {display_name(tactic_name)}\n\n"
+        f"ID: {TMFK_TACTICS_MAP[tactic_name]}\n\n"
+        f"The {display_name(tactic_name).lower()} tactic consists of techniques "
+        "that attackers use to reach their goal.\n"
+    )
+
+
+def technique_document(index: int, rnd: random.Random) -> str:
+    tactics = rnd.sample(list(TMFK_TACTICS_MAP), rnd.choice([1, 1, 2]))
+    links = ", ".join(
+        f"[{display_name(tactic)}](../tactics/{tactic}/index.md)" for tactic in tactics
+    )
+    attack = ", ".join(
+        f"[{t}](https://attack.mitre.org/techniques/{t.replace('.', '/')}/)"
+        for t in rnd.sample(ATTACK_TECHNIQUES, rnd.choice([0, 1, 2]))
+    )
+    if attack:
+        links += f"<br>\nMITRE technique: {attack}"
+    return (
+        f"# Technique {index}\n\n"
+        "!!! info inline end\n\n"
+        f"ID: MS-TA9{index:03d}<br>\n"
+        f"Tactic: {links}\n\n"
+        f"Attackers use technique {index} to run `kubectl exec` inside pods.\n\n"
+        "A second paragraph describes the technique in more detail.\n"
+    )
+
+
+def mitigation_document(
+    mitigation_id: str, index: int, techniques: int, rnd: random.Random, parent=None
+) -> str:
+    attack = [
+        f"[{m}](https://attack.mitre.org/mitigations/{m}/)"
+        for m in rnd.sample(ATTACK_MITIGATIONS, rnd.choice([0, 1]))
+    ]
+    if parent is not None:
+        attack.append(f"[{parent}](../{parent}.md)")
+    rows = "\n".join(
+        f"| [MS-TA9{t:03d}](../techniques/Technique%20{t}.md) | Technique {t} | use |"
+        for t in sorted(rnd.sample(range(techniques), min(techniques, 3)))
+    )
+    return (
+        f"# Mitigation {index}\n\n"
+        "!!! info inline end\n\n"
+        f"ID: {mitigation_id}<br>\n"
+        f"MITRE mitigation: {', '.join(attack) or '-'}\n\n"
+        f"Mitigation {index} restricts what attackers can do. More text here.\n\n"
+        "## Techniques Addressed by Mitigation\n\n"
+        "| ID | Name | Use |\n|--|--|--|\n"
+        f"{rows}\n"
+    )
+
+
+def generate_upstream(
+    path: Path, techniques: int, mitigations: int, commits: int, seed: int = 0
+) -> list[Path]:
+    """Write a synthetic TMFK repository with ``commits`` commits on ``main``.
+
+    The first commits add the license, tactics, techniques and mitigations,
+    every following commit edits one document. Every fifth mitigation gets a
+    folder with a child mitigation.
+
+    Returns
+    -------
+    list[Path]
+        documents of the repository
+    """
+    rnd = random.Random(seed)
+    path = Path(path)
+    repo = git.Repo.init(path, initial_branch="main")
+    env = {
+        "GIT_AUTHOR_NAME": "benchmark",
+        "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+        "GIT_COMMITTER_NAME": "benchmark",
+        "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+    }
+    made = 0
+
+    def commit(message: str) -> None:
+        nonlocal made
+        date = f"{FIRST_COMMIT_DATE + made * COMMIT_INTERVAL} +0000"
+        repo.git.add(A=True)
+        repo.git.commit(
+            "-q",
+            "--allow-empty",
+            "-m",
+            message,
+            env={**env, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date},
+        )
+        made += 1
+
+    (path / "LICENSE").write_text("MIT License\n")
+    documents = []
+    docs = path / "docs"
+    for tactic_name in TMFK_TACTICS_MAP:
+        tactic_path = docs / "tactics" / tactic_name / "index.md"
+        tactic_path.parent.mkdir(parents=True)
+        tactic_path.write_text(tactic_document(tactic_name))
+        documents.append(tactic_path)
+    commit("Add tactics")
+
+    (docs / "techniques").mkdir()
+    for index in range(techniques):
+        technique_path = docs / "techniques" / f"Technique {index}.md"
+        technique_path.write_text(technique_document(index, rnd))
+        documents.append(technique_path)
+    commit("Add techniques")
+
+    mitigations_path = docs / "mitigations"
+    mitigations_path.mkdir()
+    (mitigations_path / "index.md").write_text("# Mitigations\n")
+    for index in range(mitigations):
+        mitigation_id = f"MS-M9{index:03d}"
+        name = f"{mitigation_id} Mitigation {index}"
+        mitigation_path = mitigations_path / f"{name}.md"
+        mitigation_path.write_text(
+            mitigation_document(mitigation_id, index, techniques, rnd)
+        )
+        documents.append(mitigation_path)
+        if index % 5 == 0:
+            child_id = f"{mitigation_id}.001"
+            child_path = mitigations_path / name / f"{child_id} Child {index}.md"
+            child_path.parent.mkdir()
+            child_path.write_text(
+                mitigation_document(child_id, index, techniques, rnd, mitigation_id)
+            )
+            documents.append(child_path)
+    commit("Add mitigations")
+
+    for index in range(made, commits):
+        document = rnd.choice(documents)
+        with open(document, "a", encoding="utf-8") as f:
+            f.write(f"\nEdited in revision {index}.\n")
+        commit(f"Edit {document.name}")
+
+    return documents
+
+
+def timed(timings: dict, stage: str, function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+    return result
+
+
+def run_benchmark(tmfk_path: Path, output_path: Path) -> dict:
+    """Build both modes from ``tmfk_path`` and time every stage.
+
+    Objects are built and serialized as :func:`parse.run_build` does: the
+    mode-independent objects and their canonical JSON are shared by the modes.
+    """
+    timings = {}
+    history = timed(timings, "git_index", GitHistoryIndex, tmfk_path)
+    jobs = list_documents(tmfk_path)
+    records = timed(timings, "markdown", extract_documents, jobs)
+    timed(timings, "git_lookups", stamp_dates, jobs, records, history)
+    model = timed(timings, "git_lookups", assemble_model, jobs, records, tmfk_path)
+
+    objects = 0
+    shared_memo = {}
+    serializer = SerializationCache()
+    for mode in Mode:
+        stix_objects = timed(
+            timings,
+            "stix_objects",
+            list,
+            build_tmfk(model, mode, shared_memo=shared_memo),
+        )
+        refs = [(obj.id, obj.modified) for obj in stix_objects]
+        collection = timed(timings, "collection", build_collection, refs, model, mode)
+        objects += timed(
+            timings,
+            "serialization",
+            write_bundle,
+            output_path / f"tmfk_{mode.name.lower()}.json",
+            stix_objects,
+            head=lambda refs: collection,
+            serialize=serializer.serialize,
+        )
+
+    stages = {stage: round(timings[stage], 6) for stage in STAGES}
+    return {
+        "documents": len(jobs),
+        "objects": objects,
+        "history_commits": history.commits,
+        "stages": stages,
+        "total": round(sum(stages.values()), 6),
+    }
+
+
+def measure(techniques: int, mitigations: int, commits: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmfk_path = Path(tmp) / "Threat-Matrix-for-Kubernetes"
+        output_path = Path(tmp) / "build"
+        output_path.mkdir()
+        generate_upstream(tmfk_path, techniques, mitigations, commits)
+        runs = [run_benchmark(tmfk_path, output_path) for _ in range(repeat)]
+
+    best = min(runs, key=lambda run: run["total"])
+    result = {"techniques": techniques, "mitigations": mitigations, "commits": commits}
+    result.update(best)
+    print(
+        f"{techniques:>5} techniques {mitigations:>5} mitigations "
+        f"{commits:>5} commits: {best['total']:.3f}s "
+        + " ".join(f"{stage}={best['stages'][stage]:.3f}" for stage in STAGES),
+        file=sys.stderr,
+    )
+    return result
+
+
+def parse_counts(value: str) -> list[int]:
+    return [int(count) for count in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the TMFK build.")
+    parser.add_argument(
+        "--sizes",
+        type=parse_counts,
+        default=[50, 200, 800],
+        help="comma separated numbers of techniques, with half as many mitigations",
+    )
+    parser.add_argument(
+        "--depths",
+        type=parse_counts,
+        default=[10, 100, 1000],
+        help="comma separated numbers of upstream commits",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per point, the fastest is kept"
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=BUILD_PATH / "benchmark.json",
+        help="JSON report, - writes to stdout",
+    )
+    args = parser.parse_args()
+
+    base_size, base_depth = args.sizes[0], args.depths[0]
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "size_sweep": [
+            measure(size, size // 2, base_depth, args.repeat) for size in args.sizes
+        ],
+        "depth_sweep": [
+            measure(base_size, base_size // 2, depth, args.repeat)
+            for depth in args.depths
+        ],
+    }
+
+    content = json.dumps(report, indent=4)
+    if str(args.output) == "-":
+        print(content)
+    else:
+        args.output.write_text(content + "\n")
@@ -0,0 +1,213 @@
+"""Streaming checks of generated bundles.
+
+:mod:`validate` parses every object back with ``stix2``, which is slow and
+keeps the whole bundle in memory. The checks here read the bundle one object
+at a time with :func:`bundle_io.iter_bundle_objects` and run the checks
+precompiled for its type; only ids and the references still to resolve are
+kept until the end of the bundle. They cover the invariants the consumers of
+the bundles rely on:
+
+- every relationship end, matrix tactic and creator reference resolves,
+- the collection lists every object with its current ``modified``,
+- kill chain phases of TMFK techniques name the ``x_mitre_shortname`` of a
+  tactic,
+- domains, external sources and kill chains match the mode of the bundle,
+  read from the id of its collection.
+
+The requirements TMFK places on its own techniques are only checked on TMFK
+objects, so a bundle merged with ATT&CK or other collections by :mod:`merge`
+passes. A TMFK object is told apart by the ``MS-`` id of its first external
+reference, because the source name of the ATT&CK compatible mode is the one
+of ATT&CK.
+"""
+
+import re
+from pathlib import Path
+from typing import Callable
+
+from bundle_io import iter_bundle_objects
+from constants import (
+    TMFK_ID_PREFIX,
+    Mode,
+    get_collection_id,
+    get_kill_chain_name,
+    get_tmfk_domain,
+    get_tmfk_source,
+)
+from joblib import Parallel, delayed
+
+STIX_ID = re.compile(
+    r"([a-z0-9-]+)--[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z")
+
+COLLECTION_MODES = {get_collection_id(mode=mode): mode for mode in Mode}
+
+REQUIRED = {
+    "x-mitre-collection": ("name", "x_mitre_contents"),
+    "x-mitre-tactic": ("name", "x_mitre_shortname", "x_mitre_domains"),
+    "attack-pattern": ("name",),
+    "course-of-action": ("name",),
+    "relationship": ("relationship_type", "source_ref", "target_ref"),
+    "x-mitre-matrix": ("name", "tactic_refs", "x_mitre_domains"),
+    "identity": ("name",),
+}
+TMFK_REQUIRED = {
+    "attack-pattern": ("kill_chain_phases", "x_mitre_domains"),
+}
+COMMON_REQUIRED = ("type", "id", "created", "modified")
+REFERENCES = ("created_by_ref", "x_mitre_modified_by_ref")
+
+
+def is_tmfk(obj: dict) -> bool:
+    """Whether ``obj`` is a TMFK object, by the id of its first reference."""
+    references = obj.get("external_references") or [{}]
+    return str(references[0].get("external_id", "")).startswith(TMFK_ID_PREFIX)
+
+
+class BundleCheck:
+    """State of the checks of one bundle, fed object by object."""
+
+    def __init__(self) -> None:
+        self.errors: list[str] = []
+        self.modified: dict[str, str] = {}
+        self.references: list[tuple[str, str]] = []
+        self.contents: list[tuple[str, str, str]] = []
+        self.collections: list[str] = []
+        self.shortnames: set[str] = set()
+        self.phases: list[tuple[str, str]] = []
+        # Values that depend on the mode, with the first object using them.
+        self.domains: dict[str, str] = {}
+        self.sources: dict[str, str] = {}
+        self.kill_chains: dict[str, str] = {}
+
+    def check(self, obj: dict) -> None:
+        object_id = obj.get("id")
+        required = COMMON_REQUIRED + REQUIRED.get(obj.get("type"), ())
+        if is_tmfk(obj):
+            required += TMFK_REQUIRED.get(obj.get("type"), ())
+        for name in required:
+            if name not in obj:
+                self.errors.append(f"{object_id}: missing {name}")
+        match = STIX_ID.fullmatch(object_id or "")
+        if match is None or match[1] != obj.get("type"):
+            self.errors.append(f"{object_id}: malformed id")
+        if object_id in self.modified:
+            self.errors.append(f"{object_id}: duplicate id")
+        for name in ("created", "modified"):
+            if name in obj and not TIMESTAMP.fullmatch(obj[name]):
+                self.errors.append(f"{object_id}: malformed {name}")
+
+        self.modified[object_id] = obj.get("modified")
+        for name in REFERENCES:
+            if name in obj:
+                self.references.append((object_id, obj[name]))
+        for check in CHECKS.get(obj.get("type"), ()):
+            check(self, obj)
+
+    def finish(self) -> list[str]:
+        """Resolve the references and return every error of the bundle."""
+        errors = self.errors
+        for object_id, ref in self.references:
+            if ref not in self.modified:
+                errors.append(f"{object_id}: unresolved reference {ref}")
+
+        if len(self.collections) != 1:
+            errors.append(f"{len(self.collections)} collections instead of 1")
+        listed = set()
+        for collection_id, ref, modified in self.contents:
+            listed.add(ref)
+            if ref not in self.modified:
+                errors.append(f"{collection_id}: unresolved content {ref}")
+            elif self.modified[ref] != modified:
+                errors.append(f"{collection_id}: stale modified of {ref}")
+        for collection_id in self.collections:
+            for object_id in self.modified.keys() - listed - {collection_id}:
+                errors.append(f"{collection_id}: {object_id} is not listed")
+
+        for object_id, phase in self.phases:
+            if phase not in self.shortnames:
+                errors.append(f"{object_id}: phase {phase} is not a tactic")
+
+        mode = COLLECTION_MODES.get(self.collections[0]) if self.collections else None
+        if mode is not None:
+            for found, expected, name in (
+                (self.domains, get_tmfk_domain(mode=mode), "domain"),
+                (self.sources, get_tmfk_source(mode=mode), "source"),
+                (self.kill_chains, get_kill_chain_name(mode=mode), "kill chain"),
+            ):
+                for value, object_id in found.items():
+                    if value != expected:
+                        errors.append(
+                            f"{object_id}: {name} {value} in a "
+                            f"{mode.name.lower()} bundle"
+                        )
+        return errors
+
+
+def _check_domains(state: BundleCheck, obj: dict) -> None:
+    for domain in obj.get("x_mitre_domains", []):
+        state.domains.setdefault(domain, obj["id"])
+
+
+def _check_source(state: BundleCheck, obj: dict) -> None:
+    references = obj.get("external_references", [])
+    if references:
+        state.sources.setdefault(references[0].get("source_name"), obj["id"])
+
+
+def _check_collection(state: BundleCheck, obj: dict) -> None:
+    state.collections.append(obj["id"])
+    for content in obj.get("x_mitre_contents", []):
+        state.contents.append(
+            (obj["id"], content.get("object_ref"), content.get("object_modified"))
+        )
+
+
+def _check_tactic(state: BundleCheck, obj: dict) -> None:
+    state.shortnames.add(obj.get("x_mitre_shortname"))
+
+
+def _check_technique(state: BundleCheck, obj: dict) -> None:
+    tmfk = is_tmfk(obj)
+    for phase in obj.get("kill_chain_phases", []):
+        state.kill_chains.setdefault(phase.get("kill_chain_name"), obj["id"])
+        if tmfk:
+            state.phases.append((obj["id"], phase.get("phase_name")))
+
+
+def _check_relationship(state: BundleCheck, obj: dict) -> None:
+    state.references.append((obj["id"], obj.get("source_ref")))
+    state.references.append((obj["id"], obj.get("target_ref")))
+
+
+def _check_matrix(state: BundleCheck, obj: dict) -> None:
+    for ref in obj.get("tactic_refs", []):
+        state.references.append((obj["id"], ref))
+
+
+CHECKS: dict[str, tuple[Callable[[BundleCheck, dict], None], ...]] = {
+    "x-mitre-collection": (_check_collection,),
+    "x-mitre-tactic": (_check_tactic, _check_domains, _check_source),
+    "attack-pattern": (_check_technique, _check_domains, _check_source),
+    "relationship": (_check_relationship, _check_domains),
+    "x-mitre-matrix": (_check_matrix, _check_domains, _check_source),
+}
+
+
+def check_bundle(path: Path) -> list[str]:
+    """Errors found in the bundle at ``path``, empty for a valid bundle."""
+    state = BundleCheck()
+    try:
+        for obj in iter_bundle_objects(path):
+            state.check(obj)
+    except (OSError, ValueError) as e:
+        return [str(e)]
+    return state.finish()
+
+
+def check_bundles(paths: list[Path], workers: int = 1) -> list[list[str]]:
+    """Errors of many bundles, checked by ``workers`` processes."""
+    if workers == 1 or len(paths) < 2:
+        return [check_bundle(path) for path in paths]
+    return Parallel(n_jobs=workers)(delayed(check_bundle)(path) for path in paths)
@@ -0,0 +1,104 @@
+"""Deltas between the bundles of two upstream commits.
+
+A delta lists the objects added, changed and revoked since the previous
+versioned bundle, so a mirror can apply an update in O(changes) instead of
+reloading the whole bundle. ``index.json`` references the delta from the
+version entry of the new bundle.
+"""
+
+import copy
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def read_bundle_objects(path: Path) -> dict[str, dict]:
+    """Objects of a bundle file by id."""
+    with open(path, encoding="utf-8") as f:
+        bundle = json.load(f)
+    return {obj["id"]: obj for obj in bundle.get("objects", [])}
+
+
+def format_timestamp(value: datetime) -> str:
+    """STIX timestamp with millisecond precision, such as the bundles use."""
+    value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def find_previous_bundle(
+    output_path: Path, prefix: str, history: list[tuple[str, datetime]]
+) -> tuple[str, Path]:
+    """Latest versioned bundle built from an ancestor of the newest commit.
+
+    Parameters
+    ----------
+    output_path : Path
+        folder of the versioned bundles
+    prefix : str
+        file name prefix of the bundles, such as ``tmfk_strict``
+    history : list[tuple[str, datetime]]
+        short hashes and dates of the upstream commits, newest first
+
+    Returns
+    -------
+    tuple[str, Path]
+        commit hash and path of the bundle, ``(None, None)`` without one
+    """
+    for commit_hash, _ in history[1:]:
+        path = output_path / f"{prefix}_{commit_hash}.json"
+        if path.exists():
+            return commit_hash, path
+    return None, None
+
+
+def diff_bundles(
+    previous: dict[str, dict], current: dict[str, dict], revoked_at: datetime
+) -> dict[str, list[dict]]:
+    """Compare two bundles by object id.
+
+    An object is changed when its ``modified`` timestamp or its content
+    differs. Objects missing from ``current`` are revoked as of ``revoked_at``.
+    """
+    added = []
+    changed = []
+    for object_id, obj in current.items():
+        old = previous.get(object_id)
+        if old is None:
+            added.append(obj)
+        elif old.get("modified") != obj.get("modified") or old != obj:
+            changed.append(obj)
+
+    timestamp = format_timestamp(revoked_at)
+    revoked = []
+    for object_id in previous.keys() - current.keys():
+        obj = copy.deepcopy(previous[object_id])
+        obj["revoked"] = True
+        if "modified" in obj:
+            obj["modified"] = max(obj["modified"], timestamp)
+        revoked.append(obj)
+    revoked.sort(key=lambda obj: obj["id"])
+
+    return {"added": added, "changed": changed, "revoked": revoked}
+
+
+def write_delta(
+    path: Path, previous_hash: str, commit_hash: str, delta: dict[str, list[dict]]
+) -> None:
+    content = {"from": previous_hash, "to": commit_hash, **delta}
+    partial = path.with_name(f".{path.name}.tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=4)
+    partial.replace(path)
+
+
+def log_delta(name: str, delta: dict[str, list[dict]]) -> None:
+    logger.info(
+        "%s: %d added, %d changed, %d revoked",
+        name,
+        len(delta["added"]),
+        len(delta["changed"]),
+        len(delta["revoked"]),
+    )
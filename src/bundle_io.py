@@ -0,0 +1,198 @@
+"""Streaming output of STIX bundles.
+
+Objects are serialized one at a time as they are produced, so memory use does
+not grow with the size of the bundle. The output matches the layout of
+``Bundle.serialize(pretty=True)``.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import textwrap
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TextIO
+
+from metrics import span
+from utils import create_uuid_from_string
+
+INDENT = " " * 4
+
+# Serialized JSON never contains raw control characters.
+RECORD_SEPARATOR = "\x1e\n"
+
+BUNDLE_TYPE = re.compile(r'"type"\s*:\s*"bundle"')
+OBJECTS_START = re.compile(r'"objects"\s*:\s*\[')
+SEPARATOR = re.compile(r"[\s,]*")
+
+
+class BundleWriter:
+    """Write a bundle to ``fp`` object by object.
+
+    Use it as a context manager: entering writes the bundle header, leaving
+    closes the ``objects`` list and the bundle.
+    """
+
+    def __init__(self, fp: TextIO, bundle_id: str = None) -> None:
+        self.fp = fp
+        self.bundle_id = bundle_id or f"bundle--{uuid.uuid4()}"
+        self.count = 0
+
+    def __enter__(self) -> "BundleWriter":
+        self.fp.write(
+            "{\n"
+            f'{INDENT}"type": "bundle",\n'
+            f'{INDENT}"id": {json.dumps(self.bundle_id)},\n'
+            f'{INDENT}"objects": ['
+        )
+        return self
+
+    def write_serialized(self, serialized: str) -> None:
+        """Write an object already serialized with an indentation of 4 spaces."""
+        self.fp.write(",\n" if self.count else "\n")
+        self.fp.write(textwrap.indent(serialized, INDENT * 2))
+        self.count += 1
+
+    def write(self, obj) -> None:
+        self.write_serialized(obj.serialize(pretty=True))
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.fp.write(f"\n{INDENT}]\n}}" if self.count else "]\n}")
+
+
+def write_bundle(
+    path: Path,
+    objects: Iterable,
+    head: Callable[[list[tuple]], object] = None,
+    bundle_id: str = None,
+    serialize: Callable[[object], str] = None,
+) -> int:
+    """Stream objects into a bundle file.
+
+    The objects are spooled to a temporary file while ``(id, modified)`` of
+    every object is collected. ``head`` receives these pairs and returns an
+    object written first in the bundle, such as the ``x-mitre-collection``
+    listing the content of the bundle. The bundle replaces ``path`` atomically,
+    so hardlinks to a previous version of the file are left untouched.
+
+    Parameters
+    ----------
+    path : Path
+        output file
+    objects : Iterable
+        STIX objects of the bundle
+    head : Callable[[list[tuple]], object], optional
+        factory of the first object of the bundle
+    bundle_id : str, optional
+        id of the bundle, derived from the serialized objects by default
+    serialize : Callable[[object], str], optional
+        serialization of an object, ``serialize(pretty=True)`` by default
+
+    Returns
+    -------
+    int
+        number of objects in the bundle
+    """
+    path = Path(path)
+    if serialize is None:
+        serialize = _pretty
+    refs = []
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile("w+", encoding="utf-8", dir=path.parent) as spool:
+        for obj in objects:
+            with span("serialize", "serialize", type=obj.type):
+                serialized = serialize(obj)
+            spool.write(serialized + "\n" + RECORD_SEPARATOR)
+            digest.update(serialized.encode("utf-8"))
+            refs.append((obj.id, obj.modified))
+        spool.seek(0)
+
+        first = None
+        if head is not None:
+            with span("head", "serialize"):
+                first = serialize(head(refs))
+            digest.update(first.encode("utf-8"))
+        if bundle_id is None:
+            bundle_id = "bundle--" + str(create_uuid_from_string(digest.hexdigest()))
+
+        partial = path.with_name(f".{path.name}.tmp")
+        with open(partial, "w", encoding="utf-8") as f:
+            with BundleWriter(f, bundle_id=bundle_id) as bundle:
+                if first is not None:
+                    bundle.write_serialized(first)
+                for serialized in _iter_spooled_objects(spool):
+                    bundle.write_serialized(serialized)
+        partial.replace(path)
+
+    return len(refs) + (head is not None)
+
+
+def _pretty(obj) -> str:
+    return obj.serialize(pretty=True)
+
+
+def _iter_spooled_objects(spool: TextIO) -> Iterable[str]:
+    lines = []
+    for line in spool:
+        if line == RECORD_SEPARATOR:
+            yield "".join(lines)[:-1]
+            lines = []
+        else:
+            lines.append(line)
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Make ``target`` a hardlink of ``source``, or a copy where links fail."""
+    target = Path(target)
+    if target.exists():
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def iter_bundle_objects(path: Path, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Objects of a bundle file, decoded one at a time.
+
+    Only the object being decoded is held in memory, not the whole bundle.
+    The ``type`` of the bundle must come before its ``objects``, as in the
+    bundles of :class:`BundleWriter` and ``stix2``.
+
+    Raises
+    ------
+    ValueError
+        the file is not a bundle or ends before its ``objects`` list
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = ""
+        while (start := OBJECTS_START.search(buffer)) is None:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("not a STIX bundle")
+            buffer += chunk
+        if BUNDLE_TYPE.search(buffer, 0, start.start()) is None:
+            raise ValueError("not a STIX bundle")
+
+        pos = start.end()
+        while True:
+            pos = SEPARATOR.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError("truncated bundle")
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield obj
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
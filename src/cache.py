@@ -0,0 +1,135 @@
+"""On-disk cache of the fields extracted from TMFK markdown documents.
+
+Entries are keyed by the SHA-256 of the document content, so unchanged files
+skip markdown rendering entirely. Every entry lives under a directory named
+after :data:`PARSER_VERSION`, which changes whenever the parser code or the
+markdown libraries change; directories of older versions are removed.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import shutil
+from importlib.metadata import version
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from constants import CACHE_PATH
+from metrics import count
+
+logger = logging.getLogger(__name__)
+
+# The parser modules and the modules they read tables from, such as the
+# tactic ids of constants.py.
+PARSER_SOURCES = ["extract.py", "markdown_ast.py", "models.py", "constants.py"]
+PARSER_LIBRARIES = ["marko", "html-to-json"]
+
+# Fields that come from git rather than from the document content.
+GIT_FIELDS = ("created", "modified")
+
+Record = TypeVar("Record")
+
+
+def get_parser_version(source_path: Path = Path(__file__).parent) -> str:
+    """Hash of the :data:`PARSER_SOURCES` of ``source_path`` and of the
+    versions of the :data:`PARSER_LIBRARIES`."""
+    digest = hashlib.sha256()
+    for source in PARSER_SOURCES:
+        digest.update((Path(source_path) / source).read_bytes())
+    for library in PARSER_LIBRARIES:
+        digest.update(f"{library}=={version(library)}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+PARSER_VERSION = get_parser_version()
+
+
+class DocumentCache:
+    def __init__(self, path: Path = CACHE_PATH, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.path = Path(path) / PARSER_VERSION
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            self._prune()
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def _prune(self) -> None:
+        if not self.path.parent.is_dir():
+            return
+        for entry in self.path.parent.iterdir():
+            if entry.is_dir() and entry != self.path:
+                shutil.rmtree(entry)
+
+    def _entry(self, kind: str, content: str) -> Path:
+        key = hashlib.sha256(f"{kind}\0{content}".encode("utf-8")).hexdigest()
+        return self.path / f"{key}.json"
+
+    def get(self, kind: str, content: str, record_type: type[Record]) -> Record:
+        if not self.enabled:
+            return None
+
+        entry = self._entry(kind, content)
+        if not entry.is_file():
+            self.misses += 1
+            count("cache misses")
+            return None
+
+        self.hits += 1
+        count("cache hits")
+        with open(entry, "r", encoding="utf-8") as f:
+            return record_type(**json.load(f))
+
+    def put(self, kind: str, content: str, record: Record) -> None:
+        if not self.enabled:
+            return
+
+        fields = {
+            k: v for k, v in dataclasses.asdict(record).items() if k not in GIT_FIELDS
+        }
+        entry = self._entry(kind, content)
+        partial = entry.with_suffix(".tmp")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(fields, f)
+        partial.replace(entry)
+
+    def load(
+        self,
+        kind: str,
+        content: str,
+        extract: Callable[[str], Record],
+        record_type: type[Record],
+    ) -> Record:
+        """Return the record of a document, extracting it only on a cache miss.
+
+        Parameters
+        ----------
+        kind : str
+            namespace of the document, e.g. the parser that reads it
+        content : str
+            markdown content of the document
+        extract : Callable[[str], Record]
+            function extracting the record from the content
+        record_type : type[Record]
+            dataclass of the record
+
+        Returns
+        -------
+        Record
+            the record without git dates
+        """
+        record = self.get(kind, content, record_type)
+        if record is None:
+            record = extract(content)
+            self.put(kind, content, record)
+        return record
+
+    def log_stats(self) -> None:
+        if self.enabled:
+            logger.info(
+                "Document cache: %d hits, %d misses (parser version %s)",
+                self.hits,
+                self.misses,
+                PARSER_VERSION,
+            )
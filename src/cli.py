@@ -0,0 +1,489 @@
+"""Command line interface of the TMFK builder.
+
+Only the standard library is imported at startup. Every subcommand imports
+the libraries it needs when it runs, so ``--help`` or ``diff`` do not pay for
+``stix2`` and ``mitreattack``. ``--import-report`` prints how long each of
+these imports took, ``--import-budget`` fails the command when startup took
+longer than allowed::
+
+    python src/cli.py --mode strict --out build --upstream PATH
+    python src/cli.py build --mode strict --out build --upstream PATH
+    python src/cli.py build --watch
+    python src/cli.py backfill a1b2c3d..main --workers 4
+    python src/cli.py validate build/tmfk_strict.json
+    python src/cli.py check --workers 4 build/tmfk_*.json
+    python src/cli.py diff OLD.json NEW.json
+    python src/cli.py merge enterprise-attack.json build/tmfk_attack_compatible.json
+    python src/cli.py serve --port 8000
+    python src/cli.py --import-report --import-budget 5 build
+    python src/cli.py --metrics build/metrics.json --trace build/trace.json build
+"""
+
+import argparse
+import importlib
+import logging
+import sys
+import time
+from pathlib import Path
+
+STARTED = time.perf_counter()
+
+import metrics  # noqa: E402
+from constants import BUILD_PATH, INDEX_PATH, TMFK_PATH, Mode  # noqa: E402
+
+# Heavy dependencies of every subcommand, in the order they are imported.
+IMPORTS = {
+    "build": [
+        "git",
+        "marko",
+        "html_to_json",
+        "stix2",
+        "mitreattack.stix20",
+        "joblib",
+        "parse",
+    ],
+    "backfill": [
+        "git",
+        "marko",
+        "html_to_json",
+        "stix2",
+        "mitreattack.stix20",
+        "joblib",
+        "parse",
+        "backfill",
+    ],
+    "validate": ["stix2", "mitreattack.stix20", "validate"],
+    "check": ["joblib", "bundle_check"],
+    "diff": ["bundle_diff"],
+    "merge": ["merge"],
+    "serve": ["taxii"],
+}
+
+
+def dependencies(args: argparse.Namespace) -> list[str]:
+    """Heavy dependencies of the command of ``args``."""
+    if args.command == "build" and args.watch:
+        return IMPORTS["build"] + ["watch"]
+    return IMPORTS[args.command]
+
+
+def import_dependencies(modules: list[str]) -> dict[str, float]:
+    """Import ``modules`` and time each of them."""
+    timings = {}
+    for module in modules:
+        started = time.perf_counter()
+        importlib.import_module(module)
+        timings[module] = time.perf_counter() - started
+    return timings
+
+
+def print_import_report(timings: dict[str, float], startup: float) -> None:
+    width = max(map(len, timings), default=0)
+    for module, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"{module:<{width}} {seconds:8.3f}s", file=sys.stderr)
+    print(f"{'startup':<{width}} {startup:8.3f}s", file=sys.stderr)
+
+
+def parse_modes(value: str) -> list[Mode]:
+    if value == "all":
+        return list(Mode)
+    try:
+        return [Mode[value.upper()]]
+    except KeyError:
+        raise argparse.ArgumentTypeError(f"unknown mode {value}")
+
+
+def build(args: argparse.Namespace) -> int:
+    if args.watch:
+        from cache import DocumentCache
+        from watch import watch
+
+        watch(
+            modes=args.mode,
+            tmfk_path=args.upstream,
+            output_path=args.out,
+            cache=DocumentCache(path=args.out / ".cache", enabled=not args.no_cache),
+            interval=args.interval,
+        )
+        return 0
+
+    from parse import run_build
+
+    run_build(
+        modes=args.mode,
+        tmfk_path=args.upstream,
+        output_path=args.out,
+        index_path=args.index,
+        use_cache=not args.no_cache,
+        workers=args.workers,
+        attack_bundle=args.attack_bundle,
+        compressions=args.compress,
+    )
+    return 0
+
+
+def backfill(args: argparse.Namespace) -> int:
+    from backfill import backfill
+
+    backfill(
+        rev_range=args.range,
+        modes=args.mode,
+        tmfk_path=args.upstream,
+        output_path=args.out,
+        use_cache=not args.no_cache,
+        workers=args.workers,
+        force=args.force,
+        index_path=args.index,
+        compressions=args.compress,
+    )
+    return 0
+
+
+def default_bundles(args: argparse.Namespace) -> list[Path]:
+    return args.bundles or [
+        path
+        for path in (args.out / f"tmfk_{mode.name.lower()}.json" for mode in Mode)
+        if path.exists()
+    ]
+
+
+def report(paths: list[Path], results: list[list[str]]) -> int:
+    failed = 0
+    for path, errors in zip(paths, results):
+        for error in errors:
+            print(f"{path}: {error}", file=sys.stderr)
+        print(f"{path}: {'invalid' if errors else 'valid'}")
+        failed += bool(errors)
+    return 1 if failed else 0
+
+
+def validate(args: argparse.Namespace) -> int:
+    from validate import validate_bundle
+
+    paths = default_bundles(args)
+    results = []
+    for path in paths:
+        try:
+            results.append(validate_bundle(path))
+        except (OSError, ValueError) as e:
+            results.append([str(e)])
+    return report(paths, results)
+
+
+def check(args: argparse.Namespace) -> int:
+    from bundle_check import check_bundles
+
+    paths = default_bundles(args)
+    return report(paths, check_bundles(paths, workers=args.workers))
+
+
+def diff(args: argparse.Namespace) -> int:
+    from datetime import datetime, timezone
+
+    from bundle_diff import diff_bundles, log_delta, read_bundle_objects, write_delta
+
+    delta = diff_bundles(
+        read_bundle_objects(args.old),
+        read_bundle_objects(args.new),
+        revoked_at=datetime.now(timezone.utc),
+    )
+    log_delta(f"{args.old.name} -> {args.new.name}", delta)
+    if args.output is not None:
+        write_delta(args.output, args.old.stem, args.new.stem, delta)
+    return 0
+
+
+def merge(args: argparse.Namespace) -> int:
+    from merge import merge_bundles
+
+    merge_bundles(args.bundles, args.output or args.out / "merged.json", args.name)
+    return 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    from taxii import serve
+
+    serve(index_path=args.index, bundles_path=args.out, host=args.host, port=args.port)
+    return 0
+
+
+def global_options(suppress: bool = False) -> argparse.ArgumentParser:
+    """Options accepted before and after the subcommand.
+
+    After the subcommand, ``suppress`` leaves the options unset unless given,
+    so they do not override the values given before it.
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument(
+        "--import-report",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="print the time spent importing the dependencies of the command",
+    )
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        metavar="SECONDS",
+        default=argparse.SUPPRESS if suppress else None,
+        help="fail when startup, imports included, takes longer",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        metavar="PATH",
+        default=argparse.SUPPRESS if suppress else None,
+        help="write timings, per-file counters and peak memory as JSON",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="PATH",
+        default=argparse.SUPPRESS if suppress else None,
+        help="write every timing span in the Chrome trace event format",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=argparse.SUPPRESS if suppress else BUILD_PATH,
+        help=f"folder of the bundles (default: {BUILD_PATH})",
+    )
+    return parser
+
+
+def index_option() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--index",
+        type=Path,
+        default=INDEX_PATH,
+        help="index.json listing the versioned bundles (default: %(default)s)",
+    )
+    return parser
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tmfk-build",
+        description="Build and check the TMFK STIX bundles. "
+        "The command defaults to build.",
+        parents=[global_options()],
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    common = [global_options(suppress=True)]
+    indexed = common + [index_option()]
+
+    build_parser = subparsers.add_parser(
+        "build", help="build the bundles", parents=indexed
+    )
+    build_parser.add_argument(
+        "--mode",
+        type=parse_modes,
+        default=list(Mode),
+        help="strict, attack_compatible or all (default: all)",
+    )
+    build_parser.add_argument(
+        "--upstream",
+        type=Path,
+        default=TMFK_PATH,
+        help="checkout of Threat-Matrix-for-Kubernetes (default: %(default)s)",
+    )
+    build_parser.add_argument(
+        "--compress",
+        action="append",
+        choices=["gz", "zst"],
+        default=[],
+        help="also write and index .json.gz or .json.zst copies of the "
+        "versioned bundles, zst needs the zstandard package",
+    )
+    build_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="re-parse every document instead of using the cache of --out",
+    )
+    build_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes parsing documents, -1 uses every core",
+    )
+    build_parser.add_argument(
+        "--attack-bundle",
+        type=Path,
+        help="enterprise-attack bundle validating the ATT&CK ids of the crosswalk",
+    )
+    build_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rewrite the latest bundles whenever an upstream document changes",
+    )
+    build_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="seconds between two checks of the documents in --watch mode",
+    )
+    build_parser.set_defaults(run=build)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill",
+        help="build the versioned bundles of past upstream commits",
+        parents=indexed,
+    )
+    backfill_parser.add_argument(
+        "range",
+        nargs="?",
+        default="main",
+        help="commits given to git rev-list, such as a1b2c3d..main (default: main)",
+    )
+    backfill_parser.add_argument(
+        "--mode",
+        type=parse_modes,
+        default=list(Mode),
+        help="strict, attack_compatible or all (default: all)",
+    )
+    backfill_parser.add_argument(
+        "--upstream",
+        type=Path,
+        default=TMFK_PATH,
+        help="clone of Threat-Matrix-for-Kubernetes (default: %(default)s)",
+    )
+    backfill_parser.add_argument(
+        "--compress",
+        action="append",
+        choices=["gz", "zst"],
+        default=[],
+        help="also write and index .json.gz or .json.zst copies of the "
+        "versioned bundles, zst needs the zstandard package",
+    )
+    backfill_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="re-parse every document instead of using the cache of --out",
+    )
+    backfill_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes building commits, -1 uses every core",
+    )
+    backfill_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="rebuild commits whose bundles already exist",
+    )
+    backfill_parser.set_defaults(run=backfill)
+
+    validate_parser = subparsers.add_parser(
+        "validate", help="check bundles", parents=common
+    )
+    validate_parser.add_argument(
+        "bundles",
+        nargs="*",
+        type=Path,
+        help="bundle files (default: latest bundles of --out)",
+    )
+    validate_parser.set_defaults(run=validate)
+
+    check_parser = subparsers.add_parser(
+        "check", help="check bundles in a streaming pass, without stix2", parents=common
+    )
+    check_parser.add_argument(
+        "bundles",
+        nargs="*",
+        type=Path,
+        help="bundle files (default: latest bundles of --out)",
+    )
+    check_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes checking bundles, -1 uses every core",
+    )
+    check_parser.set_defaults(run=check)
+
+    diff_parser = subparsers.add_parser(
+        "diff", help="compare two bundles", parents=common
+    )
+    diff_parser.add_argument("old", type=Path)
+    diff_parser.add_argument("new", type=Path)
+    diff_parser.add_argument("--output", type=Path, help="write the delta to this file")
+    diff_parser.set_defaults(run=diff)
+
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="merge bundles, keeping the latest version of every object",
+        parents=common,
+    )
+    merge_parser.add_argument("bundles", nargs="+", type=Path)
+    merge_parser.add_argument(
+        "--output", type=Path, help="merged bundle (default: merged.json in --out)"
+    )
+    merge_parser.add_argument(
+        "--name",
+        default="Merged collection",
+        help="name of the merged collection (default: %(default)s)",
+    )
+    merge_parser.set_defaults(run=merge)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="serve the collections of index.json over TAXII 2.1",
+        parents=indexed,
+    )
+    serve_parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="port to listen on, 0 picks a free one (default: %(default)s)",
+    )
+    serve_parser.set_defaults(run=serve)
+
+    return parser
+
+
+def with_command(argv: list[str]) -> list[str]:
+    """``argv`` with the ``build`` command when it names no command."""
+    _, rest = global_options().parse_known_args(argv)
+    if rest and rest[0] in [*IMPORTS, "-h", "--help"]:
+        return argv
+    return ["build", *argv]
+
+
+def main(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = make_parser().parse_args(with_command(argv))
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s %(name)s: %(message)s"
+    )
+
+    if args.metrics is not None or args.trace is not None:
+        metrics.enable()
+    with metrics.span("imports", "stage"):
+        timings = import_dependencies(dependencies(args))
+    startup = time.perf_counter() - STARTED
+    if args.import_report:
+        print_import_report(timings, startup)
+    if args.import_budget is not None and startup > args.import_budget:
+        print(
+            f"startup took {startup:.3f}s, over the budget of "
+            f"{args.import_budget:.3f}s",
+            file=sys.stderr,
+        )
+        return 1
+
+    try:
+        return args.run(args)
+    finally:
+        if args.metrics is not None:
+            metrics.write_metrics(args.metrics)
+        if args.trace is not None:
+            metrics.write_trace(args.trace)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,12 @@ TACTICS_PATH = TMFK_PATH / "docs" / "tactics"
 TECHNIQUES_PATH = TMFK_PATH / "docs" / "techniques"
 MITIGATIONS_PATH = TMFK_PATH / "docs" / "mitigations"
 
+BUILD_PATH = Path(__file__).parent.parent / "build"
+CACHE_PATH = BUILD_PATH / ".cache"
+INDEX_PATH = Path(__file__).parent.parent / "index.json"
+
+BUILD_URL = "https://raw.githubusercontent.com/Security-Experts-Community/tmfk-stix-data/main/build"
+
 TMFK_TACTICS_MAP = {
     "InitialAccess": "MS-T0100",
     "Execution": "MS-T0200",
@@ -22,6 +28,10 @@ TMFK_TACTICS_MAP = {
     "Impact": "MS-T1000",
 }
 
+# TMFK ids, such as MS-TA9001 or MS-M9001, tell TMFK objects from ATT&CK ones
+# in the ATT&CK compatible mode, where both use the mitre-attack source.
+TMFK_ID_PREFIX = "MS-"
+
 TMFK_VERSION = "0.1"
 ATTACK_SPEC_VERSION = "2.1.0"
 TMFK_PLATFORM = "Kubernetes"
@@ -0,0 +1,296 @@
+"""Coverage of the matrix by a set of deployed mitigations.
+
+:class:`CoverageGraph` reads the ``mitigates`` relationships of a bundle into
+adjacency bitsets: every technique is a bit, a tactic is the set of its
+techniques and a mitigation the set of techniques it mitigates. Coverage and
+gap queries are then a few integer operations, and their results are cached
+by deployed set and tactic. The cache keeps the ``cache_size`` most recently
+used results, so a dashboard querying many clusters stays within bounds.
+
+A parent mitigation stands for its sub-mitigations: deploying ``MS-M9000``
+covers the techniques of ``MS-M9000.001`` as well. Objects without a TMFK id,
+such as the ATT&CK objects of a merged bundle, are not part of the graph.
+
+Run this module to time the queries on a bundle::
+
+    python src/coverage.py [BUNDLE_PATH]
+"""
+
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Callable, Iterable
+
+from bundle_io import iter_bundle_objects
+from tmfk_index import get_external_id
+
+CACHE_SIZE = 4096
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class CoverageGraph:
+    """Tactics, techniques and mitigations of a bundle as bitsets.
+
+    Techniques and mitigations are named by their TMFK id, such as
+    ``MS-TA9001`` or ``MS-M9001``, tactics by their ``x_mitre_shortname``.
+    """
+
+    def __init__(self, objects: Iterable[dict], cache_size: int = CACHE_SIZE) -> None:
+        by_id = {}
+        phases = {}
+        mitigates = []
+        for obj in objects:
+            if obj.get("revoked") or obj.get("x_mitre_deprecated"):
+                continue
+            if obj["type"] in ("x-mitre-tactic", "attack-pattern", "course-of-action"):
+                # ATT&CK and custom objects of a merged bundle are left out.
+                if get_external_id(obj) is None:
+                    continue
+                by_id[obj["id"]] = obj
+            if obj["type"] == "attack-pattern":
+                phases[obj["id"]] = [
+                    p["phase_name"] for p in obj.get("kill_chain_phases", [])
+                ]
+            elif (
+                obj["type"] == "relationship"
+                and obj["relationship_type"] == "mitigates"
+            ):
+                mitigates.append((obj["source_ref"], obj["target_ref"]))
+
+        self.techniques: list[str] = sorted(
+            get_external_id(by_id[stix_id]) for stix_id in phases
+        )
+        self._bit = {tmfk_id: i for i, tmfk_id in enumerate(self.techniques)}
+
+        self.tactics: dict[str, int] = {
+            obj["x_mitre_shortname"]: 0
+            for obj in by_id.values()
+            if obj["type"] == "x-mitre-tactic"
+        }
+        for stix_id, names in phases.items():
+            bit = 1 << self._bit[get_external_id(by_id[stix_id])]
+            for name in names:
+                self.tactics[name] = self.tactics.get(name, 0) | bit
+
+        self.direct: dict[str, int] = {}
+        self.parents: dict[str, str] = {}
+        for obj in by_id.values():
+            if obj["type"] == "course-of-action":
+                tmfk_id = get_external_id(obj)
+                self.direct[tmfk_id] = 0
+                if obj.get("x_mitre_parent_mitigation"):
+                    self.parents[tmfk_id] = obj["x_mitre_parent_mitigation"]
+        for source_ref, target_ref in mitigates:
+            if source_ref in by_id and target_ref in by_id:
+                mitigation = get_external_id(by_id[source_ref])
+                technique = get_external_id(by_id[target_ref])
+                self.direct[mitigation] |= 1 << self._bit[technique]
+
+        self.children: dict[str, list[str]] = defaultdict(list)
+        for child, parent in sorted(self.parents.items()):
+            self.children[parent].append(child)
+        self.mitigations: dict[str, int] = {
+            tmfk_id: self._rolled_up(tmfk_id) for tmfk_id in self.direct
+        }
+        self.all_techniques = (1 << len(self.techniques)) - 1
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple, object] = OrderedDict()
+
+    @classmethod
+    def from_file(cls, path: Path, cache_size: int = CACHE_SIZE) -> "CoverageGraph":
+        return cls(iter_bundle_objects(path), cache_size)
+
+    def _rolled_up(self, tmfk_id: str) -> int:
+        mask = self.direct.get(tmfk_id, 0)
+        for child in self.children.get(tmfk_id, []):
+            mask |= self._rolled_up(child)
+        return mask
+
+    def _names(self, mask: int) -> list[str]:
+        return [self.techniques[i] for i in _bits(mask)]
+
+    def _scope(self, tactic: str = None) -> int:
+        if tactic is None:
+            return self.all_techniques
+        try:
+            return self.tactics[tactic]
+        except KeyError:
+            raise KeyError(f"unknown tactic {tactic}")
+
+    def _cached(self, key: tuple, compute: Callable[[], object]) -> object:
+        """Result of ``compute``, cached by ``key`` as most recently used."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value = compute()
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def _covered(self, deployed: frozenset) -> int:
+        def compute() -> int:
+            mask = 0
+            for tmfk_id in deployed:
+                try:
+                    mask |= self.mitigations[tmfk_id]
+                except KeyError:
+                    raise KeyError(f"unknown mitigation {tmfk_id}")
+            return mask
+
+        return self._cached(("covered", deployed), compute)
+
+    def covered(self, deployed: Iterable[str], tactic: str = None) -> list[str]:
+        """Techniques of ``tactic``, or of the matrix, mitigated by ``deployed``."""
+        return self._names(self._covered(frozenset(deployed)) & self._scope(tactic))
+
+    def gaps(self, deployed: Iterable[str] = None, tactic: str = None) -> list[str]:
+        """Techniques left unmitigated by ``deployed``.
+
+        Without ``deployed``, the techniques no mitigation of the matrix covers.
+        """
+        if deployed is None:
+            covered = self._covered(frozenset(self.mitigations))
+        else:
+            covered = self._covered(frozenset(deployed))
+        return self._names(self._scope(tactic) & ~covered)
+
+    def coverage(self, deployed: Iterable[str]) -> dict[str, tuple[int, int]]:
+        """Mitigated and total techniques of every tactic."""
+        covered = self._covered(frozenset(deployed))
+        return {
+            tactic: ((mask & covered).bit_count(), mask.bit_count())
+            for tactic, mask in self.tactics.items()
+        }
+
+    def mitigations_of(self, technique: str) -> list[str]:
+        bit = 1 << self._bit[technique]
+        return sorted(tmfk_id for tmfk_id, mask in self.direct.items() if mask & bit)
+
+    def set_cover(
+        self, tactic: str = None, available: Iterable[str] = None
+    ) -> list[str]:
+        """Fewest mitigations covering every coverable technique of ``tactic``.
+
+        Parameters
+        ----------
+        tactic : str, optional
+            shortname of the tactic, the whole matrix by default
+        available : Iterable[str], optional
+            mitigations to choose from, every mitigation by default
+
+        Returns
+        -------
+        list[str]
+            a minimum cover, or the smallest one found when the search is
+            cut short; techniques no available mitigation covers are left
+            out, :meth:`gaps` lists them
+        """
+        available = frozenset(self.mitigations if available is None else available)
+
+        def compute() -> list[str]:
+            scope = self._scope(tactic)
+            candidates = {
+                tmfk_id: self.mitigations[tmfk_id] & scope
+                for tmfk_id in sorted(available)
+                if self.mitigations[tmfk_id] & scope
+            }
+            target = 0
+            for mask in candidates.values():
+                target |= mask
+            return _minimum_cover(target, candidates)
+
+        return list(self._cached(("set_cover", tactic, available), compute))
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+
+def _greedy_cover(target: int, candidates: dict[str, int]) -> list[str]:
+    chosen = []
+    while target:
+        best = max(
+            candidates, key=lambda tmfk_id: (candidates[tmfk_id] & target).bit_count()
+        )
+        chosen.append(best)
+        target &= ~candidates[best]
+    return chosen
+
+
+def _minimum_cover(
+    target: int, candidates: dict[str, int], budget: int = 200_000
+) -> list[str]:
+    """Exact minimum set cover, bounded by the greedy cover.
+
+    Branches on the uncovered technique with the fewest mitigations, which
+    keeps the search small at the size of the matrix. After ``budget``
+    branches the smallest cover found so far is returned.
+    """
+    best = _greedy_cover(target, candidates)
+    covering = defaultdict(list)
+    for tmfk_id, mask in candidates.items():
+        for bit in _bits(mask):
+            covering[bit].append(tmfk_id)
+
+    def search(remaining: int, chosen: list[str]) -> None:
+        nonlocal best, budget
+        if not remaining:
+            if len(chosen) < len(best):
+                best = list(chosen)
+            return
+        if len(chosen) + 1 >= len(best) or budget <= 0:
+            return
+        budget -= 1
+        bit = min(_bits(remaining), key=lambda bit: len(covering[bit]))
+        for tmfk_id in covering[bit]:
+            chosen.append(tmfk_id)
+            search(remaining & ~candidates[tmfk_id], chosen)
+            chosen.pop()
+
+    search(target, [])
+    return sorted(best)
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    from constants import BUILD_PATH
+
+    path = (
+        Path(sys.argv[1])
+        if len(sys.argv) > 1
+        else BUILD_PATH / "tmfk_attack_compatible.json"
+    )
+
+    started = time.perf_counter()
+    graph = CoverageGraph.from_file(path)
+    load_seconds = time.perf_counter() - started
+
+    rng = random.Random(0)
+    mitigations = sorted(graph.mitigations)
+    clusters = [
+        rng.sample(mitigations, rng.randint(0, len(mitigations))) for _ in range(1000)
+    ]
+    started = time.perf_counter()
+    for deployed in clusters:
+        graph.coverage(deployed)
+        graph.gaps(deployed)
+    query_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    covers = {tactic: graph.set_cover(tactic) for tactic in graph.tactics}
+    cover_seconds = time.perf_counter() - started
+
+    print(
+        f"{len(graph.techniques)} techniques, {len(mitigations)} mitigations "
+        f"loaded in {load_seconds:.3f}s; coverage and gaps of {len(clusters)} "
+        f"clusters in {query_seconds:.3f}s; set covers of {len(covers)} tactics "
+        f"in {cover_seconds:.3f}s"
+    )
@@ -0,0 +1,146 @@
+"""Precomputed mapping between TMFK and MITRE ATT&CK.
+
+Techniques and mitigations list the ATT&CK ids they relate to in
+``x_mitre_ids``, and child mitigations name their parent. The crosswalk
+resolves these links once per build in both directions, so a consumer maps
+an id with a dictionary lookup instead of scanning the bundle.
+
+When an enterprise-attack bundle is given, every ATT&CK id is checked
+against it. Unknown ids and ids of revoked or deprecated ATT&CK objects are
+listed in the ``validation`` section.
+"""
+
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+
+from models import TmfkModel
+from parse_mitigation import get_mitigation_stix_id
+from parse_technique import get_technique_stix_id
+
+logger = logging.getLogger(__name__)
+
+ATTACK_SOURCE = "mitre-attack"
+
+
+def _invert(mapping: dict[str, list[str]]) -> dict[str, list[str]]:
+    inverted = defaultdict(list)
+    for key, values in mapping.items():
+        for value in values:
+            inverted[value].append(key)
+    return {key: sorted(values) for key, values in sorted(inverted.items())}
+
+
+def read_attack_ids(path: Path) -> dict[str, dict]:
+    """Techniques and mitigations of an ATT&CK bundle by ATT&CK id."""
+    with open(path, encoding="utf-8") as f:
+        objects = json.load(f).get("objects", [])
+
+    by_stix_id = {}
+    for obj in objects:
+        if obj.get("type") not in ("attack-pattern", "course-of-action"):
+            continue
+        for reference in obj.get("external_references", []):
+            if reference.get("source_name") == ATTACK_SOURCE:
+                by_stix_id[obj["id"]] = {
+                    "attack_id": reference["external_id"],
+                    "revoked": obj.get("revoked", False),
+                    "deprecated": obj.get("x_mitre_deprecated", False),
+                    "revoked_by": None,
+                }
+                break
+
+    for obj in objects:
+        if (
+            obj.get("type") == "relationship"
+            and obj.get("relationship_type") == "revoked-by"
+            and obj.get("source_ref") in by_stix_id
+            and obj.get("target_ref") in by_stix_id
+        ):
+            target = by_stix_id[obj["target_ref"]]["attack_id"]
+            by_stix_id[obj["source_ref"]]["revoked_by"] = target
+
+    return {entry["attack_id"]: entry for entry in by_stix_id.values()}
+
+
+def validate_crosswalk(crosswalk: dict, attack: dict[str, dict]) -> dict:
+    unknown, revoked, deprecated = [], {}, []
+    for attack_id in sorted(
+        crosswalk["attack_to_tmfk"]["techniques"].keys()
+        | crosswalk["attack_to_tmfk"]["mitigations"].keys()
+    ):
+        entry = attack.get(attack_id)
+        if entry is None:
+            unknown.append(attack_id)
+        elif entry["revoked"]:
+            revoked[attack_id] = entry["revoked_by"]
+        elif entry["deprecated"]:
+            deprecated.append(attack_id)
+
+    for attack_id in unknown:
+        logger.warning("ATT&CK id %s is not in the ATT&CK bundle", attack_id)
+    for attack_id, replacement in revoked.items():
+        logger.warning("ATT&CK id %s is revoked by %s", attack_id, replacement)
+    for attack_id in deprecated:
+        logger.warning("ATT&CK id %s is deprecated", attack_id)
+    return {"unknown": unknown, "revoked": revoked, "deprecated": deprecated}
+
+
+def build_crosswalk(model: TmfkModel, attack_bundle: Path = None) -> dict:
+    """Crosswalk of the matrix, validated against ``attack_bundle`` if given."""
+    mitigation_records = model.mitigations + sum(model.mitigation_folders, [])
+    techniques = dict(
+        sorted(
+            (record.tmfk_id, sorted(record.attack_ids)) for record in model.techniques
+        )
+    )
+    mitigations = dict(
+        sorted(
+            (record.tmfk_id, sorted(record.attack_ids)) for record in mitigation_records
+        )
+    )
+    children = defaultdict(list)
+    for record in mitigation_records:
+        if record.parent_mitigation is not None:
+            children[record.parent_mitigation].append(record.tmfk_id)
+
+    stix_ids = {
+        record.tmfk_id: get_technique_stix_id(record.tmfk_id)
+        for record in model.techniques
+    }
+    stix_ids.update(
+        (record.tmfk_id, get_mitigation_stix_id(record.tmfk_id))
+        for record in mitigation_records
+    )
+
+    crosswalk = {
+        "commit": model.commit_hash,
+        "tmfk_to_attack": {"techniques": techniques, "mitigations": mitigations},
+        "attack_to_tmfk": {
+            "techniques": _invert(techniques),
+            "mitigations": _invert(mitigations),
+        },
+        "parent_to_children": {
+            parent: sorted(ids) for parent, ids in sorted(children.items())
+        },
+        "child_to_parent": {
+            child: parent
+            for parent, ids in sorted(children.items())
+            for child in sorted(ids)
+        },
+        "stix_ids": dict(sorted(stix_ids.items())),
+    }
+    if attack_bundle is not None:
+        crosswalk["validation"] = {
+            "attack_bundle": Path(attack_bundle).name,
+            **validate_crosswalk(crosswalk, read_attack_ids(attack_bundle)),
+        }
+    return crosswalk
+
+
+def write_crosswalk(path: Path, crosswalk: dict) -> None:
+    partial = path.with_name(f".{path.name}.tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(crosswalk, f, indent=4)
+    partial.replace(path)
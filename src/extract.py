@@ -0,0 +1,135 @@
+"""Extraction of mode-independent records from TMFK markdown documents.
+
+Nothing here imports the STIX libraries, so worker processes of the parallel
+parsing stage start quickly.
+"""
+
+import re
+
+from constants import TMFK_TACTICS_MAP
+from markdown_ast import MarkdownDocument, Node, parse_document
+from models import MitigationRecord, TacticRecord, TechniqueRecord
+
+
+def tactic_from_document(document: MarkdownDocument, tactic_name: str) -> TacticRecord:
+    tactic_id = TMFK_TACTICS_MAP[tactic_name]
+    tactic_description = document.paragraphs[1].value
+    tactic_link = f"https://microsoft.github.io/Threat-Matrix-for-Kubernetes/tactics/{tactic_name}"
+    splitted = re.sub(
+        "([A-Z][a-z]+)", r" \1", re.sub("([A-Z]+)", r" \1", tactic_name)
+    ).split()
+    tactic_display_name = " ".join(splitted)
+
+    return TacticRecord(
+        tactic_name=tactic_name,
+        tmfk_id=tactic_id,
+        display_name=tactic_display_name,
+        description=tactic_description,
+        url=tactic_link,
+    )
+
+
+def handle_description_markup(paragraph: Node) -> str:
+    if not paragraph.codes:
+        return paragraph.value
+    if len(paragraph.texts) == 1:
+        return paragraph.value + paragraph.codes[0]
+
+    mdescription = paragraph.texts[0]
+    for i, code in enumerate(paragraph.codes):
+        mdescription += " " + code + paragraph.texts[i + 1]
+    return mdescription
+
+
+def technique_from_document(document: MarkdownDocument) -> TechniqueRecord:
+    technique_name = document.headings[0].value
+    metadata = document.paragraphs[1]
+    tmfk_id = metadata.texts[0].split(":")[-1].strip()
+    t = [a.value for a in metadata.links]
+    mitre_attack_techniques = list(filter(lambda x: x.startswith("T"), t))
+    tmfk_tactics = [
+        t.replace(" ", "-").lower()
+        for t in list(filter(lambda x: not x.startswith("T"), t))
+    ]
+
+    page_name = technique_name.replace(" ", "%20")
+    return TechniqueRecord(
+        tmfk_id=tmfk_id,
+        name=technique_name,
+        description="\n\n".join(
+            [handle_description_markup(p) for p in document.paragraphs[2:]]
+        ),
+        url=f"https://microsoft.github.io/Threat-Matrix-for-Kubernetes/techniques/{page_name}",
+        tactics=tmfk_tactics,
+        attack_ids=mitre_attack_techniques,
+    )
+
+
+def craft_mitigation_url(
+    tmfk_id: str, mitigation_name: str, parent_mitigations: list
+) -> str:
+    mid = "/"
+    if len(parent_mitigations) != 0:
+        mid = f"/{parent_mitigations[0]}/"
+    return (
+        "https://microsoft.github.io/Threat-Matrix-for-Kubernetes/mitigations"
+        + mid
+        + f"{tmfk_id}%20{mitigation_name.replace(' ', '%20')}/"
+    )
+
+
+def mitigation_from_document(document: MarkdownDocument) -> MitigationRecord:
+    mitigation_name = document.headings[0].value
+    metadata = document.paragraphs[1]
+    tmfk_id = metadata.texts[0].split(":")[-1].strip()
+
+    mitre_attack_mitigations = []
+    parent_mitigations = []
+
+    if len(metadata.texts) > 1:
+        if "MITRE mitigation: -" not in metadata.texts:
+            t = [a.value for a in metadata.links]
+            mitre_attack_mitigations = list(
+                filter(lambda x: x.startswith("M") and not x.startswith("MS"), t)
+            )
+            parent_mitigations = list(filter(lambda x: x.startswith("MS"), t))
+
+    parent_mitigation = None
+    if len(parent_mitigations) != 0:
+        parent_mitigation = parent_mitigations[0]
+
+    tids = []
+    for row in document.tables[0]:
+        tids.append(row[0].links[0].value)
+
+    return MitigationRecord(
+        tmfk_id=tmfk_id,
+        name=mitigation_name,
+        description="\n\n".join(
+            [
+                handle_description_markup(p)
+                for p in document.paragraphs[2:]
+                if p.value is not None and "!!!" not in p.value
+            ]
+        ),
+        url=craft_mitigation_url(
+            tmfk_id=tmfk_id,
+            mitigation_name=mitigation_name,
+            parent_mitigations=parent_mitigations,
+        ),
+        attack_ids=mitre_attack_mitigations,
+        parent_mitigation=parent_mitigation,
+        technique_ids=tids,
+    )
+
+
+def extract_tactic(content: str, tactic_name: str) -> TacticRecord:
+    return tactic_from_document(parse_document(content), tactic_name)
+
+
+def extract_technique(content: str) -> TechniqueRecord:
+    return technique_from_document(parse_document(content))
+
+
+def extract_mitigation(content: str) -> MitigationRecord:
+    return mitigation_from_document(parse_document(content))
@@ -1,20 +1,44 @@
+import logging
+import os
+import time
 from datetime import datetime
+from pathlib import Path
 
 import git
+from metrics import METRICS, count, span
 
+logger = logging.getLogger(__name__)
 
-def get_first_commit_date(repo_path: str) -> str:
-    repo = git.Repo(repo_path)
-    return list(repo.iter_commits(paths="LICENSE"))[-1].committed_datetime
 
+def open_repo(repo_path) -> git.Repo:
+    """``repo_path`` itself when it is an open repository, a new one otherwise."""
+    return repo_path if isinstance(repo_path, git.Repo) else git.Repo(repo_path)
 
-def get_last_commit_hash(repo_path: str):
-    repo = git.Repo(repo_path)
-    return repo.commit("main").hexsha[:7]
+
+def get_first_commit_date(repo_path: str, rev: str = None) -> str:
+    with span("get_first_commit_date", "git", rev=rev):
+        repo = open_repo(repo_path)
+        return list(repo.iter_commits(rev, paths="LICENSE"))[-1].committed_datetime
+
+
+def get_last_commit_hash(repo_path: str, rev: str = "main"):
+    with span("get_last_commit_hash", "git", rev=rev):
+        repo = open_repo(repo_path)
+        return repo.commit(rev).hexsha[:7]
+
+
+def get_commit_history(repo_path: str) -> list[tuple[str, datetime]]:
+    """Short hashes and dates of the commits of ``main``, newest first."""
+    with span("get_commit_history", "git"):
+        repo = open_repo(repo_path)
+        return [
+            (commit.hexsha[:7], commit.committed_datetime)
+            for commit in repo.iter_commits("main")
+        ]
 
 
 def get_file_creation_date(repo_path: str, file_path: str) -> datetime:
-    repo = git.Repo(repo_path)
+    repo = open_repo(repo_path)
     commits = list(repo.iter_commits(paths=file_path))
     if commits and len(commits):
         return commits[-1].committed_datetime
@@ -22,8 +46,208 @@ def get_file_creation_date(repo_path: str, file_path: str) -> datetime:
 
 
 def get_file_modification_date(repo_path: str, file_path: str) -> datetime:
-    repo = git.Repo(repo_path)
+    repo = open_repo(repo_path)
     commits = list(repo.iter_commits(paths=file_path))
     if commits and len(commits):
         return commits[0].committed_datetime
     return None
+
+
+class GitLog:
+    """Commits of ``rev`` with their parents and the files they change.
+
+    The whole history is read with a single ``git log --name-status`` call,
+    newest commit first. It serves the :class:`GitHistoryIndex` of ``rev`` and
+    of every older commit of its history, without walking it again.
+    """
+
+    def __init__(self, repo_path: str, rev: str = "HEAD") -> None:
+        started = time.perf_counter()
+        self.repo = open_repo(repo_path)
+        self.rev = rev
+        self.root = Path(self.repo.working_tree_dir)
+        # Hash, parents, date and the (status, old path, path) changes.
+        self.commits: list[tuple[str, tuple, datetime, list[tuple]]] = []
+        with span("git log", "git", rev=rev):
+            output = self.repo.git.log(
+                rev, "-z", "--name-status", "--find-renames", "--format=%x01%H %cI %P"
+            )
+
+        changes = None
+        tokens = iter(output.split("\0"))
+        for token in tokens:
+            token = token.lstrip("\n")
+            if token.startswith("\x01"):
+                sha, committed, *parents = token[1:].split()
+                changes = []
+                self.commits.append(
+                    (sha, tuple(parents), datetime.fromisoformat(committed), changes)
+                )
+            elif token and token[0] in "RC":
+                changes.append((token[0], next(tokens), next(tokens)))
+            elif token:
+                changes.append((token[0], None, next(tokens)))
+
+        self.positions = {commit[0]: i for i, commit in enumerate(self.commits)}
+        self.seconds = time.perf_counter() - started
+
+    def ancestors(self, sha: str) -> set[str]:
+        """``sha`` and the commits of its history, empty when not logged."""
+        seen = set()
+        pending = [sha]
+        while pending:
+            current = pending.pop()
+            if current in seen or current not in self.positions:
+                continue
+            seen.add(current)
+            pending.extend(self.commits[self.positions[current]][1])
+        return seen
+
+
+class GitHistoryIndex:
+    """Creation and modification dates of every file in a repository.
+
+    The dates are replayed from a :class:`GitLog`, newest commit first.
+    Renames are followed, so a renamed file keeps the creation date of its
+    original path. ``log`` is the log of a newer commit whose history contains
+    ``rev``; it is read for ``rev`` alone otherwise.
+    """
+
+    def __init__(self, repo_path: str, rev: str = "HEAD", log: GitLog = None) -> None:
+        self.repo_path = repo_path
+        self.rev = rev
+        self.commits = 0
+        self.lookups = 0
+        self.build_seconds = 0.0
+        self._root = None
+        self._dates: dict[str, tuple[datetime, datetime]] = {}
+        self._last_lookup = None
+        self._build(log)
+
+    def _build(self, log: GitLog = None) -> None:
+        started = time.perf_counter()
+        commits = None
+        if log is not None:
+            sha = self.rev if self.rev in log.positions else None
+            if sha is None:
+                sha = open_repo(self.repo_path).commit(self.rev).hexsha
+            reachable = log.ancestors(sha)
+            if reachable:
+                commits = [commit for commit in log.commits if commit[0] in reachable]
+        if commits is None:
+            log = GitLog(self.repo_path, self.rev)
+            commits = log.commits
+        self._root = log.root
+
+        renamed_to = {}
+        for _, _, committed, changes in commits:
+            self.commits += 1
+            for status, old_path, path in changes:
+                path = renamed_to.get(path, path)
+                if status == "R":
+                    renamed_to[old_path] = path
+                modified = self._dates.get(path, (None, committed))[1]
+                self._dates[path] = (committed, modified)
+
+        self.build_seconds = time.perf_counter() - started
+        logger.info(
+            "Indexed git history of %d files from %d commits in %.3fs",
+            len(self._dates),
+            self.commits,
+            self.build_seconds,
+        )
+
+    def _key(self, file_path: str) -> str:
+        return Path(os.path.relpath(os.path.abspath(file_path), self._root)).as_posix()
+
+    def get_file_creation_date(self, file_path: str) -> datetime:
+        count("git history lookups")
+        self.lookups += 1
+        self._last_lookup = file_path
+        dates = self._dates.get(self._key(file_path))
+        return dates[0] if dates else None
+
+    def get_file_modification_date(self, file_path: str) -> datetime:
+        count("git history lookups")
+        self.lookups += 1
+        self._last_lookup = file_path
+        dates = self._dates.get(self._key(file_path))
+        return dates[1] if dates else None
+
+    def log_savings(self) -> None:
+        """Log the time saved compared to walking the history once per lookup.
+
+        The cost of a per-file walk is estimated by timing a single one, so
+        nothing is logged unless metrics are enabled or debug logging is on.
+        """
+        if not self.lookups:
+            return
+        if not (METRICS.enabled or logger.isEnabledFor(logging.DEBUG)):
+            return
+        started = time.perf_counter()
+        get_file_modification_date(self.repo_path, self._last_lookup)
+        walk_seconds = time.perf_counter() - started
+        logger.info(
+            "Git history index served %d lookups, saving about %.3fs "
+            "(%.4fs per history walk, %.3fs to build the index)",
+            self.lookups,
+            self.lookups * walk_seconds - self.build_seconds,
+            walk_seconds,
+            self.build_seconds,
+        )
+
+
+class RepoContext:
+    """An upstream repository opened once for the whole build.
+
+    ``git.Repo`` keeps its ``git cat-file --batch`` processes running, so every
+    query of the build goes through the same few git processes instead of
+    spawning new ones. Facts about the repository are memoized by revision.
+    The context also serves the file dates of :attr:`history`:
+    :func:`parse.read_tmfk` gives it to :func:`parse.stamp_dates`, which
+    accepts it in place of a :class:`GitHistoryIndex`.
+    """
+
+    def __init__(self, repo_path: str, rev: str = "HEAD") -> None:
+        self.repo_path = repo_path
+        self.rev = rev
+        self.repo = git.Repo(repo_path)
+        self._facts = {}
+        self._history = None
+
+    def _memoized(self, key: tuple, query, *args):
+        if key not in self._facts:
+            self._facts[key] = query(self.repo, *args)
+        return self._facts[key]
+
+    def first_commit_date(self, rev: str = None) -> datetime:
+        return self._memoized(("first_commit_date", rev), get_first_commit_date, rev)
+
+    def last_commit_hash(self, rev: str = "main") -> str:
+        return self._memoized(("last_commit_hash", rev), get_last_commit_hash, rev)
+
+    def commit_history(self) -> list[tuple[str, datetime]]:
+        return self._memoized(("commit_history",), get_commit_history)
+
+    @property
+    def history(self) -> GitHistoryIndex:
+        if self._history is None:
+            self._history = GitHistoryIndex(repo_path=self.repo, rev=self.rev)
+        return self._history
+
+    def get_file_creation_date(self, file_path: str) -> datetime:
+        return self.history.get_file_creation_date(file_path)
+
+    def get_file_modification_date(self, file_path: str) -> datetime:
+        return self.history.get_file_modification_date(file_path)
+
+    def read_blob(self, sha: str) -> str:
+        return self.repo.odb.stream(bytes.fromhex(sha)).read().decode("utf-8")
+
+    def clear(self) -> None:
+        """Forget the memoized facts, after the repository moved on."""
+        self._facts.clear()
+        self._history = None
+
+    def close(self) -> None:
+        self.repo.close()
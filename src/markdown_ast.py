@@ -0,0 +1,203 @@
+"""Structure of TMFK markdown documents read straight from the marko AST.
+
+The parsers used to render every document to HTML with ``gfm`` and parse the
+HTML back with ``html_to_json``. :func:`parse_document` walks the parsed marko
+AST instead and keeps only what the parsers look at, exactly as the HTML round
+trip exposed it: the direct text runs, links and code spans of the top-level
+level 1 headings, paragraphs and table cells.
+
+Raw HTML blocks and inline tags other than ``<br>`` can reshape the document
+once an HTML parser reads them, so such documents fall back to the HTML round
+trip in :func:`parse_document_html`.
+
+Run this module to check that both paths agree on the upstream documents and
+to compare their speed::
+
+    python src/markdown_ast.py [DOCS_PATH]
+"""
+
+import html
+import re
+from dataclasses import dataclass, field
+
+import html_to_json
+from marko import block, inline
+from marko.ext.gfm import elements, gfm
+from metrics import span
+
+BR_TAG = re.compile(r"<br\s*/?>", re.IGNORECASE)
+
+TEXT_ELEMENTS = (inline.RawText, inline.Literal)
+LINK_ELEMENTS = (inline.Link, inline.AutoLink)
+
+
+class UnsupportedMarkup(Exception): ...
+
+
+@dataclass
+class Node:
+    """An element as ``html_to_json`` saw it."""
+
+    texts: list[str] = field(default_factory=list)
+    links: list["Node"] = field(default_factory=list)
+    codes: list[str] = field(default_factory=list)
+
+    @property
+    def value(self) -> str:
+        """The text of an element with a single text run, ``None`` otherwise."""
+        return self.texts[0] if len(self.texts) == 1 else None
+
+
+@dataclass
+class MarkdownDocument:
+    headings: list[Node] = field(default_factory=list)
+    paragraphs: list[Node] = field(default_factory=list)
+    tables: list[list[list[Node]]] = field(default_factory=list)
+
+
+def _inline_node(children: list) -> Node:
+    node = Node()
+    run = []
+
+    def flush() -> None:
+        text = "".join(run).strip()
+        if text:
+            node.texts.append(text)
+        run.clear()
+
+    for child in children:
+        if isinstance(child, TEXT_ELEMENTS):
+            run.append(html.unescape(child.children))
+        elif isinstance(child, inline.LineBreak) and child.soft:
+            run.append("\n")
+        else:
+            flush()
+            if isinstance(child, LINK_ELEMENTS):
+                node.links.append(_inline_node(child.children))
+            elif isinstance(child, inline.CodeSpan):
+                node.codes.append(child.children.strip())
+            elif isinstance(child, inline.InlineHTML):
+                if not BR_TAG.fullmatch(child.children):
+                    raise UnsupportedMarkup(child.children)
+    flush()
+
+    return node
+
+
+def _walk(document: block.Document) -> MarkdownDocument:
+    result = MarkdownDocument()
+    for child in document.children:
+        if isinstance(child, (block.Heading, block.SetextHeading)):
+            if child.level == 1:
+                result.headings.append(_inline_node(child.children))
+        elif isinstance(child, block.Paragraph):
+            if hasattr(child, "checked"):
+                raise UnsupportedMarkup("task list paragraph")
+            result.paragraphs.append(_inline_node(child.children))
+        elif isinstance(child, elements.Table):
+            result.tables.append(
+                [
+                    [_inline_node(cell.children) for cell in row.children]
+                    for row in child.children[1:]
+                ]
+            )
+        elif isinstance(child, block.HTMLBlock):
+            raise UnsupportedMarkup(child.body)
+    return result
+
+
+def _html_node(element: dict) -> Node:
+    texts = []
+    if "_values" in element:
+        texts = element["_values"]
+    elif "_value" in element:
+        texts = [element["_value"]]
+
+    return Node(
+        texts=texts,
+        links=[_html_node(a) for a in element.get("a", [])],
+        codes=[code.get("_value", "") for code in element.get("code", [])],
+    )
+
+
+def parse_document_html(content: str) -> MarkdownDocument:
+    """Read a document through the ``gfm`` and ``html_to_json`` round trip."""
+    with span("gfm", "markdown"):
+        rendered = gfm(content)
+    with span("html_to_json", "markdown"):
+        json_content = html_to_json.convert(rendered)
+    return MarkdownDocument(
+        headings=[_html_node(h1) for h1 in json_content.get("h1", [])],
+        paragraphs=[_html_node(p) for p in json_content.get("p", [])],
+        tables=[
+            [
+                [_html_node(td) for td in tr.get("td", [])]
+                for tbody in table.get("tbody", [])
+                for tr in tbody.get("tr", [])
+            ]
+            for table in json_content.get("table", [])
+        ],
+    )
+
+
+def parse_document(content: str) -> MarkdownDocument:
+    """Read a document from its marko AST.
+
+    Parameters
+    ----------
+    content : str
+        markdown content of the document
+
+    Returns
+    -------
+    MarkdownDocument
+        headings, paragraphs and table rows of the document
+    """
+    try:
+        with span("gfm.parse", "markdown"):
+            ast = gfm.parse(content)
+        with span("walk", "markdown"):
+            return _walk(ast)
+    except UnsupportedMarkup:
+        return parse_document_html(content)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from pathlib import Path
+
+    from constants import TMFK_PATH
+
+    docs_path = Path(sys.argv[1]) if len(sys.argv) > 1 else TMFK_PATH / "docs"
+    contents = {
+        path: path.read_text(encoding="utf-8") for path in docs_path.rglob("*.md")
+    }
+
+    timings = {}
+    results = {}
+    for name, parse in (("html", parse_document_html), ("ast", parse_document)):
+        started = time.perf_counter()
+        results[name] = {path: parse(content) for path, content in contents.items()}
+        timings[name] = time.perf_counter() - started
+
+    fallbacks = 0
+    for content in contents.values():
+        try:
+            _walk(gfm.parse(content))
+        except UnsupportedMarkup:
+            fallbacks += 1
+
+    mismatches = [
+        path for path in contents if results["html"][path] != results["ast"][path]
+    ]
+    for path in mismatches:
+        print(f"MISMATCH {path}")
+    print(
+        f"{len(contents)} documents ({fallbacks} with raw HTML), "
+        f"{len(mismatches)} mismatches; "
+        f"html round trip {timings['html']:.3f}s, "
+        f"marko AST {timings['ast']:.3f}s "
+        f"({timings['html'] / timings['ast']:.1f}x faster)"
+    )
+    sys.exit(1 if mismatches else 0)
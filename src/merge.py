@@ -0,0 +1,229 @@
+"""Merge of TMFK bundles with ATT&CK and other collections.
+
+The bundles are streamed twice with :func:`bundle_io.iter_bundle_objects`, so
+memory use grows with the number of objects, not with their content:
+
+1. the first pass keeps, for every id, where its most recent version is
+   (highest ``modified``, or ``created``, the first bundle wins a tie or
+   objects with neither) and the ATT&CK ids of the techniques and
+   mitigations;
+2. the second pass writes every most recent version once.
+
+The collections of the inputs are replaced by a single ``x-mitre-collection``
+listing the merged objects. Objects naming ATT&CK ids in ``x_mitre_ids``, such
+as TMFK techniques, get a ``related-to`` relationship to every ATT&CK object
+with one of these ids. TMFK objects of the ATT&CK compatible mode share the
+``mitre-attack`` source of ATT&CK, so their ``MS-`` ids are not ATT&CK ids.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from bundle_io import BundleWriter, iter_bundle_objects
+from constants import (
+    ATTACK_SPEC_VERSION,
+    CREATOR_IDENTITY,
+    TMFK_ID_PREFIX,
+    TMFK_VERSION,
+)
+from utils import create_uuid_from_string
+
+logger = logging.getLogger(__name__)
+
+ATTACK_SOURCE = "mitre-attack"
+LINKED_TYPES = ("attack-pattern", "course-of-action")
+# Objects without a timestamp, such as some marking definitions, are older
+# than any version with one.
+UNDATED = datetime.min.replace(tzinfo=timezone.utc)
+
+
+class Version(NamedTuple):
+    modified: datetime
+    bundle: int
+    position: int
+    timestamp: str
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return UNDATED if value is None else datetime.fromisoformat(value)
+
+
+def _attack_id(obj: dict) -> str:
+    for reference in obj.get("external_references", []):
+        external_id = reference.get("external_id") or ""
+        if reference.get("source_name") == ATTACK_SOURCE and not (
+            external_id.startswith(TMFK_ID_PREFIX)
+        ):
+            return external_id
+    return None
+
+
+class MergePlan:
+    """Most recent version of every object, read in a first pass."""
+
+    def __init__(self, paths: list[Path]) -> None:
+        self.paths = paths
+        self.versions: dict[str, Version] = {}
+        self.collections: list[dict] = []
+        self.attack_ids: dict[str, str] = {}
+        self.links: dict[str, list[str]] = {}
+        self.duplicates = 0
+
+        for bundle, path in enumerate(paths):
+            for position, obj in enumerate(iter_bundle_objects(path)):
+                self._add(bundle, position, obj)
+
+    def _add(self, bundle: int, position: int, obj: dict) -> None:
+        if obj["type"] == "x-mitre-collection":
+            self.collections.append(
+                {key: value for key, value in obj.items() if key != "x_mitre_contents"}
+            )
+            return
+
+        timestamp = obj.get("modified", obj.get("created"))
+        version = Version(_parse_timestamp(timestamp), bundle, position, timestamp)
+        current = self.versions.get(obj["id"])
+        if current is not None:
+            self.duplicates += 1
+            if version.modified <= current.modified:
+                return
+        self.versions[obj["id"]] = version
+
+        # The lists are rebuilt from the winning version of the object.
+        self.attack_ids.pop(obj["id"], None)
+        self.links.pop(obj["id"], None)
+        if obj.get("revoked") or obj.get("x_mitre_deprecated"):
+            return
+        if obj["type"] in LINKED_TYPES and _attack_id(obj) is not None:
+            self.attack_ids[obj["id"]] = _attack_id(obj)
+        if obj.get("x_mitre_ids") and timestamp is not None:
+            self.links[obj["id"]] = list(obj["x_mitre_ids"])
+
+    def related(self) -> list[dict]:
+        """``related-to`` relationships from ``x_mitre_ids`` to ATT&CK objects."""
+        by_attack_id = {}
+        for stix_id, attack_id in sorted(self.attack_ids.items()):
+            by_attack_id.setdefault(attack_id, []).append(stix_id)
+
+        relationships = []
+        for source_ref, attack_ids in self.links.items():
+            source = self.versions[source_ref]
+            for attack_id in attack_ids:
+                for target_ref in by_attack_id.get(attack_id, []):
+                    relationship_id = "relationship--" + str(
+                        create_uuid_from_string(
+                            val=f"microsoft.tmfk.relationship.related-to.{source_ref}.{target_ref}"
+                        )
+                    )
+                    if target_ref == source_ref or relationship_id in self.versions:
+                        continue
+                    relationships.append(
+                        {
+                            "type": "relationship",
+                            "spec_version": "2.1",
+                            "id": relationship_id,
+                            "created_by_ref": CREATOR_IDENTITY,
+                            "created": source.timestamp,
+                            "modified": source.timestamp,
+                            "relationship_type": "related-to",
+                            "description": f"Related to {attack_id}",
+                            "source_ref": source_ref,
+                            "target_ref": target_ref,
+                            "x_mitre_version": TMFK_VERSION,
+                            "x_mitre_attack_spec_version": ATTACK_SPEC_VERSION,
+                            "x_mitre_modified_by_ref": CREATOR_IDENTITY,
+                        }
+                    )
+        return relationships
+
+    def collection(self, related: list[dict], name: str) -> dict:
+        """The collection of the merged objects, in the order they are written."""
+        contents = [
+            (
+                {"object_ref": stix_id, "object_modified": version.timestamp}
+                if version.timestamp is not None
+                else {"object_ref": stix_id}
+            )
+            for stix_id, version in sorted(
+                self.versions.items(),
+                key=lambda item: (item[1].bundle, item[1].position),
+            )
+        ]
+        contents += [
+            {"object_ref": obj["id"], "object_modified": obj["modified"]}
+            for obj in related
+        ]
+        inputs = sorted(collection["id"] for collection in self.collections)
+        latest = max(self.versions.values(), key=lambda version: version.modified)
+        created = [
+            (_parse_timestamp(c["created"]), c["created"])
+            for c in self.collections
+            if "created" in c
+        ]
+        return {
+            "type": "x-mitre-collection",
+            "spec_version": "2.1",
+            "id": "x-mitre-collection--"
+            + str(create_uuid_from_string(val="merge." + ".".join(inputs))),
+            "created_by_ref": CREATOR_IDENTITY,
+            "created": min(created)[1] if created else latest.timestamp,
+            "modified": latest.timestamp,
+            "name": name,
+            "description": "Merge of "
+            + ", ".join(
+                dict.fromkeys(c.get("name", c["id"]) for c in self.collections)
+            ),
+            "x_mitre_attack_spec_version": ATTACK_SPEC_VERSION,
+            "x_mitre_version": TMFK_VERSION,
+            "x_mitre_contents": contents,
+        }
+
+
+def merge_bundles(
+    paths: list[Path], output_path: Path, name: str = "Merged collection"
+) -> int:
+    """Merge the bundles at ``paths`` into ``output_path``.
+
+    Returns
+    -------
+    int
+        number of objects in the merged bundle
+    """
+    output_path = Path(output_path)
+    plan = MergePlan(paths)
+    related = plan.related()
+    collection = plan.collection(related, name)
+
+    digest = hashlib.sha256(json.dumps(collection, sort_keys=True).encode("utf-8"))
+    bundle_id = "bundle--" + str(create_uuid_from_string(digest.hexdigest()))
+    partial = output_path.with_name(f".{output_path.name}.tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        with BundleWriter(f, bundle_id=bundle_id) as bundle:
+            bundle.write_serialized(json.dumps(collection, indent=4))
+            for index, path in enumerate(paths):
+                for position, obj in enumerate(iter_bundle_objects(path)):
+                    winner = plan.versions.get(obj["id"])
+                    if (
+                        winner is not None
+                        and winner.bundle == index
+                        and winner.position == position
+                    ):
+                        bundle.write_serialized(json.dumps(obj, indent=4))
+            for obj in related:
+                bundle.write_serialized(json.dumps(obj, indent=4))
+    partial.replace(output_path)
+
+    logger.info(
+        "Merged %d bundles into %s: %d objects, %d duplicates dropped, "
+        "%d related-to relationships",
+        len(paths),
+        output_path.name,
+        bundle.count,
+        plan.duplicates,
+        len(related),
+    )
+    return bundle.count
@@ -0,0 +1,175 @@
+"""Opt-in timing spans and counters of the build.
+
+Instrumented code opens a :func:`span` around a parser call, a git query or
+the serialization of an object, and bumps counters with :func:`count`. Nothing
+is recorded until :func:`enable` is called, a disabled span costs a function
+call. At the end of the build :func:`write_metrics` writes a JSON summary:
+time per span name, per-file bytes and parse time, counters and peak resident
+memory. :func:`write_trace` writes every span in the Chrome trace event format,
+to be opened in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+Worker processes record their own spans through :func:`traced_call`, which
+returns them to the parent along with the result.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_DISABLED = nullcontext()
+
+
+def peak_rss() -> dict[str, int]:
+    """Peak resident memory in bytes of this process and of its children."""
+    if resource is None:
+        return {}
+    # Linux reports kilobytes, macOS bytes.
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.events: list[dict] = []
+        self.counters: Counter = Counter()
+        self.files: dict[str, Counter] = defaultdict(Counter)
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.started = time.perf_counter()
+
+    def span(self, name: str, category: str, **args):
+        if not self.enabled:
+            return _DISABLED
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name: str, category: str, args: dict):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "start": started,
+                    "seconds": time.perf_counter() - started,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+    def count(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += value
+
+    def count_file(self, path, **values: int) -> None:
+        if self.enabled:
+            self.files[os.path.normpath(path)].update(values)
+
+    def merge(self, events: list[dict]) -> None:
+        self.events.extend(events)
+
+    def summary(self) -> dict:
+        spans = {}
+        for event in self.events:
+            entry = spans.setdefault(
+                event["name"],
+                {"category": event["cat"], "count": 0, "seconds": 0.0, "max": 0.0},
+            )
+            entry["count"] += 1
+            entry["seconds"] += event["seconds"]
+            entry["max"] = max(entry["max"], event["seconds"])
+
+        files = {path: dict(values) for path, values in self.files.items()}
+        for event in self.events:
+            if "file" in event["args"]:
+                values = files.setdefault(os.path.normpath(event["args"]["file"]), {})
+                key = f"{event['name']}_seconds"
+                values[key] = values.get(key, 0.0) + event["seconds"]
+
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "peak_rss_bytes": peak_rss(),
+            "spans": dict(sorted(spans.items(), key=lambda item: -item[1]["seconds"])),
+            "counters": dict(sorted(self.counters.items())),
+            "files": dict(sorted(files.items())),
+        }
+
+    def trace_events(self) -> list[dict]:
+        events = [
+            {
+                "name": event["name"],
+                "cat": event["cat"],
+                "ph": "X",
+                "ts": (event["start"] - self.started) * 1e6,
+                "dur": event["seconds"] * 1e6,
+                "pid": event["pid"],
+                "tid": event["tid"],
+                "args": {key: str(value) for key, value in event["args"].items()},
+            }
+            for event in sorted(self.events, key=lambda event: event["start"])
+        ]
+        rss = peak_rss()
+        if rss:
+            events.append(
+                {
+                    "name": "peak RSS",
+                    "ph": "C",
+                    "ts": (time.perf_counter() - self.started) * 1e6,
+                    "pid": os.getpid(),
+                    "args": rss,
+                }
+            )
+        return events
+
+
+METRICS = Metrics()
+
+enable = METRICS.enable
+span = METRICS.span
+count = METRICS.count
+count_file = METRICS.count_file
+
+
+def traced_call(func: Callable, *args, enabled: bool = True):
+    """Call ``func`` in a worker process.
+
+    Returns
+    -------
+    tuple
+        the result and the spans recorded during the call
+    """
+    if not enabled:
+        return func(*args), []
+    METRICS.enable()
+    METRICS.events = []
+    return func(*args), METRICS.events
+
+
+def write_metrics(path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(METRICS.summary(), f, indent=4)
+
+
+def write_trace(path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": METRICS.trace_events()}, f)
@@ -0,0 +1,71 @@
+"""Mode-independent records extracted from the TMFK markdown documents.
+
+The records are read once per build and projected into STIX objects for every
+:class:`constants.Mode`.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass
+class TacticRecord:
+    tactic_name: str
+    tmfk_id: str
+    display_name: str
+    description: str
+    url: str
+    created: datetime = None
+    modified: datetime = None
+
+
+@dataclass
+class TechniqueRecord:
+    tmfk_id: str
+    name: str
+    description: str
+    url: str
+    tactics: list[str] = field(default_factory=list)
+    attack_ids: list[str] = field(default_factory=list)
+    created: datetime = None
+    modified: datetime = None
+
+
+@dataclass
+class MitigationRecord:
+    tmfk_id: str
+    name: str
+    description: str
+    url: str
+    attack_ids: list[str] = field(default_factory=list)
+    parent_mitigation: str = None
+    technique_ids: list[str] = field(default_factory=list)
+    created: datetime = None
+    modified: datetime = None
+
+
+@dataclass
+class TmfkModel:
+    tactics: list[TacticRecord]
+    techniques: list[TechniqueRecord]
+    mitigations: list[MitigationRecord]
+    mitigation_folders: list[list[MitigationRecord]]
+    first_commit_date: datetime
+    commit_hash: str
+
+    @property
+    def records(self) -> list:
+        return (
+            self.tactics
+            + self.techniques
+            + self.mitigations
+            + sum(self.mitigation_folders, [])
+        )
+
+    @property
+    def last_modified(self) -> datetime:
+        """Date of the latest change to any document of the matrix."""
+        return max(
+            (r.modified for r in self.records if r.modified is not None),
+            default=self.first_commit_date,
+        )
@@ -0,0 +1,92 @@
+"""Parallel extraction of records from TMFK markdown documents.
+
+Every document is independent CPU-bound markdown work, so cache misses are
+fanned out over a process pool. Results are gathered in the order of the jobs,
+which keeps the output identical to a serial run.
+"""
+
+from typing import Callable, NamedTuple
+
+from cache import DocumentCache
+from joblib import Parallel, delayed
+from metrics import METRICS, count_file, span, traced_call
+
+
+class DocumentJob(NamedTuple):
+    kind: str
+    file_path: str
+    extract: Callable[[str], object]
+    record_type: type
+
+
+def extract_documents(
+    jobs: list[DocumentJob], cache: DocumentCache = None, workers: int = 1
+) -> list:
+    """Extract the records of many documents.
+
+    Parameters
+    ----------
+    jobs : list[DocumentJob]
+        documents to extract; ``extract`` must be picklable
+    cache : DocumentCache, optional
+        cache consulted before extracting a document
+    workers : int, optional
+        size of the process pool, ``-1`` uses every core
+
+    Returns
+    -------
+    list
+        the records, in the order of ``jobs``
+    """
+    contents = []
+    for job in jobs:
+        with span("read", "io", file=job.file_path):
+            with open(job.file_path, "r", encoding="utf-8") as f:
+                contents.append(f.read())
+    return extract_contents(jobs, contents, cache=cache, workers=workers)
+
+
+def extract_contents(
+    jobs: list[DocumentJob],
+    contents: list[str],
+    cache: DocumentCache = None,
+    workers: int = 1,
+) -> list:
+    """Extract the records of documents already read, such as git blobs."""
+    records = [None] * len(jobs)
+    if cache is not None:
+        records = [
+            cache.get(job.kind, content, job.record_type)
+            for job, content in zip(jobs, contents)
+        ]
+
+    for job, content, record in zip(jobs, contents, records):
+        count_file(
+            job.file_path, bytes=len(content), cache_hits=int(record is not None)
+        )
+
+    pending = [i for i, record in enumerate(records) if record is None]
+    if workers == 1 or len(pending) < 2:
+        extracted = [_extract(jobs[i], contents[i]) for i in pending]
+    else:
+        traced = Parallel(n_jobs=workers)(
+            delayed(traced_call)(
+                _extract, jobs[i], contents[i], enabled=METRICS.enabled
+            )
+            for i in pending
+        )
+        extracted = [record for record, _ in traced]
+        for _, events in traced:
+            METRICS.merge(events)
+
+    for i, record in zip(pending, extracted):
+        records[i] = record
+        if cache is not None:
+            cache.put(jobs[i].kind, contents[i], record)
+
+    return records
+
+
+def _extract(job: DocumentJob, content: str):
+    with span("extract", "parse", file=job.file_path, kind=job.kind):
+        return job.extract(content)
@@ -1,14 +1,25 @@
+import dataclasses
 import os
-from datetime import datetime
+from functools import cache, partial
 from pathlib import Path
+from typing import Callable, Iterator
 
+from batch import BatchFactory
+from bundle_diff import (
+    diff_bundles,
+    find_previous_bundle,
+    log_delta,
+    read_bundle_objects,
+    write_delta,
+)
+from bundle_io import iter_bundle_objects, link_or_copy, write_bundle
+from cache import DocumentCache
 from constants import (
     ATTACK_SPEC_VERSION,
+    BUILD_PATH,
     CREATOR_IDENTITY,
     DEFAULT_CREATOR_JSON,
-    MITIGATIONS_PATH,
-    TACTICS_PATH,
-    TECHNIQUES_PATH,
+    INDEX_PATH,
     TMFK_PATH,
     TMFK_TACTICS_MAP,
     TMFK_VERSION,
@@ -18,86 +29,241 @@ from constants import (
     get_tmfk_domain,
     get_tmfk_source,
 )
+from crosswalk import build_crosswalk, write_crosswalk
 from custom_tmfk_objects import Collection, ObjectRef, Relationship
-from git_tools import get_last_commit_hash, get_first_commit_date
+from extract import extract_mitigation, extract_tactic, extract_technique
+from git_tools import GitHistoryIndex, RepoContext
+from metrics import span
 from mitreattack.stix20.custom_attack_objects import Matrix
-from parse_mitigation import handle_folder, parse_mitigation
-from parse_tactic import parse_tactic
-from parse_technique import parse_technique
-from stix2 import Bundle, parse
+from models import MitigationRecord, TacticRecord, TechniqueRecord, TmfkModel
+from parallel import DocumentJob, extract_documents
+from parse_mitigation import (
+    build_mitigation,
+    get_mitigation_stix_id,
+    list_mitigations,
+)
+from parse_tactic import build_tactic
+from parse_technique import build_technique, get_technique_stix_id
+from release_index import check_compressions, regenerate_index
+from search import build_search_index, write_search_index
+from serialization import SerializationCache
+from stix2 import CourseOfAction, parse
+from tmfk_sqlite import write_sqlite
+from utils import create_uuid_from_string
 
 
-def parse_tmfk(mode: ModeEnumAttribute) -> None:
-    tactics = {}
-    objects = []
-    techniques = {}
+def list_documents(
+    tmfk_path: Path = TMFK_PATH, listdir: Callable = os.listdir
+) -> list[DocumentJob]:
+    """Extraction jobs of every TMFK document: tactics, techniques, mitigations.
+
+    ``listdir`` lists the names in a folder, it reads another tree than the
+    working tree of ``tmfk_path``, such as the tree of a commit.
+    """
+    docs_path = Path(tmfk_path) / "docs"
+    techniques_path = docs_path / "techniques"
+    mitigation_files, folders = list_mitigations(docs_path / "mitigations", listdir)
 
-    for tactic_name in TMFK_TACTICS_MAP:
-        tactic_file = TACTICS_PATH / tactic_name / "index.md"
-        tactic = parse_tactic(tactic_file, tactic_name, mode)
-        objects.append(tactic)
-        tactics[tactic_name] = tactic
-
-    techniques_listing = os.listdir(TECHNIQUES_PATH)
-    for _, file_name in enumerate(list(techniques_listing)):
-        file_path = os.path.join(TECHNIQUES_PATH, file_name)
-        technique = parse_technique(file_path=file_path, mode=mode)
-        techniques[technique.get_id(mode)] = technique
-        objects.append(technique)
-
-    mitigations_listing = list(
-        filter(
-            lambda x: x.endswith(".md") and x != "index.md",
-            os.listdir(MITIGATIONS_PATH),
+    jobs = [
+        DocumentJob(
+            kind=f"tactic:{tactic_name}",
+            file_path=docs_path / "tactics" / tactic_name / "index.md",
+            extract=partial(extract_tactic, tactic_name=tactic_name),
+            record_type=TacticRecord,
         )
+        for tactic_name in TMFK_TACTICS_MAP
+    ]
+    jobs += [
+        DocumentJob(
+            "technique",
+            os.path.join(techniques_path, file_name),
+            extract_technique,
+            TechniqueRecord,
+        )
+        for file_name in sorted(listdir(techniques_path))
+    ]
+    jobs += [
+        DocumentJob("mitigation", file_path, extract_mitigation, MitigationRecord)
+        for file_path in mitigation_files + sum(folders, [])
+    ]
+    return jobs
+
+
+def stamp_dates(
+    jobs: list[DocumentJob], records: list, history: GitHistoryIndex
+) -> None:
+    """Set the git dates of the documents of ``jobs`` on their records.
+
+    ``history`` is a :class:`GitHistoryIndex` or a :class:`RepoContext`.
+    """
+    for record, job in zip(records, jobs):
+        record.created = history.get_file_creation_date(file_path=job.file_path)
+        record.modified = history.get_file_modification_date(file_path=job.file_path)
+
+
+def assemble_model(
+    jobs: list[DocumentJob],
+    records: list,
+    tmfk_path: Path = TMFK_PATH,
+    rev: str = None,
+    repo: RepoContext = None,
+) -> TmfkModel:
+    """Group the records of :func:`list_documents` jobs into a model.
+
+    Mitigations of a subfolder of ``docs/mitigations`` form a folder. The
+    model describes the upstream commit ``rev``, ``main`` by default, read
+    from ``repo`` when it is already open.
+    """
+    repo = RepoContext(tmfk_path) if repo is None else repo
+    mitigations_path = Path(tmfk_path) / "docs" / "mitigations"
+    tactics, techniques, mitigations = [], [], []
+    folders: dict[Path, list[MitigationRecord]] = {}
+    for job, record in zip(jobs, records):
+        if job.record_type is TacticRecord:
+            tactics.append(record)
+        elif job.record_type is TechniqueRecord:
+            techniques.append(record)
+        elif Path(job.file_path).parent == mitigations_path:
+            mitigations.append(record)
+        else:
+            folders.setdefault(Path(job.file_path).parent, []).append(record)
+
+    return TmfkModel(
+        tactics=tactics,
+        techniques=techniques,
+        mitigations=mitigations,
+        mitigation_folders=list(folders.values()),
+        first_commit_date=repo.first_commit_date(rev),
+        commit_hash=repo.last_commit_hash(rev or "main"),
     )
 
-    folders = list(filter(lambda x: "." not in x, os.listdir(MITIGATIONS_PATH)))
-    for _, file_name in enumerate(mitigations_listing):
-        file_path = os.path.join(MITIGATIONS_PATH, file_name)
-        mitigation, ids = parse_mitigation(file_path=file_path)
-        objects.append(mitigation)
-
-        for idx in ids:
-            objects.append(
-                Relationship(
-                    source_ref=mitigation.id,
-                    description=mitigation.description.split(".")[0],
-                    relationship_type="mitigates",
-                    target_ref=techniques[idx].id,
-                    created_by_ref=CREATOR_IDENTITY,
-                    x_mitre_version=TMFK_VERSION,
-                    x_mitre_modified_by_ref=CREATOR_IDENTITY,
-                    x_mitre_attack_spec_version="2.1.0",
-                    x_mitre_domains=[get_tmfk_domain(mode=mode)],
+
+def read_tmfk(
+    repo: RepoContext, cache: DocumentCache = None, workers: int = 1
+) -> TmfkModel:
+    jobs = list_documents(repo.repo_path)
+    records = extract_documents(jobs, cache=cache, workers=workers)
+    stamp_dates(jobs, records, repo)
+    return assemble_model(jobs, records, repo.repo_path, repo=repo)
+
+
+def mitigates_factory(mode: ModeEnumAttribute) -> BatchFactory:
+    return BatchFactory(
+        Relationship,
+        "mitigates relationships",
+        relationship_type="mitigates",
+        created_by_ref=CREATOR_IDENTITY,
+        x_mitre_version=TMFK_VERSION,
+        x_mitre_modified_by_ref=CREATOR_IDENTITY,
+        x_mitre_attack_spec_version="2.1.0",
+        x_mitre_domains=[get_tmfk_domain(mode=mode)],
+    )
+
+
+def build_mitigates(
+    mitigation: CourseOfAction, technique_ids: tuple[str], factory: BatchFactory
+) -> list[Relationship]:
+    description = mitigation.description.split(".")[0]
+    return [
+        factory.build(
+            id="relationship--"
+            + str(
+                create_uuid_from_string(
+                    val=f"microsoft.tmfk.relationship.mitigates.{mitigation.id}.{technique_id}"
                 )
+            ),
+            created=mitigation.created,
+            modified=mitigation.modified,
+            description=description,
+            source_ref=mitigation.id,
+            target_ref=technique_id,
+        )
+        for technique_id in technique_ids
+    ]
+
+
+def memoized(memo: dict, record, build: Callable, *dependencies):
+    """Objects built from ``record``, reused while the record and its
+    dependencies stay the same.
+
+    The memo keeps a reference to the record, so its ``id`` is not reused.
+    """
+    entry = memo.get(id(record))
+    if entry is None or entry[0] is not record or entry[1] != dependencies:
+        with span(getattr(build, "func", build).__name__, "stix2", id=record.tmfk_id):
+            entry = (record, dependencies, build())
+        memo[id(record)] = entry
+    return entry[2]
+
+
+@cache
+def get_creator_identity():
+    return parse(data=DEFAULT_CREATOR_JSON, allow_custom=True)
+
+
+def build_tmfk(
+    model: TmfkModel,
+    mode: ModeEnumAttribute,
+    memo: dict = None,
+    shared_memo: dict = None,
+) -> Iterator:
+    """STIX objects of the matrix in bundle order.
+
+    ``memo`` keeps the objects of every record between calls, so only the
+    records replaced since the previous call of the same mode are rebuilt.
+    ``shared_memo`` keeps the objects that do not depend on the mode, the
+    mitigations, for the calls of every mode.
+    """
+    memo = {} if memo is None else memo
+    shared_memo = {} if shared_memo is None else shared_memo
+    relationships = mitigates_factory(mode)
+    tactic_refs = []
+    techniques = {}
+
+    for record in model.tactics:
+        tactic = memoized(memo, record, partial(build_tactic, record, mode))
+        tactic_refs.append(tactic.id)
+        yield tactic
+
+    for record in model.techniques:
+        technique = memoized(memo, record, partial(build_technique, record, mode))
+        techniques[record.tmfk_id] = technique.id
+        yield technique
+
+    def build_mitigations(records: list[MitigationRecord]) -> list[tuple]:
+        built = []
+        for record in records:
+            mitigation = memoized(
+                shared_memo, record, partial(build_mitigation, record)
             )
+            targets = tuple(techniques[t] for t in record.technique_ids)
+            mitigates = memoized(
+                memo,
+                record,
+                partial(build_mitigates, mitigation, targets, relationships),
+                targets,
+                mitigation,
+            )
+            built.append((mitigation, mitigates))
+        return built
 
-    for folder in folders:
-        mitigations, ids = handle_folder(folder=folder)
-        for key in mitigations:
-            objects.append(mitigations[key])
-
-        for idx in ids:
-            for t in ids[idx]:
-                objects.append(
-                    Relationship(
-                        source_ref=idx,
-                        description=mitigations[idx].description.split(".")[0],
-                        relationship_type="mitigates",
-                        target_ref=techniques[t].id,
-                        created_by_ref=CREATOR_IDENTITY,
-                        x_mitre_version=TMFK_VERSION,
-                        x_mitre_modified_by_ref=CREATOR_IDENTITY,
-                        x_mitre_attack_spec_version="2.1.0",
-                        x_mitre_domains=[get_tmfk_domain(mode=mode)],
-                    )
-                )
+    for mitigation, mitigates in build_mitigations(model.mitigations):
+        yield mitigation
+        yield from mitigates
 
-    matrix = Matrix(
-        tactic_refs=[tactics[t].id for t in tactics],
-        created=get_first_commit_date(repo_path=TMFK_PATH),
-        modified=datetime.now(),
+    for folder in model.mitigation_folders:
+        built = build_mitigations(folder)
+        for mitigation, _ in built:
+            yield mitigation
+        for _, mitigates in built:
+            yield from mitigates
+
+    yield Matrix(
+        id="x-mitre-matrix--"
+        + str(create_uuid_from_string(val="microsoft.tmfk.matrix")),
+        tactic_refs=tactic_refs,
+        created=model.first_commit_date,
+        modified=model.last_modified,
         created_by_ref=CREATOR_IDENTITY,
         external_references=[
             {
@@ -115,44 +281,177 @@ def parse_tmfk(mode: ModeEnumAttribute) -> None:
         x_mitre_domains=[get_tmfk_domain(mode=mode)],
         allow_custom=True,
     )
-    objects.append(matrix)
 
-    identity = parse(data=DEFAULT_CREATOR_JSON, allow_custom=True)
-    objects.append(identity)
+    yield get_creator_identity()
+    relationships.log_throughput()
+
 
-    collection = Collection(
+def build_collection(
+    refs: list[tuple], model: TmfkModel, mode: ModeEnumAttribute
+) -> Collection:
+    object_refs = BatchFactory(ObjectRef, "collection object refs")
+    contents = [
+        object_refs.build(object_ref=object_ref, object_modified=object_modified)
+        for object_ref, object_modified in refs
+    ]
+    object_refs.log_throughput()
+
+    return Collection(
         id=get_collection_id(mode=mode),
         spec_version="2.1",
         name="Threat Matrix for Kubernetes",
         description="The purpose of the threat matrix for Kubernetes is to conceptualize the known tactics, techniques, and procedures (TTP) that adversaries may use against Kubernetes environments. Inspired from MITRE ATT&CK, the threat matrix for Kubernetes is designed to give quick insight into a potential TTP that an adversary may be using in their attack campaign. The threat matrix for Kubernetes contains also mitigations specific to Kubernetes environments and attack techniques.",
-        created=get_first_commit_date(repo_path=TMFK_PATH),
-        modified=datetime.now(),
+        created=model.first_commit_date,
+        modified=model.last_modified,
         x_mitre_attack_spec_version=ATTACK_SPEC_VERSION,
         x_mitre_version=TMFK_VERSION,
         created_by_ref=CREATOR_IDENTITY,
-        x_mitre_contents=[
-            ObjectRef(object_ref=obj.id, object_modified=obj.modified)
-            for obj in objects
-        ],
+        x_mitre_contents=contents,
     )
 
-    bundle = Bundle(collection, objects, allow_custom=True)
-    commit_hash = get_last_commit_hash(TMFK_PATH)
-    output_file_last = (
-        Path(__file__).parent.parent / "build" / f"tmfk_{mode.name.lower()}.json"
+
+def parse_tmfk(
+    model: TmfkModel,
+    mode: ModeEnumAttribute,
+    output_path: Path = BUILD_PATH,
+    memo: dict = None,
+    release: bool = True,
+    shared_memo: dict = None,
+    serializer: SerializationCache = None,
+) -> None:
+    """Write the bundle of ``mode``.
+
+    A release also links the versioned bundle of the upstream commit and
+    exports the SQLite file; otherwise only the latest bundle is replaced.
+    Objects are serialized by ``serializer``, shared by the bundles of every
+    mode.
+    """
+    serializer = SerializationCache() if serializer is None else serializer
+    output_file_last = output_path / f"tmfk_{mode.name.lower()}.json"
+    write_bundle(
+        path=output_file_last,
+        objects=build_tmfk(model, mode, memo, shared_memo),
+        head=partial(build_collection, model=model, mode=mode),
+        serialize=serializer.serialize,
     )
-    with open(output_file_last, "w", encoding="utf-8") as f:
-        f.write(bundle.serialize(pretty=True))
+    if not release:
+        return
 
     output_file_versioned = (
-        Path(__file__).parent.parent
-        / "build"
-        / f"tmfk_{mode.name.lower()}_{commit_hash}.json"
+        output_path / f"tmfk_{mode.name.lower()}_{model.commit_hash}.json"
+    )
+    link_or_copy(output_file_last, output_file_versioned)
+
+    with span("write_sqlite", "serialize"):
+        write_sqlite(
+            output_path / f"tmfk_{mode.name.lower()}.sqlite",
+            iter_bundle_objects(output_file_last),
+        )
+
+
+def diff_tmfk(
+    model: TmfkModel,
+    mode: ModeEnumAttribute,
+    history: list[tuple],
+    output_path: Path = BUILD_PATH,
+) -> None:
+    prefix = f"tmfk_{mode.name.lower()}"
+    previous_hash, previous_file = find_previous_bundle(output_path, prefix, history)
+    if previous_file is None:
+        return
+
+    current_file = output_path / f"{prefix}_{model.commit_hash}.json"
+    current = read_bundle_objects(current_file)
+    delta = diff_bundles(
+        read_bundle_objects(previous_file), current, revoked_at=history[0][1]
+    )
+    delta_file = (
+        output_path / f"{prefix}_{previous_hash}_{model.commit_hash}.delta.json"
     )
-    with open(output_file_versioned, "w", encoding="utf-8") as f:
-        f.write(bundle.serialize(pretty=True))
+    write_delta(delta_file, previous_hash, model.commit_hash, delta)
+    log_delta(delta_file.name, delta)
+
+
+def search_documents(model: TmfkModel) -> list[dict]:
+    """Techniques and mitigations of the model for :func:`build_search_index`."""
+    documents = [
+        {
+            "id": get_technique_stix_id(record.tmfk_id),
+            "type": "attack-pattern",
+            **dataclasses.asdict(record),
+        }
+        for record in model.techniques
+    ]
+    documents += [
+        {
+            "id": get_mitigation_stix_id(record.tmfk_id),
+            "type": "course-of-action",
+            **dataclasses.asdict(record),
+        }
+        for record in model.mitigations + sum(model.mitigation_folders, [])
+    ]
+    return documents
+
+
+def run_build(
+    modes: list[ModeEnumAttribute] = tuple(Mode),
+    tmfk_path: Path = TMFK_PATH,
+    output_path: Path = BUILD_PATH,
+    index_path: Path = INDEX_PATH,
+    use_cache: bool = True,
+    workers: int = 1,
+    attack_bundle: Path = None,
+    compressions: list[str] = (),
+) -> TmfkModel:
+    """Build the bundles of ``modes`` from the upstream checkout at ``tmfk_path``.
+
+    The ATT&CK crosswalk is validated against ``attack_bundle`` when given.
+    ``index_path`` is regenerated from the versioned bundles, with the
+    ``compressions`` siblings of :func:`release_index.regenerate_index`.
+    """
+    check_compressions(compressions)
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    repo = RepoContext(tmfk_path)
+    with span("read upstream", "stage"):
+        cache = DocumentCache(path=output_path / ".cache", enabled=use_cache)
+        model = read_tmfk(repo, cache, workers=workers)
+    cache.log_stats()
+    with span("crosswalk", "stage"):
+        write_crosswalk(
+            output_path / "tmfk_crosswalk.json", build_crosswalk(model, attack_bundle)
+        )
+    with span("search index", "stage"):
+        write_search_index(
+            output_path / "tmfk_search.json",
+            build_search_index(search_documents(model)),
+        )
+    commits = repo.commit_history()
+    shared_memo = {}
+    serializer = SerializationCache()
+    for mode in modes:
+        with span("bundle", "stage", mode=mode.name.lower()):
+            parse_tmfk(
+                model,
+                mode,
+                output_path,
+                shared_memo=shared_memo,
+                serializer=serializer,
+            )
+        with span("delta", "stage", mode=mode.name.lower()):
+            diff_tmfk(model, mode, commits, output_path)
+    with span("index", "stage"):
+        regenerate_index(index_path, output_path, compressions)
+    serializer.log_stats()
+    repo.history.log_savings()
+    repo.close()
+    return model
 
 
 if __name__ == "__main__":
-    for mode in Mode:
-        parse_tmfk(mode)
+    import sys
+
+    from cli import main
+
+    sys.exit(main(["build", *sys.argv[1:]]))
@@ -1,111 +1,65 @@
 import os
+from pathlib import Path
+from typing import Callable
 
-import html_to_json
 from constants import (
     MITIGATIONS_PATH,
     get_tmfk_source,
 )
-from marko.ext.gfm import gfm
+from models import MitigationRecord
 from stix2 import CourseOfAction
+from utils import create_uuid_from_string
 
 
-def handle_description_markup(description_row: dict) -> str:
-    mdescription = ""
-
-    if "code" in description_row:
-        codes = [c["_value"] for c in description_row["code"]]
-        if "_values" in description_row:
-            mdescription = description_row["_values"][0]
-            for i, code in enumerate(codes):
-                mdescription += " " + code + description_row["_values"][i + 1]
-        else:
-            mdescription = description_row["_value"] + codes[0]
-    else:
-        mdescription = description_row["_value"]
-
-    return mdescription
-
-
-def craft_mitigation_url(
-    tmfk_id: str, mitigation_name: str, parent_mitigations: list
-) -> str:
-    mid = "/"
-    if len(parent_mitigations) != 0:
-        mid = f"/{parent_mitigations[0]}/"
-    return (
-        "https://microsoft.github.io/Threat-Matrix-for-Kubernetes/mitigations"
-        + mid
-        + f"{tmfk_id}%20{mitigation_name.replace(' ', '%20')}/"
+def get_mitigation_stix_id(tmfk_id: str) -> str:
+    return "course-of-action--" + str(
+        create_uuid_from_string(val=f"microsoft.tmfk.mitigation.{tmfk_id}")
     )
 
 
-def parse_mitigation(file_path: str) -> tuple[CourseOfAction, list]:
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-        html_content = gfm(content)
-        json_content = html_to_json.convert(html_content)
-
-        mitigation_name = json_content["h1"][0]["_value"]
-        tmfk_id = json_content["p"][1]["_values"][0].split(":")[-1].strip()
+def build_mitigation(record: MitigationRecord) -> CourseOfAction:
+    return CourseOfAction(
+        id=get_mitigation_stix_id(record.tmfk_id),
+        created=record.created,
+        modified=record.modified,
+        allow_custom=True,
+        external_references=[
+            {
+                "source_name": f"{get_tmfk_source()}",
+                "url": record.url,
+                "external_id": record.tmfk_id,
+            }
+        ],
+        name=record.name,
+        description=record.description,
+        x_mitre_ids=record.attack_ids,
+        x_mitre_parent_mitigation=record.parent_mitigation,
+    )
 
-        mitre_attack_mitigations = []
-        parent_mitigations = []
 
-        if "_values" in json_content["p"][1]:
-            if "MITRE mitigation: -" not in json_content["p"][1]["_values"]:
-                t = [a["_value"] for a in json_content["p"][1]["a"]]
-                mitre_attack_mitigations = list(
-                    filter(lambda x: x.startswith("M") and not x.startswith("MS"), t)
-                )
-                parent_mitigations = list(filter(lambda x: x.startswith("MS"), t))
+def list_folder(
+    folder: str,
+    mitigations_path: Path = MITIGATIONS_PATH,
+    listdir: Callable = os.listdir,
+) -> list[str]:
+    current_path = Path(mitigations_path) / folder
+    return [current_path / name for name in sorted(listdir(current_path))]
 
-        parent_mitigation = None
-        if len(parent_mitigations) != 0:
-            parent_mitigation = parent_mitigations[0]
 
-        mitigation = CourseOfAction(
-            allow_custom=True,
-            external_references=[
-                {
-                    "source_name": f"{get_tmfk_source()}",
-                    "url": craft_mitigation_url(
-                        tmfk_id=tmfk_id,
-                        mitigation_name=mitigation_name,
-                        parent_mitigations=parent_mitigations,
-                    ),
-                    "external_id": tmfk_id,
-                }
-            ],
-            name=mitigation_name,
-            description="\n\n".join(
-                [
-                    handle_description_markup(d)
-                    for d in json_content["p"][2:]
-                    if "_value" in d and "!!!" not in d["_value"]
-                ]
-            ),
-            x_mitre_ids=mitre_attack_mitigations,
-            x_mitre_parent_mitigation=parent_mitigation,
+def list_mitigations(
+    mitigations_path: Path = MITIGATIONS_PATH, listdir: Callable = os.listdir
+) -> tuple[list[str], list[list[str]]]:
+    mitigations_listing = list(
+        filter(
+            lambda x: x.endswith(".md") and x != "index.md",
+            sorted(listdir(mitigations_path)),
         )
-
-        tids = []
-        for row in json_content["table"][0]["tbody"][0]["tr"]:
-            tids.append(row["td"][0]["a"][0]["_value"])
-
-        return mitigation, tids
-
-
-def handle_folder(folder: str) -> tuple[dict, dict]:
-    current_path = MITIGATIONS_PATH / folder
-    listing = os.listdir(current_path)
-
-    mitigations = {}
-    mapping = {}
-
-    for _, file_name in enumerate(listing):
-        file_path = current_path / file_name
-        mitigation, tids = parse_mitigation(file_path=file_path)
-        mapping[mitigation.id] = tids
-        mitigations[mitigation.id] = mitigation
-
-    return mitigations, mapping
+    )
+    folders = list(filter(lambda x: "." not in x, sorted(listdir(mitigations_path))))
+
+    return [
+        os.path.join(mitigations_path, file_name) for file_name in mitigations_listing
+    ], [
+        list_folder(folder=folder, mitigations_path=mitigations_path, listdir=listdir)
+        for folder in folders
+    ]
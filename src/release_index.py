@@ -0,0 +1,216 @@
+"""Regeneration of ``index.json`` from the versioned bundles of the build folder.
+
+Every ``tmfk_<mode>_<commit>.json`` bundle is a version of the collection of
+its mode. A version lists the SHA-256, byte size and number of objects of its
+bundle, so mirrors can skip unchanged downloads, and the delta from the
+previous version when ``tmfk_<mode>_<previous>_<commit>.delta.json`` exists.
+
+Bundles can be precompressed to ``.json.gz`` siblings, and to ``.json.zst``
+siblings when the optional ``zstandard`` package is installed. Siblings are
+listed under ``compressed`` with their own checksum and size, and are only
+rewritten when older than their bundle.
+
+Versions whose bundle is not in the build folder are kept as they are, so a
+partial checkout does not drop published versions.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+
+from bundle_io import iter_bundle_objects
+from constants import BUILD_PATH, BUILD_URL, INDEX_PATH, Mode, get_collection_id
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIONS = {"gz": "gzip", "zst": "zstd"}
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> tuple[str, int]:
+    """SHA-256 and size in bytes of the file at ``path``."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def compress(path: Path, suffix: str) -> Path:
+    """Write the ``.gz`` or ``.zst`` sibling of ``path`` unless it is up to date."""
+    target = path.with_name(f"{path.name}.{suffix}")
+    if target.exists() and target.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        return target
+
+    partial = target.with_name(f".{target.name}.tmp")
+    with open(path, "rb") as source, open(partial, "wb") as f:
+        if suffix == "gz":
+            # No name and no timestamp in the header, so equal bundles give
+            # equal archives.
+            with gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=0) as out:
+                while chunk := source.read(1 << 20):
+                    out.write(chunk)
+        else:
+            zstandard.ZstdCompressor(level=19).copy_stream(source, f)
+    partial.replace(target)
+    return target
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _url(path: Path) -> str:
+    return f"{BUILD_URL}/{path.name}"
+
+
+def read_version(path: Path, collection_id: str, known: dict = None) -> dict:
+    """Version entry of the bundle at ``path``.
+
+    The objects are only counted when ``known``, the previous entry of the
+    bundle, has another checksum.
+    """
+    sha256, size = file_digest(path)
+    if known is not None and known.get("sha256") == sha256:
+        return {
+            key: known[key]
+            for key in ("version", "url", "modified", "sha256", "size", "objects")
+        }
+
+    count = 0
+    collection = None
+    for obj in iter_bundle_objects(path):
+        count += 1
+        if obj["id"] == collection_id:
+            collection = obj
+    if collection is None:
+        raise ValueError(f"{path.name} does not contain {collection_id}")
+    return {
+        "version": collection["x_mitre_version"],
+        "url": _url(path),
+        "modified": collection["modified"],
+        "sha256": sha256,
+        "size": size,
+        "objects": count,
+    }
+
+
+def check_compressions(compressions: list[str]) -> None:
+    """Fail before a build when a compression cannot be written."""
+    if "zst" in compressions and zstandard is None:
+        raise RuntimeError("zst compression needs the zstandard package")
+
+
+def regenerate_index(
+    index_path: Path = INDEX_PATH,
+    output_path: Path = BUILD_PATH,
+    compressions: list[str] = (),
+) -> dict:
+    """Rewrite the versions of ``index_path`` from the bundles of ``output_path``.
+
+    Parameters
+    ----------
+    compressions : list[str]
+        ``gz`` and ``zst``, the precompressed siblings to write and list
+
+    Returns
+    -------
+    dict
+        the new index
+    """
+    check_compressions(compressions)
+    index_path = Path(index_path)
+    output_path = Path(output_path)
+    with open(index_path, encoding="utf-8") as f:
+        index = json.load(f)
+
+    for mode in Mode:
+        collection_id = get_collection_id(mode=mode)
+        entry = next(
+            (c for c in index["collections"] if c["id"] == collection_id), None
+        )
+        if entry is None:
+            continue
+        prefix = f"tmfk_{mode.name.lower()}"
+        known = {version["url"]: version for version in entry["versions"]}
+        bundles = {
+            match.group(1): path
+            for path in output_path.glob(f"{prefix}_*.json")
+            if (match := re.fullmatch(rf"{prefix}_([0-9a-f]+)\.json", path.name))
+        }
+        deltas = {}
+        for path in sorted(output_path.glob(f"{prefix}_*_*.delta.json")):
+            match = re.fullmatch(
+                rf"{prefix}_([0-9a-f]+)_([0-9a-f]+)\.delta\.json", path.name
+            )
+            if match:
+                deltas.setdefault(match.group(2), []).append((match.group(1), path))
+
+        versions = [
+            version
+            for url, version in known.items()
+            if Path(url).name not in {path.name for path in bundles.values()}
+        ]
+        for commit_hash, path in bundles.items():
+            version = read_version(path, collection_id, known.get(_url(path)))
+            version["commit"] = commit_hash
+            versions.append(version)
+        versions.sort(
+            key=lambda version: (_parse_timestamp(version["modified"]), version["url"]),
+            reverse=True,
+        )
+
+        hashes = [version.get("commit") for version in versions]
+        for position, version in enumerate(versions):
+            commit_hash = version.pop("commit", None)
+            if commit_hash is None:
+                continue
+            # The delta from the previous version is preferred to older ones.
+            previous = set(hashes[position + 1 : position + 2])
+            candidates = sorted(
+                deltas.get(commit_hash, []), key=lambda delta: delta[0] not in previous
+            )
+            if candidates:
+                previous_hash, delta_path = candidates[0]
+                version["delta"] = {
+                    "from": _url(output_path / f"{prefix}_{previous_hash}.json"),
+                    "url": _url(delta_path),
+                }
+            compressed = {}
+            for suffix in compressions:
+                target = compress(bundles[commit_hash], suffix)
+                sha256, size = file_digest(target)
+                compressed[COMPRESSIONS[suffix]] = {
+                    "url": _url(target),
+                    "sha256": sha256,
+                    "size": size,
+                }
+            if compressed:
+                version["compressed"] = compressed
+
+        entry["versions"] = versions
+        logger.info("%s: %d versions in %s", entry["name"], len(versions), index_path)
+
+    modified = [
+        version["modified"]
+        for entry in index["collections"]
+        for version in entry["versions"]
+    ]
+    if modified:
+        index["modified"] = max(modified, key=_parse_timestamp)
+
+    partial = index_path.with_name(f".{index_path.name}.tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+    partial.replace(index_path)
+    return index
@@ -0,0 +1,207 @@
+"""Offline full-text search over the techniques and mitigations of the matrix.
+
+The build writes an inverted index of the names, descriptions and ids of the
+documents with :func:`build_search_index`. For every term it stores the BM25
+score of each document, already weighted by field, and the positions of the
+term in each field. :class:`SearchIndex` loads the file with the standard
+library only, so a query is a few dictionary lookups and a sum.
+
+A query is a list of words; words between double quotes must appear as a
+phrase in the same field::
+
+    python src/search.py 'exposed "dashboard"' [INDEX_PATH]
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import defaultdict
+from pathlib import Path
+
+SEARCH_INDEX_VERSION = 1
+
+TOKEN = re.compile(r"[a-z0-9]+")
+PHRASE = re.compile(r'"([^"]*)"')
+
+# Matches in ids and names count more than matches in descriptions.
+FIELD_WEIGHTS = {"ids": 3.0, "name": 2.0, "description": 1.0}
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of ``text``; ids such as ``MS-T9001`` split at dashes."""
+    return TOKEN.findall(text.lower())
+
+
+def build_search_index(documents: list[dict]) -> dict:
+    """Inverted index of ``documents``.
+
+    Parameters
+    ----------
+    documents : list[dict]
+        ``id``, ``tmfk_id``, ``type``, ``name`` and ``description`` of every
+        document, with its ATT&CK ids in ``attack_ids``
+
+    Returns
+    -------
+    dict
+        the index, as written to ``tmfk_search.json``
+    """
+    fields = {
+        "ids": [
+            tokenize(" ".join([doc["tmfk_id"], *doc["attack_ids"]]))
+            for doc in documents
+        ],
+        "name": [tokenize(doc["name"]) for doc in documents],
+        "description": [tokenize(doc["description"]) for doc in documents],
+    }
+
+    scores = defaultdict(lambda: defaultdict(float))
+    positions = {}
+    for field, tokens_by_doc in fields.items():
+        average = sum(map(len, tokens_by_doc)) / max(len(tokens_by_doc), 1) or 1
+        postings = defaultdict(dict)
+        for doc, tokens in enumerate(tokens_by_doc):
+            for position, term in enumerate(tokens):
+                postings[term].setdefault(doc, []).append(position)
+
+        for term, docs in postings.items():
+            idf = math.log(1 + (len(documents) - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, found in docs.items():
+                norm = 1 - B + B * len(tokens_by_doc[doc]) / average
+                tf = len(found)
+                scores[term][doc] += (
+                    FIELD_WEIGHTS[field] * idf * tf * (K1 + 1) / (tf + K1 * norm)
+                )
+        positions[field] = {
+            term: [[doc, found] for doc, found in sorted(docs.items())]
+            for term, docs in sorted(postings.items())
+        }
+
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "documents": [
+            {key: doc[key] for key in ("id", "tmfk_id", "type", "name")}
+            for doc in documents
+        ],
+        "scores": {
+            term: [[doc, round(score, 6)] for doc, score in sorted(docs.items())]
+            for term, docs in sorted(scores.items())
+        },
+        "positions": positions,
+    }
+
+
+def write_search_index(path: Path, index: dict) -> None:
+    partial = path.with_name(f".{path.name}.tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    partial.replace(path)
+
+
+class SearchIndex:
+    """Ranked queries over an index written by :func:`write_search_index`."""
+
+    def __init__(self, index: dict) -> None:
+        if index.get("version") != SEARCH_INDEX_VERSION:
+            raise ValueError(f"unsupported search index version {index.get('version')}")
+        self.documents: list[dict] = index["documents"]
+        self.scores: dict[str, dict[int, float]] = {
+            term: dict(docs) for term, docs in index["scores"].items()
+        }
+        self._positions = index["positions"]
+        self._phrase_cache: dict[tuple, dict] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SearchIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _term_positions(self, field: str, term: str) -> dict[int, set[int]]:
+        key = (field, term)
+        if key not in self._phrase_cache:
+            self._phrase_cache[key] = {
+                doc: set(found) for doc, found in self._positions[field].get(term, [])
+            }
+        return self._phrase_cache[key]
+
+    def _phrase_docs(self, terms: list[str]) -> set[int]:
+        docs = set()
+        for field in self._positions:
+            postings = [self._term_positions(field, term) for term in terms]
+            candidates = set.intersection(*(set(p) for p in postings))
+            for doc in candidates:
+                if any(
+                    all(start + i in postings[i][doc] for i in range(1, len(terms)))
+                    for start in postings[0][doc]
+                ):
+                    docs.add(doc)
+        return docs
+
+    def search(self, query: str, limit: int = 10, type: str = None) -> list[tuple]:
+        """Best matches of ``query``.
+
+        Parameters
+        ----------
+        query : str
+            words, and phrases between double quotes
+        limit : int, optional
+            number of results
+        type : str, optional
+            STIX type of the results, such as ``attack-pattern``
+
+        Returns
+        -------
+        list[tuple]
+            ``(score, document)`` pairs, best first
+        """
+        allowed = None
+        for phrase in PHRASE.findall(query):
+            terms = tokenize(phrase)
+            if len(terms) > 1:
+                docs = self._phrase_docs(terms)
+                allowed = docs if allowed is None else allowed & docs
+
+        totals = defaultdict(float)
+        for term in tokenize(query):
+            for doc, score in self.scores.get(term, {}).items():
+                totals[doc] += score
+
+        results = (
+            (score, doc)
+            for doc, score in totals.items()
+            if (allowed is None or doc in allowed)
+            and (type is None or self.documents[doc]["type"] == type)
+        )
+        return [
+            (score, self.documents[doc])
+            for score, doc in heapq.nlargest(
+                limit, results, key=lambda result: (result[0], -result[1])
+            )
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from constants import BUILD_PATH
+
+    path = Path(sys.argv[2]) if len(sys.argv) > 2 else BUILD_PATH / "tmfk_search.json"
+
+    started = time.perf_counter()
+    index = SearchIndex.from_file(path)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = index.search(sys.argv[1])
+    query_seconds = time.perf_counter() - started
+
+    for score, document in results:
+        print(f"{score:8.3f} {document['tmfk_id']:<14} {document['name']}")
+    print(
+        f"loaded {len(index.documents)} documents in {load_seconds * 1000:.1f}ms, "
+        f"query in {query_seconds * 1e6:.0f}us"
+    )
@@ -0,0 +1,78 @@
+"""Canonical JSON of the STIX objects of the bundles.
+
+Objects are written with sorted keys, an indentation of four spaces, ``repr``
+floats and the timestamps of ``stix2``, so equal objects always serialize to
+the same bytes and the content-derived bundle ids stay stable.
+
+:class:`SerializationCache` serializes every object once. The objects built
+by :func:`parse.build_tmfk` are immutable and reused: between the bundles of
+every mode for the objects that do not depend on the mode, such as the
+creator identity and the mitigations, and between the passes of the watch
+mode for unchanged documents. Serialized text is reused byte for byte.
+"""
+
+import json
+import logging
+from datetime import date, datetime
+
+from stix2.base import _STIXBase
+from stix2.utils import format_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class CanonicalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (date, datetime)):
+            return format_datetime(obj)
+        if isinstance(obj, _STIXBase):
+            return {
+                name: value
+                for name, value in obj.items()
+                if name not in obj._defaulted_optional_properties
+            }
+        return super().default(obj)
+
+
+def canonical_json(obj) -> str:
+    return json.dumps(obj, cls=CanonicalEncoder, sort_keys=True, indent=4)
+
+
+class SerializationCache:
+    """Canonical JSON of objects, computed once per object.
+
+    Entries are keyed by object identity, not by content: an object must not
+    be mutated once serialized, or its stale text is silently written again.
+    The ``stix2`` objects of the build are immutable.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[int, tuple] = {}
+        self._used: set[int] = set()
+
+    def serialize(self, obj) -> str:
+        # The entry keeps a reference to the object, so its id is not reused.
+        entry = self._entries.get(id(obj))
+        if entry is None or entry[0] is not obj:
+            entry = (obj, canonical_json(obj))
+            self._entries[id(obj)] = entry
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._used.add(id(obj))
+        return entry[1]
+
+    def prune(self) -> None:
+        """Forget the objects not serialized since the previous prune."""
+        for key in self._entries.keys() - self._used:
+            del self._entries[key]
+        self._used.clear()
+
+    def log_stats(self) -> None:
+        logger.info(
+            "Serialized %d objects, reused %d serializations",
+            self.misses,
+            self.hits,
+        )
@@ -0,0 +1,490 @@
+"""Read-only TAXII 2.1 server for the built collections.
+
+The collections listed in ``index.json`` are loaded once, from the most recent
+version whose bundle is in the build folder, into a :class:`CollectionStore`:
+
+- objects are sorted by date added, then id, and serialized once to compact
+  JSON, so a response is the join of already encoded objects;
+- ``match[type]`` and ``match[id]`` are answered from position lists built at
+  load time, ``added_after`` by bisection;
+- the ``next`` cursor of every position is computed at load time. A cursor
+  names a position in the collection, not in a result, so it stays valid for
+  any filter until the bundles are reloaded.
+
+The bundles do not record when an object was added, so the date added of an
+object is its ``modified`` timestamp, or ``created`` when it has none. An
+``added_after`` without a UTC offset, such as ``2024-01-01``, is read as UTC.
+
+The server speaks just enough HTTP/1.1 with ``asyncio`` streams for TAXII
+clients, with keep-alive, and needs nothing outside the standard library::
+
+    python src/cli.py serve --port 8000
+    curl 'http://127.0.0.1:8000/tmfk/collections/'
+
+Run this module to time filtered requests against a local server::
+
+    python src/taxii.py [INDEX_PATH] [BUILD_PATH]
+"""
+
+import asyncio
+import json
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from heapq import merge
+from http import HTTPStatus
+from pathlib import Path
+from typing import Iterable, NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from bundle_io import iter_bundle_objects
+from constants import BUILD_PATH, INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+TAXII_MEDIA_TYPE = "application/taxii+json;version=2.1"
+STIX_MEDIA_TYPE = "application/stix+json;version=2.1"
+API_ROOT = "tmfk"
+PAGE_SIZE = 1000
+QUERY_CACHE_SIZE = 1024
+
+
+class TaxiiError(Exception):
+    def __init__(self, status: HTTPStatus, description: str) -> None:
+        super().__init__(description)
+        self.status = status
+
+
+class Response(NamedTuple):
+    status: HTTPStatus
+    body: bytes
+    content_type: str = TAXII_MEDIA_TYPE
+    headers: tuple = ()
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Aware datetime of ``value``, in UTC when it has no offset."""
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _values(query: dict[str, list[str]], name: str) -> tuple:
+    """Sorted values of a filter, given comma separated or repeated."""
+    if name not in query:
+        return None
+    return tuple(
+        sorted({value for param in query[name] for value in param.split(",") if value})
+    )
+
+
+class CollectionStore:
+    """Objects of one collection, indexed for the queries of the objects and
+    manifest endpoints."""
+
+    def __init__(self, entry: dict, objects: Iterable[dict], version: str) -> None:
+        self.id: str = entry["id"].rpartition("--")[2]
+        self.info = _encode(
+            {
+                "id": self.id,
+                "title": entry["name"],
+                "description": entry.get("description", ""),
+                "can_read": True,
+                "can_write": False,
+                "media_types": [STIX_MEDIA_TYPE],
+            }
+        )
+
+        records = []
+        for obj in objects:
+            added = obj.get("modified", obj.get("created", entry["created"]))
+            records.append((_parse_timestamp(added), obj["id"], added, obj))
+        records.sort(key=lambda record: record[:2])
+
+        self.keys: list[datetime] = [record[0] for record in records]
+        self.added: list[str] = [record[2] for record in records]
+        self.objects: list[bytes] = [_encode(record[3]) for record in records]
+        self.manifest: list[bytes] = [
+            _encode(
+                {
+                    "id": stix_id,
+                    "date_added": added,
+                    "version": obj.get("modified", added),
+                    "media_type": STIX_MEDIA_TYPE,
+                }
+            )
+            for _, stix_id, added, obj in records
+        ]
+
+        self.by_type: dict[str, list[int]] = {}
+        self.by_id: dict[str, list[int]] = {}
+        for position, (_, stix_id, _, obj) in enumerate(records):
+            self.by_type.setdefault(obj["type"], []).append(position)
+            self.by_id.setdefault(stix_id, []).append(position)
+
+        # Cursors carry the collection version, so they expire with a reload.
+        self.cursors: list[str] = [
+            f"{version}.{position}" for position in range(len(records))
+        ]
+        self._positions = {cursor: i for i, cursor in enumerate(self.cursors)}
+        self._queries: dict[tuple, list[int]] = {}
+
+    def _select(self, types: tuple, ids: tuple) -> list[int]:
+        """Sorted positions of the objects matching ``types`` and ``ids``."""
+        key = (types, ids)
+        selected = self._queries.get(key)
+        if selected is None:
+            if types is None and ids is None:
+                selected = range(len(self.objects))
+            else:
+                groups = []
+                if types is not None:
+                    groups.append([self.by_type.get(t, []) for t in types])
+                if ids is not None:
+                    groups.append([self.by_id.get(i, []) for i in ids])
+                # The smaller group is merged, the other one filters it.
+                groups.sort(key=lambda lists: sum(map(len, lists)))
+                selected = list(merge(*groups[0]))
+                if len(groups) > 1:
+                    allowed = set().union(*groups[1])
+                    selected = [i for i in selected if i in allowed]
+            if len(self._queries) >= QUERY_CACHE_SIZE:
+                self._queries.pop(next(iter(self._queries)))
+            self._queries[key] = selected
+        return selected
+
+    def page(self, query: dict[str, list[str]]) -> tuple[list[int], str]:
+        """Positions of the page of ``query`` and the cursor of the next page.
+
+        Raises
+        ------
+        TaxiiError
+            when a parameter is malformed or the cursor has expired
+        """
+        selected = self._select(
+            _values(query, "match[type]"), _values(query, "match[id]")
+        )
+
+        start = 0
+        if "added_after" in query:
+            try:
+                added_after = _parse_timestamp(query["added_after"][0])
+            except ValueError:
+                raise TaxiiError(HTTPStatus.BAD_REQUEST, "invalid added_after")
+            start = bisect_right(self.keys, added_after)
+        if "next" in query:
+            try:
+                start = max(start, self._positions[query["next"][0]])
+            except KeyError:
+                raise TaxiiError(HTTPStatus.BAD_REQUEST, "unknown or expired next")
+        try:
+            limit = min(int(query.get("limit", [PAGE_SIZE])[0]), PAGE_SIZE)
+        except ValueError:
+            raise TaxiiError(HTTPStatus.BAD_REQUEST, "invalid limit")
+        if limit < 1:
+            raise TaxiiError(HTTPStatus.BAD_REQUEST, "invalid limit")
+
+        first = bisect_left(selected, start)
+        positions = selected[first : first + limit]
+        more = first + limit < len(selected)
+        return positions, self.cursors[selected[first + limit]] if more else None
+
+    def envelope(self, query: dict[str, list[str]], items: list[bytes]) -> Response:
+        """Objects or manifest entries ``items`` of the page of ``query``."""
+        positions, next_cursor = self.page(query)
+        if next_cursor is None:
+            head = b'{"more":false,"objects":['
+        else:
+            head = b'{"more":true,"next":"%s","objects":[' % next_cursor.encode()
+        body = head + b",".join([items[i] for i in positions]) + b"]}"
+        if not positions:
+            return Response(HTTPStatus.OK, body)
+        return Response(
+            HTTPStatus.OK,
+            body,
+            headers=(
+                ("X-TAXII-Date-Added-First", self.added[positions[0]]),
+                ("X-TAXII-Date-Added-Last", self.added[positions[-1]]),
+            ),
+        )
+
+
+class TaxiiStore:
+    """Collections served under the API root ``/tmfk/``."""
+
+    def __init__(self, index: dict, collections: list[CollectionStore]) -> None:
+        self.collections = {collection.id: collection for collection in collections}
+        self.discovery = _encode(
+            {
+                "title": index["name"],
+                "description": index.get("description", ""),
+                "default": f"/{API_ROOT}/",
+                "api_roots": [f"/{API_ROOT}/"],
+            }
+        )
+        self.api_root = _encode(
+            {
+                "title": index["name"],
+                "versions": [TAXII_MEDIA_TYPE],
+                "max_content_length": 0,
+            }
+        )
+        self.listing = (
+            b'{"collections":['
+            + b",".join(collection.info for collection in collections)
+            + b"]}"
+        )
+
+    @classmethod
+    def from_index(
+        cls, index_path: Path = INDEX_PATH, bundles_path: Path = BUILD_PATH
+    ) -> "TaxiiStore":
+        """Load the most recent local version of every collection of ``index_path``.
+
+        Versions are looked up in ``bundles_path`` by the file name of their url.
+        """
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+
+        collections = []
+        for entry in index["collections"]:
+            versions = sorted(
+                entry["versions"],
+                key=lambda version: _parse_timestamp(version["modified"]),
+                reverse=True,
+            )
+            for version in versions:
+                path = Path(bundles_path) / Path(urlsplit(version["url"]).path).name
+                if path.exists():
+                    collection = CollectionStore(
+                        entry, iter_bundle_objects(path), path.stem.rpartition("_")[2]
+                    )
+                    logger.info(
+                        "Serving %s from %s: %d objects",
+                        entry["name"],
+                        path.name,
+                        len(collection.objects),
+                    )
+                    collections.append(collection)
+                    break
+            else:
+                logger.warning("No local bundle of %s, not served", entry["name"])
+        return cls(index, collections)
+
+    def _collection(self, collection_id: str) -> CollectionStore:
+        try:
+            return self.collections[collection_id]
+        except KeyError:
+            raise TaxiiError(HTTPStatus.NOT_FOUND, "unknown collection")
+
+    def handle(self, target: str) -> Response:
+        """Response to a GET of ``target``, a path with its query string."""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        try:
+            match parts:
+                case ["taxii2"]:
+                    return Response(HTTPStatus.OK, self.discovery)
+                case [root] if root == API_ROOT:
+                    return Response(HTTPStatus.OK, self.api_root)
+                case [root, "collections"] if root == API_ROOT:
+                    return Response(HTTPStatus.OK, self.listing)
+                case [root, "collections", collection_id] if root == API_ROOT:
+                    return Response(HTTPStatus.OK, self._collection(collection_id).info)
+                case [root, "collections", collection_id, "objects"] if (
+                    root == API_ROOT
+                ):
+                    collection = self._collection(collection_id)
+                    return collection.envelope(query, collection.objects)
+                case [
+                    root,
+                    "collections",
+                    collection_id,
+                    "objects",
+                    object_id,
+                ] if (
+                    root == API_ROOT
+                ):
+                    collection = self._collection(collection_id)
+                    if object_id not in collection.by_id:
+                        raise TaxiiError(HTTPStatus.NOT_FOUND, "unknown object")
+                    query["match[id]"] = [object_id]
+                    return collection.envelope(query, collection.objects)
+                case [root, "collections", collection_id, "manifest"] if (
+                    root == API_ROOT
+                ):
+                    collection = self._collection(collection_id)
+                    return collection.envelope(query, collection.manifest)
+                case _:
+                    raise TaxiiError(HTTPStatus.NOT_FOUND, "unknown endpoint")
+        except TaxiiError as e:
+            return error_response(e.status, str(e))
+
+
+def error_response(status: HTTPStatus, description: str) -> Response:
+    return Response(
+        status,
+        _encode(
+            {
+                "title": status.phrase,
+                "description": description,
+                "http_status": str(status.value),
+            }
+        ),
+    )
+
+
+def _http_response(response: Response, keep_alive: bool, head: bool) -> bytes:
+    lines = [
+        f"HTTP/1.1 {response.status.value} {response.status.phrase}",
+        f"Content-Type: {response.content_type}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        *(f"{name}: {value}" for name, value in response.headers),
+    ]
+    head_bytes = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return head_bytes if head else head_bytes + response.body
+
+
+async def _serve_connection(
+    store: TaxiiStore, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                writer.write(
+                    _http_response(
+                        error_response(HTTPStatus.BAD_REQUEST, "malformed request"),
+                        keep_alive=False,
+                        head=False,
+                    )
+                )
+                break
+            keep_alive = headers.get("connection") != "close" and version == "HTTP/1.1"
+            if method in ("GET", "HEAD"):
+                try:
+                    response = store.handle(target)
+                except Exception:
+                    logger.exception("Failed to answer %s", target)
+                    response = error_response(
+                        HTTPStatus.INTERNAL_SERVER_ERROR, "unexpected error"
+                    )
+            else:
+                response = error_response(
+                    HTTPStatus.METHOD_NOT_ALLOWED, "the collections are read-only"
+                )
+            writer.write(_http_response(response, keep_alive, head=method == "HEAD"))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(
+    store: TaxiiStore, host: str = "127.0.0.1", port: int = 0
+) -> asyncio.Server:
+    """Start serving ``store``; port 0 picks a free port."""
+    return await asyncio.start_server(
+        lambda reader, writer: _serve_connection(store, reader, writer), host, port
+    )
+
+
+def serve(
+    index_path: Path = INDEX_PATH,
+    bundles_path: Path = BUILD_PATH,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+) -> None:
+    """Serve the collections of ``index_path`` until interrupted."""
+    store = TaxiiStore.from_index(index_path, bundles_path)
+
+    async def run() -> None:
+        server = await start_server(store, host, port)
+        for sock in server.sockets:
+            logger.info(
+                "TAXII 2.1 discovery at http://%s:%d/taxii2/", *sock.getsockname()[:2]
+            )
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    index_path = Path(sys.argv[1]) if len(sys.argv) > 1 else INDEX_PATH
+    bundles_path = Path(sys.argv[2]) if len(sys.argv) > 2 else BUILD_PATH
+
+    started = time.perf_counter()
+    store = TaxiiStore.from_index(index_path, bundles_path)
+    load_seconds = time.perf_counter() - started
+
+    rng = random.Random(0)
+    targets = []
+    for collection in store.collections.values():
+        root = f"/{API_ROOT}/collections/{collection.id}"
+        types = sorted(collection.by_type)
+        ids = sorted(collection.by_id)
+        for _ in range(200):
+            targets += [
+                f"{root}/objects/?match[type]={rng.choice(types)}&limit=20",
+                f"{root}/objects/?match[id]={rng.choice(ids)}",
+                f"{root}/objects/?added_after={rng.choice(collection.added)}&limit=50",
+                f"{root}/manifest/?match[type]={rng.choice(types)}",
+            ]
+
+    async def client(port: int, requests: list[str]) -> None:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for target in requests:
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            length = 0
+            while (line := await reader.readline()) != b"\r\n":
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+        writer.close()
+
+    async def bench(clients: int = 8) -> float:
+        server = await start_server(store)
+        port = server.sockets[0].getsockname()[1]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(client(port, targets[i::clients]) for i in range(clients))
+        )
+        seconds = time.perf_counter() - started
+        server.close()
+        await server.wait_closed()
+        return seconds
+
+    seconds = asyncio.run(bench())
+    print(
+        f"{len(store.collections)} collections loaded in {load_seconds:.3f}s; "
+        f"{len(targets)} filtered requests in {seconds:.3f}s, "
+        f"{len(targets) / seconds:.0f} requests/s"
+    )
@@ -0,0 +1,143 @@
+"""Constant time lookups over a generated TMFK bundle.
+
+``MitreAttackData`` scans the whole memory store on every query. :class:`TmfkIndex`
+reads the bundle once as plain JSON and builds hash indexes, so enriching an
+event with TMFK context costs a few dictionary lookups.
+
+Run this module to compare both on a bundle::
+
+    python src/tmfk_index.py [BUNDLE_PATH]
+"""
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable
+
+from bundle_diff import read_bundle_objects
+from constants import TMFK_ID_PREFIX
+
+
+def get_external_id(obj: dict) -> str:
+    """TMFK id of an object, such as ``MS-TA9007``, or ``None``."""
+    for reference in obj.get("external_references", []):
+        if reference.get("external_id", "").startswith(TMFK_ID_PREFIX):
+            return reference["external_id"]
+    return None
+
+
+class TmfkIndex:
+    """Hash indexes over the objects of a TMFK bundle.
+
+    Objects are returned as the dictionaries read from the bundle.
+    """
+
+    def __init__(self, objects: Iterable[dict]) -> None:
+        self.by_id: dict[str, dict] = {}
+        self.by_external_id: dict[str, dict] = {}
+        self.tactics: dict[str, dict] = {}
+        self.by_tactic: dict[str, list[dict]] = defaultdict(list)
+        self.by_attack_id: dict[str, list[dict]] = defaultdict(list)
+        self.by_source: dict[str, list[dict]] = defaultdict(list)
+        self.by_target: dict[str, list[dict]] = defaultdict(list)
+
+        for obj in objects:
+            self.by_id[obj["id"]] = obj
+            external_id = get_external_id(obj)
+            if external_id is not None:
+                self.by_external_id[external_id] = obj
+            if obj["type"] == "x-mitre-tactic":
+                self.tactics[obj["x_mitre_shortname"]] = obj
+            for phase in obj.get("kill_chain_phases", []):
+                self.by_tactic[phase["phase_name"]].append(obj)
+            for attack_id in obj.get("x_mitre_ids", []):
+                self.by_attack_id[attack_id].append(obj)
+            if obj["type"] == "relationship":
+                self.by_source[obj["source_ref"]].append(obj)
+                self.by_target[obj["target_ref"]].append(obj)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "TmfkIndex":
+        return cls(read_bundle_objects(path).values())
+
+    def get(self, stix_id: str) -> dict:
+        return self.by_id.get(stix_id)
+
+    def get_by_external_id(self, external_id: str) -> dict:
+        return self.by_external_id.get(external_id)
+
+    def get_tactic(self, shortname: str) -> dict:
+        return self.tactics.get(shortname)
+
+    def get_techniques_by_tactic(self, shortname: str) -> list[dict]:
+        return self.by_tactic.get(shortname, [])
+
+    def get_by_attack_id(self, attack_id: str) -> list[dict]:
+        """TMFK objects related to an ATT&CK technique or mitigation id."""
+        return self.by_attack_id.get(attack_id, [])
+
+    def get_relationships(
+        self, source_ref: str = None, target_ref: str = None
+    ) -> list[dict]:
+        """Relationships from ``source_ref`` or to ``target_ref``."""
+        if source_ref is not None:
+            relationships = self.by_source.get(source_ref, [])
+            if target_ref is not None:
+                return [r for r in relationships if r["target_ref"] == target_ref]
+            return relationships
+        return self.by_target.get(target_ref, [])
+
+    def get_mitigations(self, technique_id: str) -> list[dict]:
+        return [
+            self.by_id[r["source_ref"]]
+            for r in self.by_target.get(technique_id, [])
+            if r["relationship_type"] == "mitigates"
+        ]
+
+    def get_mitigated_techniques(self, mitigation_id: str) -> list[dict]:
+        return [
+            self.by_id[r["target_ref"]]
+            for r in self.by_source.get(mitigation_id, [])
+            if r["relationship_type"] == "mitigates"
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from constants import BUILD_PATH
+
+    path = (
+        Path(sys.argv[1])
+        if len(sys.argv) > 1
+        else BUILD_PATH / "tmfk_attack_compatible.json"
+    )
+
+    started = time.perf_counter()
+    index = TmfkIndex.from_file(path)
+    load_seconds = time.perf_counter() - started
+    techniques = [
+        obj for obj in index.by_id.values() if obj["type"] == "attack-pattern"
+    ]
+    external_ids = [get_external_id(technique) for technique in techniques]
+
+    started = time.perf_counter()
+    for external_id in external_ids:
+        technique = index.get_by_external_id(external_id)
+        index.get_mitigations(technique["id"])
+    index_seconds = time.perf_counter() - started
+
+    from mitreattack.stix20 import MitreAttackData
+
+    attack_data = MitreAttackData(str(path))
+    started = time.perf_counter()
+    for external_id in external_ids:
+        technique = attack_data.get_object_by_attack_id(external_id, "attack-pattern")
+        attack_data.get_mitigations_mitigating_technique(technique.id)
+    attack_seconds = time.perf_counter() - started
+
+    print(
+        f"{len(index.by_id)} objects indexed in {load_seconds:.3f}s; "
+        f"{len(external_ids)} technique lookups: TmfkIndex {index_seconds:.4f}s, "
+        f"MitreAttackData {attack_seconds:.3f}s"
+    )
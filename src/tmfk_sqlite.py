@@ -0,0 +1,224 @@
+"""Pre-indexed SQLite export of a TMFK bundle and its reader.
+
+Loading a bundle means parsing the whole pretty-printed JSON file. The SQLite
+file is opened read-only and memory-mapped instead, and every query touches
+only the rows it needs, so startup costs the same whatever the size of the
+matrix. Every object is kept as compact JSON in ``objects``; tactics,
+techniques, mitigations and relationships have tables keyed by STIX id and
+TMFK external id.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+from tmfk_index import get_external_id
+
+SCHEMA = """
+CREATE TABLE objects (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    external_id TEXT,
+    json TEXT NOT NULL
+);
+CREATE INDEX objects_external_id ON objects (external_id);
+CREATE TABLE tactics (
+    id TEXT PRIMARY KEY,
+    external_id TEXT NOT NULL,
+    shortname TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE techniques (
+    id TEXT PRIMARY KEY,
+    external_id TEXT NOT NULL,
+    name TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE technique_tactics (
+    shortname TEXT NOT NULL,
+    technique_id TEXT NOT NULL,
+    PRIMARY KEY (shortname, technique_id)
+) WITHOUT ROWID;
+CREATE TABLE mitigations (
+    id TEXT PRIMARY KEY,
+    external_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parent_mitigation TEXT
+) WITHOUT ROWID;
+CREATE TABLE relationships (
+    id TEXT PRIMARY KEY,
+    relationship_type TEXT NOT NULL,
+    source_ref TEXT NOT NULL,
+    target_ref TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX relationships_source ON relationships (source_ref);
+CREATE INDEX relationships_target ON relationships (target_ref);
+CREATE TABLE attack_ids (
+    attack_id TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    PRIMARY KEY (attack_id, object_id)
+) WITHOUT ROWID;
+"""
+
+
+def write_sqlite(path: Path, objects: Iterable[dict]) -> None:
+    """Write the objects of a bundle to a new SQLite file at ``path``."""
+    path = Path(path)
+    partial = path.with_name(f".{path.name}.tmp")
+    partial.unlink(missing_ok=True)
+
+    connection = sqlite3.connect(partial)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            for obj in objects:
+                _insert(connection, obj)
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    partial.replace(path)
+
+
+def _insert(connection: sqlite3.Connection, obj: dict) -> None:
+    external_id = get_external_id(obj)
+    connection.execute(
+        "INSERT INTO objects VALUES (?, ?, ?, ?)",
+        (
+            obj["id"],
+            obj["type"],
+            external_id,
+            json.dumps(obj, ensure_ascii=False, separators=(",", ":")),
+        ),
+    )
+    match obj["type"]:
+        case "x-mitre-tactic":
+            connection.execute(
+                "INSERT INTO tactics VALUES (?, ?, ?, ?)",
+                (obj["id"], external_id, obj["x_mitre_shortname"], obj["name"]),
+            )
+        case "attack-pattern":
+            connection.execute(
+                "INSERT INTO techniques VALUES (?, ?, ?)",
+                (obj["id"], external_id, obj["name"]),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO technique_tactics VALUES (?, ?)",
+                [
+                    (phase["phase_name"], obj["id"])
+                    for phase in obj.get("kill_chain_phases", [])
+                ],
+            )
+        case "course-of-action":
+            connection.execute(
+                "INSERT INTO mitigations VALUES (?, ?, ?, ?)",
+                (
+                    obj["id"],
+                    external_id,
+                    obj["name"],
+                    obj.get("x_mitre_parent_mitigation"),
+                ),
+            )
+        case "relationship":
+            connection.execute(
+                "INSERT INTO relationships VALUES (?, ?, ?, ?)",
+                (
+                    obj["id"],
+                    obj["relationship_type"],
+                    obj["source_ref"],
+                    obj["target_ref"],
+                ),
+            )
+    connection.executemany(
+        "INSERT OR IGNORE INTO attack_ids VALUES (?, ?)",
+        [(attack_id, obj["id"]) for attack_id in obj.get("x_mitre_ids", [])],
+    )
+
+
+class TmfkDatabase:
+    """Read-only queries over a file written by :func:`write_sqlite`.
+
+    The methods match :class:`tmfk_index.TmfkIndex`.
+    """
+
+    def __init__(self, path: Path, mmap_size: int = 1 << 26) -> None:
+        self.connection = sqlite3.connect(
+            f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1", uri=True
+        )
+        self.connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "TmfkDatabase":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _one(self, query: str, *params) -> dict:
+        row = self.connection.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _all(self, query: str, *params) -> list[dict]:
+        return [json.loads(row[0]) for row in self.connection.execute(query, params)]
+
+    def get(self, stix_id: str) -> dict:
+        return self._one("SELECT json FROM objects WHERE id = ?", stix_id)
+
+    def get_by_external_id(self, external_id: str) -> dict:
+        return self._one("SELECT json FROM objects WHERE external_id = ?", external_id)
+
+    def get_tactic(self, shortname: str) -> dict:
+        return self._one(
+            "SELECT json FROM objects JOIN tactics USING (id) WHERE shortname = ?",
+            shortname,
+        )
+
+    def get_techniques_by_tactic(self, shortname: str) -> list[dict]:
+        return self._all(
+            "SELECT json FROM technique_tactics JOIN objects ON id = technique_id "
+            "WHERE shortname = ? ORDER BY external_id",
+            shortname,
+        )
+
+    def get_by_attack_id(self, attack_id: str) -> list[dict]:
+        """TMFK objects related to an ATT&CK technique or mitigation id."""
+        return self._all(
+            "SELECT json FROM attack_ids JOIN objects ON id = object_id "
+            "WHERE attack_id = ? ORDER BY external_id",
+            attack_id,
+        )
+
+    def get_relationships(
+        self, source_ref: str = None, target_ref: str = None
+    ) -> list[dict]:
+        """Relationships from ``source_ref`` or to ``target_ref``."""
+        if source_ref is not None and target_ref is not None:
+            where = "source_ref = ? AND target_ref = ?"
+            params = (source_ref, target_ref)
+        elif source_ref is not None:
+            where, params = "source_ref = ?", (source_ref,)
+        else:
+            where, params = "target_ref = ?", (target_ref,)
+        return self._all(
+            "SELECT json FROM relationships JOIN objects USING (id) "
+            f"WHERE {where} ORDER BY id",
+            *params,
+        )
+
+    def get_mitigations(self, technique_id: str) -> list[dict]:
+        return self._all(
+            "SELECT json FROM relationships JOIN objects ON objects.id = source_ref "
+            "WHERE target_ref = ? AND relationship_type = 'mitigates' "
+            "ORDER BY external_id",
+            technique_id,
+        )
+
+    def get_mitigated_techniques(self, mitigation_id: str) -> list[dict]:
+        return self._all(
+            "SELECT json FROM relationships JOIN objects ON objects.id = target_ref "
+            "WHERE source_ref = ? AND relationship_type = 'mitigates' "
+            "ORDER BY external_id",
+            mitigation_id,
+        )
@@ -0,0 +1,61 @@
+"""Checks of generated bundles.
+
+Every object is parsed back with ``stix2`` and the references between objects
+are resolved: relationship ends, matrix tactics and the contents listed by the
+collection.
+"""
+
+import json
+from pathlib import Path
+
+import stix2
+from mitreattack.stix20 import custom_attack_objects  # noqa: F401 registers types
+from stix2.exceptions import STIXError
+
+
+def validate_bundle(path: Path) -> list[str]:
+    """Errors found in the bundle at ``path``, empty for a valid bundle."""
+    with open(path, encoding="utf-8") as f:
+        bundle = json.load(f)
+
+    errors = []
+    if bundle.get("type") != "bundle":
+        errors.append("not a STIX bundle")
+    objects = {}
+    for obj in bundle.get("objects", []):
+        if obj.get("id") in objects:
+            errors.append(f"{obj.get('id')}: duplicate id")
+        objects[obj.get("id")] = obj
+        try:
+            stix2.parse(obj, allow_custom=True)
+        except (STIXError, ValueError) as e:
+            errors.append(f"{obj.get('id')}: {e}")
+
+    for obj in objects.values():
+        refs = []
+        if obj.get("type") == "relationship":
+            refs = [obj.get("source_ref"), obj.get("target_ref")]
+        elif obj.get("type") == "x-mitre-matrix":
+            refs = obj.get("tactic_refs", [])
+        for ref in refs:
+            if ref not in objects:
+                errors.append(f"{obj['id']}: unresolved reference {ref}")
+
+    collections = [
+        obj for obj in objects.values() if obj.get("type") == "x-mitre-collection"
+    ]
+    if len(collections) != 1:
+        errors.append(f"{len(collections)} collections instead of 1")
+    for collection in collections:
+        listed = set()
+        for content in collection.get("x_mitre_contents", []):
+            ref = content.get("object_ref")
+            listed.add(ref)
+            if ref not in objects:
+                errors.append(f"{collection['id']}: unresolved content {ref}")
+            elif objects[ref].get("modified") != content.get("object_modified"):
+                errors.append(f"{collection['id']}: stale modified of {ref}")
+        for object_id in objects.keys() - listed - {collection["id"]}:
+            errors.append(f"{collection['id']}: {object_id} is not listed")
+
+    return errors
@@ -0,0 +1,175 @@
+"""Rebuild the latest bundles whenever an upstream document changes.
+
+The documents are polled for changes of their modification time and size.
+Only the changed documents are extracted again, and only their STIX objects
+are rebuilt: the objects of every other record are reused from the memo of
+:func:`parse.build_tmfk`, together with their ``mitigates`` relationships.
+The matrix and the collection are rebuilt on every pass since they list every
+object. Uncommitted edits keep the dates of their last commit. The documents
+of a failed rebuild are retried on the next poll, even when unchanged.
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+
+from cache import DocumentCache
+from constants import BUILD_PATH, TMFK_PATH, Mode, ModeEnumAttribute
+from git_tools import RepoContext
+from parallel import extract_documents
+from parse import assemble_model, list_documents, parse_tmfk, stamp_dates
+from serialization import SerializationCache
+
+logger = logging.getLogger(__name__)
+
+WATCHED_FOLDERS = ["tactics", "techniques", "mitigations"]
+
+# Snapshot entry of a document whose rebuild failed, unlike any real one.
+RETRY = (-1, -1)
+
+
+def snapshot(tmfk_path: Path) -> dict[str, tuple[int, int]]:
+    """Modification time and size of every markdown document."""
+    documents = {}
+    for folder in WATCHED_FOLDERS:
+        for root, _, files in os.walk(Path(tmfk_path) / "docs" / folder):
+            for name in files:
+                if name.endswith(".md"):
+                    path = os.path.normpath(os.path.join(root, name))
+                    stat = os.stat(path)
+                    documents[path] = (stat.st_mtime_ns, stat.st_size)
+    return documents
+
+
+class WatchedBuild:
+    """Records and built objects of the matrix, patched document by document."""
+
+    def __init__(
+        self,
+        modes: list[ModeEnumAttribute] = tuple(Mode),
+        tmfk_path: Path = TMFK_PATH,
+        output_path: Path = BUILD_PATH,
+        cache: DocumentCache = None,
+    ) -> None:
+        self.modes = modes
+        self.tmfk_path = tmfk_path
+        self.output_path = Path(output_path)
+        self.cache = cache
+        self.repo = RepoContext(tmfk_path)
+        self.head = None
+        self.records = {}
+        self.memos = {mode: {} for mode in modes}
+        self.shared_memo = {}
+        self.serializer = SerializationCache()
+
+    def _refresh_history(self) -> None:
+        head = self.repo.repo.head.commit.hexsha
+        if head != self.head:
+            self.head = head
+            self.repo.clear()
+            # Dates of every record may have moved with the new commit.
+            self.records.clear()
+            for memo in self.memos.values():
+                memo.clear()
+            self.shared_memo.clear()
+
+    def update(self, changed: set[str]) -> int:
+        """Extract the ``changed`` documents and rewrite the bundles.
+
+        Returns
+        -------
+        int
+            number of documents extracted again
+        """
+        self._refresh_history()
+        jobs = list_documents(self.tmfk_path)
+        stale = [
+            job
+            for job in jobs
+            if os.path.normpath(job.file_path) in changed
+            or os.path.normpath(job.file_path) not in self.records
+        ]
+        records = extract_documents(stale, cache=self.cache)
+        stamp_dates(stale, records, self.repo)
+        for job, record in zip(stale, records):
+            self.records[os.path.normpath(job.file_path)] = record
+
+        current = [os.path.normpath(job.file_path) for job in jobs]
+        for path in self.records.keys() - set(current):
+            del self.records[path]
+        model = assemble_model(
+            jobs,
+            [self.records[path] for path in current],
+            self.tmfk_path,
+            repo=self.repo,
+        )
+
+        live = {id(record) for record in model.records}
+        for memo in [*self.memos.values(), self.shared_memo]:
+            for key in memo.keys() - live:
+                del memo[key]
+        for mode, memo in self.memos.items():
+            parse_tmfk(
+                model,
+                mode,
+                self.output_path,
+                memo=memo,
+                release=False,
+                shared_memo=self.shared_memo,
+                serializer=self.serializer,
+            )
+        self.serializer.prune()
+        return len(stale)
+
+
+def poll(build: WatchedBuild, documents: dict[str, tuple]) -> dict[str, tuple]:
+    """Rebuild after the changes of the documents since the snapshot ``documents``.
+
+    Returns
+    -------
+    dict[str, tuple]
+        the snapshot of the next pass; the documents of a failed rebuild are
+        marked as changed in it, so the next pass retries them
+    """
+    current = snapshot(build.tmfk_path)
+    changed = {
+        path
+        for path in documents.keys() | current.keys()
+        if documents.get(path) != current.get(path)
+    }
+    if not changed:
+        return documents
+
+    started = time.perf_counter()
+    try:
+        rebuilt = build.update(changed)
+    except Exception:
+        logger.exception("Could not rebuild after changes to %s", sorted(changed))
+        return {**current, **{path: RETRY for path in changed}}
+    logger.info(
+        "Rebuilt %d changed documents in %.3fs",
+        rebuilt,
+        time.perf_counter() - started,
+    )
+    return current
+
+
+def watch(
+    modes: list[ModeEnumAttribute] = tuple(Mode),
+    tmfk_path: Path = TMFK_PATH,
+    output_path: Path = BUILD_PATH,
+    cache: DocumentCache = None,
+    interval: float = 0.5,
+) -> None:
+    """Poll the upstream documents every ``interval`` seconds until interrupted."""
+    build = WatchedBuild(modes, tmfk_path, output_path, cache)
+    documents = poll(build, {})
+    logger.info("Watching %d documents of %s", len(documents), tmfk_path)
+
+    try:
+        while True:
+            time.sleep(interval)
+            documents = poll(build, documents)
+    except KeyboardInterrupt:
+        pass
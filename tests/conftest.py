@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules of src import each other by bare name, as when run from there.
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures"
+REPO_PATH = Path(__file__).parent.parent
+
+
+def _git(path: Path, *args: str, date: str = None) -> None:
+    env = dict(os.environ)
+    if date is not None:
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = date
+    subprocess.run(
+        ["git", *args], cwd=path, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+@pytest.fixture(scope="session")
+def upstream(tmp_path_factory) -> Path:
+    """A Threat-Matrix-for-Kubernetes clone of the documents of fixtures/tmfk.
+
+    The documents are committed on ``main`` at fixed dates, then one mitigation
+    is edited in a second commit.
+    """
+    path = tmp_path_factory.mktemp("upstream")
+    shutil.copytree(FIXTURES_PATH / "tmfk", path, dirs_exist_ok=True)
+    _git(path, "init", "-q", "-b", "main")
+    _git(path, "config", "user.email", "tests@example.com")
+    _git(path, "config", "user.name", "tests")
+    _git(path, "add", "-A")
+    _git(path, "commit", "-q", "-m", "documents", date="2022-10-20T10:00:00+02:00")
+
+    mitigation = path / "docs" / "mitigations" / "MS-M9003 Mitigation 3.md"
+    mitigation.write_text(
+        mitigation.read_text(encoding="utf-8").replace("restricts", "limits"),
+        encoding="utf-8",
+    )
+    _git(path, "commit", "-q", "-am", "edit", date="2022-10-23T10:00:00+02:00")
+    return path
+
+
+@pytest.fixture
+def index_path(tmp_path) -> Path:
+    """A copy of the index.json of the repository."""
+    path = tmp_path / "index.json"
+    shutil.copyfile(REPO_PATH / "index.json", path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def fixture_build(upstream, tmp_path_factory) -> Path:
+    """The output folder of a build of ``upstream`` in every mode."""
+    from parse import run_build
+
+    path = tmp_path_factory.mktemp("build")
+    index_path = path / "index.json"
+    shutil.copyfile(REPO_PATH / "index.json", index_path)
+    run_build(
+        tmfk_path=upstream, output_path=path, index_path=index_path, use_cache=False
+    )
+    return path
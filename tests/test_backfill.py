@@ -0,0 +1,72 @@
+import shutil
+
+import backfill as backfill_module
+import git_tools
+from backfill import backfill
+from conftest import _git
+from parse import run_build
+
+BUNDLES = ["tmfk_strict", "tmfk_attack_compatible"]
+
+
+def _hashes(upstream) -> list[str]:
+    """Short hashes of the commits of ``upstream``, newest first."""
+    output = git_tools.open_repo(upstream).git.log("--format=%H")
+    return [sha[:7] for sha in output.split()]
+
+
+def test_backfilled_bundles_match_run_build(
+    upstream, fixture_build, tmp_path, index_path
+):
+    output_path = tmp_path / "backfill"
+    backfill(
+        "main",
+        tmfk_path=upstream,
+        output_path=output_path,
+        index_path=index_path,
+        use_cache=False,
+    )
+    head, previous = _hashes(upstream)
+
+    # run_build builds the commit of main, moved back in a copy.
+    checkout = tmp_path / "previous"
+    shutil.copytree(upstream, checkout)
+    _git(checkout, "reset", "-q", "--hard", "HEAD~1")
+    previous_build = tmp_path / "previous_build"
+    run_build(
+        tmfk_path=checkout,
+        output_path=previous_build,
+        index_path=index_path,
+        use_cache=False,
+    )
+
+    for name in BUNDLES:
+        for commit_hash, build_path in (
+            (head, fixture_build),
+            (previous, previous_build),
+        ):
+            bundle = f"{name}_{commit_hash}.json"
+            assert (output_path / bundle).read_bytes() == (
+                build_path / bundle
+            ).read_bytes(), bundle
+
+
+def test_history_is_logged_once(upstream, tmp_path, index_path, monkeypatch):
+    logged = []
+
+    class CountedLog(git_tools.GitLog):
+        def __init__(self, repo_path, rev: str = "HEAD") -> None:
+            logged.append(rev)
+            super().__init__(repo_path, rev)
+
+    monkeypatch.setattr(git_tools, "GitLog", CountedLog)
+    monkeypatch.setattr(backfill_module, "GitLog", CountedLog)
+    backfill(
+        "main",
+        tmfk_path=upstream,
+        output_path=tmp_path / "backfill",
+        index_path=index_path,
+        use_cache=False,
+    )
+    assert len(logged) == 1
+    assert len(list((tmp_path / "backfill").glob("tmfk_strict_*.json"))) == 2
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import batch
+from batch import BatchFactory, has_expected_internals
+from constants import Mode
+from custom_tmfk_objects import ObjectRef, Relationship
+from parse import mitigates_factory
+from serialization import canonical_json
+from stix2.v21 import Identity
+
+CREATED = datetime(2022, 10, 20, 8, tzinfo=timezone.utc)
+
+
+def _relationships(count: int) -> list[dict]:
+    return [
+        {
+            "id": f"relationship--00000000-0000-4000-8000-{i:012d}",
+            "created": CREATED,
+            "modified": CREATED + timedelta(days=i),
+            "description": f"Mitigation {i}",
+            "source_ref": f"course-of-action--00000000-0000-4000-8000-{i:012d}",
+            "target_ref": f"attack-pattern--00000000-0000-4000-8000-{i % 3:012d}",
+        }
+        for i in range(count)
+    ]
+
+
+def _assert_same(obj, expected) -> None:
+    assert type(obj) is type(expected)
+    assert dict(obj.items()) == dict(expected.items())
+    assert sorted(obj._defaulted_optional_properties) == sorted(
+        expected._defaulted_optional_properties
+    )
+    assert canonical_json(obj) == canonical_json(expected)
+    assert obj.serialize(pretty=True) == expected.serialize(pretty=True)
+
+
+@pytest.mark.parametrize("mode", list(Mode))
+def test_relationships_match_the_constructor(mode):
+    factory = mitigates_factory(mode)
+    for properties in _relationships(5):
+        _assert_same(
+            factory.build(**properties), Relationship(**factory.shared, **properties)
+        )
+
+
+def test_empty_values_are_built_by_the_class():
+    factory = mitigates_factory(Mode.STRICT)
+    first, second = _relationships(2)
+    factory.build(**first)
+    second["description"] = None
+    _assert_same(factory.build(**second), Relationship(**factory.shared, **second))
+
+
+def test_object_refs_match_the_constructor():
+    factory = BatchFactory(ObjectRef)
+    for properties in _relationships(4):
+        refs = {
+            "object_ref": properties["id"],
+            "object_modified": properties["modified"],
+        }
+        _assert_same(factory.build(**refs), ObjectRef(**refs))
+
+
+def _counted(built: list) -> type:
+    """Relationship class recording the id of every object it builds."""
+
+    class Counted(Relationship):
+        def __init__(self, **properties) -> None:
+            built.append(properties["id"])
+            super().__init__(**properties)
+
+    return Counted
+
+
+def test_fast_path_builds_the_first_object_only():
+    built = []
+    factory = BatchFactory(_counted(built), relationship_type="mitigates")
+    relationships = _relationships(3)
+    for properties in relationships:
+        factory.build(**properties)
+    assert built == [relationships[0]["id"]]
+
+
+def test_fallback_builds_every_object_with_its_class(monkeypatch):
+    built = []
+    Counted = _counted(built)
+    monkeypatch.setattr(batch, "FAST_PATH", False)
+    factory = BatchFactory(Counted, relationship_type="mitigates")
+    relationships = _relationships(3)
+    objects = [factory.build(**properties) for properties in relationships]
+    assert built == [properties["id"] for properties in relationships]
+    for obj, properties in zip(objects, relationships):
+        _assert_same(obj, Counted(relationship_type="mitigates", **properties))
+
+
+def test_internals_are_checked():
+    assert has_expected_internals()
+    assert batch.FAST_PATH
+
+
+def test_missing_internals_disable_the_fast_path(monkeypatch):
+    class Moved:
+        _properties = Identity._properties
+
+        def __init__(self, **properties) -> None:
+            self._state = properties
+
+    monkeypatch.setattr(batch, "Identity", Moved)
+    assert not has_expected_internals()
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from parse import run_build
+
+
+def _build(upstream: Path, output_path: Path, index_path: Path) -> Path:
+    run_build(
+        tmfk_path=upstream,
+        output_path=output_path,
+        index_path=index_path,
+        use_cache=False,
+    )
+    return output_path
+
+
+def test_build_is_byte_identical(upstream, tmp_path, index_path):
+    first = _build(upstream, tmp_path / "first", index_path)
+    second = _build(upstream, tmp_path / "second", index_path)
+
+    names = sorted(path.name for path in first.glob("*.json"))
+    assert "tmfk_strict.json" in names
+    assert "tmfk_attack_compatible.json" in names
+    assert names == sorted(path.name for path in second.glob("*.json"))
+    for name in names:
+        assert (first / name).read_bytes() == (second / name).read_bytes(), name
@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bundle_check import check_bundle
+from bundle_io import iter_bundle_objects
+
+REPO_PATH = Path(__file__).parent.parent
+STRICT = REPO_PATH / "build" / "tmfk_strict.json"
+
+ATTACK_TECHNIQUE = {
+    "type": "attack-pattern",
+    "spec_version": "2.1",
+    "id": "attack-pattern--0042a9f5-f053-4769-b3ef-9ad018dfa298",
+    "created": "2020-01-01T00:00:00.000Z",
+    "modified": "2020-01-01T00:00:00.000Z",
+    "name": "Revoked ATT&CK technique",
+    "revoked": True,
+    "external_references": [{"source_name": "mitre-attack", "external_id": "T1000"}],
+}
+
+
+def _write(path: Path, objects: list[dict]) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"type": "bundle", "id": "bundle--1", "objects": objects}, f, indent=4
+        )
+    return path
+
+
+def _objects() -> list[dict]:
+    return list(iter_bundle_objects(STRICT))
+
+
+def _list(objects: list[dict], obj: dict) -> None:
+    """Add ``obj`` to the bundle and to its collection."""
+    objects.append(obj)
+    collection = next(o for o in objects if o["type"] == "x-mitre-collection")
+    collection["x_mitre_contents"].append(
+        {"object_ref": obj["id"], "object_modified": obj["modified"]}
+    )
+
+
+def _tmfk_technique(objects: list[dict]) -> dict:
+    return next(o for o in objects if o["type"] == "attack-pattern")
+
+
+def test_committed_bundles_are_valid():
+    for path in sorted((REPO_PATH / "build").glob("tmfk_*.json")):
+        assert check_bundle(path) == [], path
+
+
+def test_attack_objects_skip_the_tmfk_requirements(tmp_path):
+    objects = _objects()
+    # A merged collection, as merge.merge_bundles writes it.
+    collection = next(o for o in objects if o["type"] == "x-mitre-collection")
+    collection["id"] = "x-mitre-collection--6b0e0f5b-7e1c-4f67-9a3b-3f7d1c0e2a11"
+    _list(objects, ATTACK_TECHNIQUE)
+    _list(
+        objects,
+        {
+            **ATTACK_TECHNIQUE,
+            "id": "attack-pattern--1d9a1c52-2a54-4d0e-b0b5-6a5c8d2b5d3e",
+            "revoked": False,
+            "kill_chain_phases": [
+                {"kill_chain_name": "mitre-attack", "phase_name": "reconnaissance"}
+            ],
+        },
+    )
+    assert check_bundle(_write(tmp_path / "merged.json", objects)) == []
+
+
+def test_tmfk_technique_without_phases(tmp_path):
+    objects = _objects()
+    technique = _tmfk_technique(objects)
+    del technique["kill_chain_phases"]
+    del technique["x_mitre_domains"]
+    assert check_bundle(_write(tmp_path / "bundle.json", objects)) == [
+        f"{technique['id']}: missing kill_chain_phases",
+        f"{technique['id']}: missing x_mitre_domains",
+    ]
+
+
+def test_tmfk_phase_must_name_a_tactic(tmp_path):
+    objects = _objects()
+    technique = _tmfk_technique(objects)
+    technique["kill_chain_phases"][0]["phase_name"] = "nowhere"
+    assert check_bundle(_write(tmp_path / "bundle.json", objects)) == [
+        f"{technique['id']}: phase nowhere is not a tactic"
+    ]
+
+
+def test_stream_crosses_chunk_boundaries():
+    objects = list(iter_bundle_objects(STRICT, chunk_size=7))
+    with open(STRICT, encoding="utf-8") as f:
+        assert objects == json.load(f)["objects"]
+
+
+def test_stream_of_an_empty_bundle(tmp_path):
+    assert list(iter_bundle_objects(_write(tmp_path / "empty.json", []))) == []
+
+
+def test_stream_of_a_truncated_bundle(tmp_path):
+    content = STRICT.read_text(encoding="utf-8")
+    path = tmp_path / "truncated.json"
+    path.write_text(content[: len(content) // 2], encoding="utf-8")
+    with pytest.raises(ValueError, match="truncated bundle"):
+        list(iter_bundle_objects(path, chunk_size=1024))
+    assert check_bundle(path) == ["truncated bundle"]
+
+
+@pytest.mark.parametrize(
+    "content", ['{"type": "identity", "objects": []}', "[1, 2, 3]", ""]
+)
+def test_stream_of_a_file_that_is_not_a_bundle(tmp_path, content):
+    path = tmp_path / "other.json"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_bundle_objects(path))
@@ -0,0 +1,138 @@
+import json
+from datetime import datetime, timezone
+
+from bundle_diff import diff_bundles, find_previous_bundle, write_delta
+
+
+def _technique(stix_id: str, modified: str, name: str) -> dict:
+    return {
+        "type": "attack-pattern",
+        "id": stix_id,
+        "created": "2022-10-01T00:00:00.000Z",
+        "modified": modified,
+        "name": name,
+    }
+
+
+PREVIOUS = {
+    "attack-pattern--1": _technique(
+        "attack-pattern--1", "2022-10-01T00:00:00.000Z", "Kept"
+    ),
+    "attack-pattern--2": _technique(
+        "attack-pattern--2", "2022-10-01T00:00:00.000Z", "Renamed"
+    ),
+    "attack-pattern--3": _technique(
+        "attack-pattern--3", "2022-10-01T00:00:00.000Z", "Retouched"
+    ),
+    "attack-pattern--4": _technique(
+        "attack-pattern--4", "2022-10-01T00:00:00.000Z", "Removed"
+    ),
+}
+CURRENT = {
+    "attack-pattern--1": PREVIOUS["attack-pattern--1"],
+    "attack-pattern--2": _technique(
+        "attack-pattern--2", "2022-10-05T00:00:00.000Z", "New name"
+    ),
+    # Same timestamp, other content: still a change.
+    "attack-pattern--3": _technique(
+        "attack-pattern--3", "2022-10-01T00:00:00.000Z", "Retouched!"
+    ),
+    "attack-pattern--5": _technique(
+        "attack-pattern--5", "2022-10-05T00:00:00.000Z", "Added"
+    ),
+}
+REVOKED_AT = datetime(2022, 10, 6, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def test_added_changed_and_revoked():
+    delta = diff_bundles(PREVIOUS, CURRENT, revoked_at=REVOKED_AT)
+
+    assert [obj["id"] for obj in delta["added"]] == ["attack-pattern--5"]
+    assert [obj["id"] for obj in delta["changed"]] == [
+        "attack-pattern--2",
+        "attack-pattern--3",
+    ]
+    assert delta["revoked"] == [
+        {
+            **PREVIOUS["attack-pattern--4"],
+            "revoked": True,
+            "modified": "2022-10-06T12:30:15.123Z",
+        }
+    ]
+    assert "revoked" not in PREVIOUS["attack-pattern--4"]
+
+
+def test_revoked_keeps_a_later_modified():
+    previous = {
+        "attack-pattern--4": _technique(
+            "attack-pattern--4", "2023-01-01T00:00:00.000Z", "Removed"
+        )
+    }
+    delta = diff_bundles(previous, {}, revoked_at=REVOKED_AT)
+    assert delta["revoked"][0]["modified"] == "2023-01-01T00:00:00.000Z"
+
+
+def test_identical_bundles_have_an_empty_delta():
+    assert diff_bundles(PREVIOUS, dict(PREVIOUS), revoked_at=REVOKED_AT) == {
+        "added": [],
+        "changed": [],
+        "revoked": [],
+    }
+
+
+def test_write_delta(tmp_path):
+    path = tmp_path / "tmfk_strict_aaaaaaa_bbbbbbb.delta.json"
+    delta = diff_bundles(PREVIOUS, CURRENT, revoked_at=REVOKED_AT)
+    write_delta(path, "aaaaaaa", "bbbbbbb", delta)
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {
+        "from": "aaaaaaa",
+        "to": "bbbbbbb",
+        **delta,
+    }
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_previous_bundle_skips_missing_commits(tmp_path):
+    (tmp_path / "tmfk_strict_ccccccc.json").write_text("{}")
+    history = [
+        ("aaaaaaa", REVOKED_AT),
+        ("bbbbbbb", REVOKED_AT),
+        ("ccccccc", REVOKED_AT),
+    ]
+    assert find_previous_bundle(tmp_path, "tmfk_strict", history) == (
+        "ccccccc",
+        tmp_path / "tmfk_strict_ccccccc.json",
+    )
+    assert find_previous_bundle(tmp_path, "tmfk_strict", history[:2]) == (None, None)
+
+
+def test_build_writes_the_delta_from_the_previous_commit(
+    upstream, tmp_path, index_path
+):
+    from backfill import backfill
+    from parse import run_build
+
+    output_path = tmp_path / "build"
+    backfill(
+        "main~1", tmfk_path=upstream, output_path=output_path, index_path=index_path
+    )
+    run_build(tmfk_path=upstream, output_path=output_path, index_path=index_path)
+
+    deltas = sorted(output_path.glob("tmfk_strict_*_*.delta.json"))
+    assert len(deltas) == 1
+    delta = json.loads(deltas[0].read_text(encoding="utf-8"))
+    assert delta["added"] == [] and delta["revoked"] == []
+    assert "MS-M9003" in {
+        obj["external_references"][0]["external_id"]
+        for obj in delta["changed"]
+        if obj["type"] == "course-of-action"
+    }
+
+    index = json.loads(index_path.read_text(encoding="utf-8"))
+    strict = next(c for c in index["collections"] if c["name"] == "Strict TMFK")
+    current = deltas[0].name.split("_")[-1].split(".")[0]
+    version = next(
+        v for v in strict["versions"] if v["url"].endswith(f"_{current}.json")
+    )
+    assert version["delta"]["url"].endswith(deltas[0].name)
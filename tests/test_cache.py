@@ -0,0 +1,83 @@
+import shutil
+from pathlib import Path
+
+import cache
+from cache import PARSER_SOURCES, PARSER_VERSION, DocumentCache, get_parser_version
+from cli import main
+from extract import extract_technique
+from models import TechniqueRecord
+
+SOURCE_PATH = Path(cache.__file__).parent
+TECHNIQUE = "docs/techniques/Technique 1.md"
+
+
+class CountingExtract:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, content: str) -> TechniqueRecord:
+        self.calls += 1
+        return extract_technique(content)
+
+
+def test_records_are_reused(upstream, tmp_path):
+    content = (upstream / TECHNIQUE).read_text(encoding="utf-8")
+    extract = CountingExtract()
+
+    first = DocumentCache(tmp_path).load("technique", content, extract, TechniqueRecord)
+    documents = DocumentCache(tmp_path)
+    second = documents.load("technique", content, extract, TechniqueRecord)
+    assert extract.calls == 1
+    assert (documents.hits, documents.misses) == (1, 0)
+    assert second == first == extract_technique(content)
+
+
+def test_editing_a_parser_source_misses(upstream, tmp_path, monkeypatch):
+    sources = tmp_path / "src"
+    sources.mkdir()
+    for source in PARSER_SOURCES:
+        shutil.copyfile(SOURCE_PATH / source, sources / source)
+    assert get_parser_version(sources) == PARSER_VERSION
+
+    content = (upstream / TECHNIQUE).read_text(encoding="utf-8")
+    extract = CountingExtract()
+    DocumentCache(tmp_path / "cache").load(
+        "technique", content, extract, TechniqueRecord
+    )
+
+    constants = sources / "constants.py"
+    constants.write_text(
+        constants.read_text(encoding="utf-8").replace('"MS-T0100"', '"MS-T0101"'),
+        encoding="utf-8",
+    )
+    edited = get_parser_version(sources)
+    assert edited != PARSER_VERSION
+
+    monkeypatch.setattr(cache, "PARSER_VERSION", edited)
+    documents = DocumentCache(tmp_path / "cache")
+    documents.load("technique", content, extract, TechniqueRecord)
+    assert extract.calls == 2
+    assert (documents.hits, documents.misses) == (0, 1)
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == [edited]
+
+
+def test_disabled_cache_always_extracts(upstream, tmp_path):
+    content = (upstream / TECHNIQUE).read_text(encoding="utf-8")
+    extract = CountingExtract()
+    documents = DocumentCache(tmp_path / "cache", enabled=False)
+    for _ in range(2):
+        documents.load("technique", content, extract, TechniqueRecord)
+    assert extract.calls == 2
+    assert (documents.hits, documents.misses) == (0, 0)
+    assert not (tmp_path / "cache").exists()
+
+
+def test_build_without_cache(upstream, tmp_path, index_path):
+    out = tmp_path / "out"
+    argv = ["--upstream", str(upstream), "--out", str(out), "--index", str(index_path)]
+    assert main(["build", "--no-cache", *argv]) == 0
+    assert (out / "tmfk_strict.json").exists()
+    assert not (out / ".cache").exists()
+
+    assert main(["build", *argv]) == 0
+    assert any((out / ".cache" / PARSER_VERSION).iterdir())
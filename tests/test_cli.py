@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from cli import dependencies, make_parser, with_command
+from constants import BUILD_PATH, Mode
+
+
+def _parse(*argv: str):
+    return make_parser().parse_args(with_command(list(argv)))
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["build", "--mode", "strict", "--out", "out", "--upstream", "up"],
+        ["--mode", "strict", "--out", "out", "--upstream", "up"],
+        ["--out", "out", "build", "--mode", "strict", "--upstream", "up"],
+    ],
+)
+def test_build_options(argv):
+    args = _parse(*argv)
+    assert args.command == "build"
+    assert args.mode == [Mode.STRICT]
+    assert args.out == Path("out")
+    assert args.upstream == Path("up")
+
+
+def test_out_after_the_command_wins():
+    assert _parse("--out", "first", "check", "--out", "second").out == Path("second")
+    assert _parse("--out", "first", "check").out == Path("first")
+    assert _parse("check").out == BUILD_PATH
+
+
+def test_out_value_named_like_a_command():
+    args = _parse("--out", "build", "validate")
+    assert args.command == "validate"
+    assert args.out == Path("build")
+
+
+def test_watch_is_imported_with_watch_only():
+    assert "watch" not in dependencies(_parse("build"))
+    assert "watch" in dependencies(_parse("build", "--watch"))
+
+
+def test_parse_module_runs_the_build_command():
+    script = Path(__file__).parent.parent / "src" / "parse.py"
+    result = subprocess.run(
+        [sys.executable, str(script), "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.startswith("usage: tmfk-build build")
+    assert "--no-cache" in result.stdout
+    assert "--workers" in result.stdout
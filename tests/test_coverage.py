@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from bundle_io import iter_bundle_objects
+from coverage import CoverageGraph
+from tmfk_index import get_external_id
+
+STRICT = Path(__file__).parent.parent / "build" / "tmfk_strict.json"
+
+
+def test_covered_and_gaps_partition_the_matrix():
+    graph = CoverageGraph.from_file(STRICT)
+    deployed = sorted(graph.mitigations)[:5]
+    covered = graph.covered(deployed)
+    gaps = graph.gaps(deployed)
+    assert sorted(covered + gaps) == graph.techniques
+    assert not set(covered) & set(gaps)
+
+
+def test_set_cover_covers_what_every_mitigation_covers():
+    graph = CoverageGraph.from_file(STRICT)
+    for tactic in graph.tactics:
+        cover = graph.set_cover(tactic)
+        assert graph.gaps(cover, tactic) == graph.gaps(None, tactic)
+
+
+def test_cache_keeps_the_most_recently_used_results():
+    graph = CoverageGraph.from_file(STRICT, cache_size=3)
+    mitigations = sorted(graph.mitigations)
+    graph.covered(mitigations[:1])
+    for i in range(2, 10):
+        graph.covered(mitigations[:i])
+        graph.covered(mitigations[:1])
+    assert len(graph._cache) == 3
+    assert ("covered", frozenset(mitigations[:1])) in graph._cache
+    assert ("covered", frozenset(mitigations[:9])) in graph._cache
+
+
+def test_objects_without_a_tmfk_id_are_left_out():
+    objects = list(iter_bundle_objects(STRICT))
+    graph = CoverageGraph(objects)
+    technique = next(obj for obj in objects if obj["type"] == "attack-pattern")
+    extra = [
+        {
+            "type": "attack-pattern",
+            "id": "attack-pattern--00000000-0000-4000-8000-000000000001",
+            "name": "Valid Accounts",
+            "external_references": [
+                {"source_name": "mitre-attack", "external_id": "T1078"}
+            ],
+            "kill_chain_phases": [
+                {"kill_chain_name": "mitre-attack", "phase_name": "execution"}
+            ],
+        },
+        {
+            "type": "attack-pattern",
+            "id": "attack-pattern--00000000-0000-4000-8000-000000000002",
+            "name": "Custom technique without phases or references",
+        },
+        {
+            "type": "course-of-action",
+            "id": "course-of-action--00000000-0000-4000-8000-000000000003",
+            "name": "Custom mitigation",
+        },
+        {
+            "type": "relationship",
+            "id": "relationship--00000000-0000-4000-8000-000000000004",
+            "relationship_type": "mitigates",
+            "source_ref": "course-of-action--00000000-0000-4000-8000-000000000003",
+            "target_ref": technique["id"],
+        },
+    ]
+    merged = CoverageGraph(objects + extra)
+    assert merged.techniques == graph.techniques
+    assert merged.tactics == graph.tactics
+    assert merged.mitigations == graph.mitigations
+
+
+def test_techniques_without_phases():
+    objects = list(iter_bundle_objects(STRICT))
+    technique = next(obj for obj in objects if obj["type"] == "attack-pattern")
+    del technique["kill_chain_phases"]
+    graph = CoverageGraph(objects)
+    tmfk_id = get_external_id(technique)
+    assert tmfk_id in graph.techniques
+    assert all(tmfk_id not in graph.gaps(None, tactic) for tactic in graph.tactics)
+    assert tmfk_id in graph.gaps([])
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from cli import main
+from crosswalk import build_crosswalk, read_attack_ids
+from git_tools import RepoContext
+from parse import read_tmfk
+
+
+def _attack_object(stix_type: str, uuid: str, attack_id: str, **properties) -> dict:
+    return {
+        "type": stix_type,
+        "id": f"{stix_type}--{uuid}",
+        "name": attack_id,
+        "external_references": [
+            {"source_name": "capec", "external_id": "CAPEC-1"},
+            {"source_name": "mitre-attack", "external_id": attack_id},
+        ],
+        **properties,
+    }
+
+
+@pytest.fixture
+def attack_bundle(tmp_path):
+    """ATT&CK objects where T1078.004 is revoked by T1078 and M1035 is
+    deprecated; M1026 is missing."""
+    objects = [
+        _attack_object(
+            "attack-pattern",
+            "00000000-0000-4000-8000-000000000001",
+            "T1078.004",
+            revoked=True,
+        ),
+        _attack_object(
+            "attack-pattern", "00000000-0000-4000-8000-000000000002", "T1078"
+        ),
+        _attack_object(
+            "course-of-action",
+            "00000000-0000-4000-8000-000000000003",
+            "M1035",
+            x_mitre_deprecated=True,
+        ),
+        _attack_object(
+            "course-of-action", "00000000-0000-4000-8000-000000000004", "M1047"
+        ),
+        {
+            "type": "relationship",
+            "id": "relationship--00000000-0000-4000-8000-000000000005",
+            "relationship_type": "revoked-by",
+            "source_ref": "attack-pattern--00000000-0000-4000-8000-000000000001",
+            "target_ref": "attack-pattern--00000000-0000-4000-8000-000000000002",
+        },
+    ]
+    path = tmp_path / "enterprise-attack.json"
+    path.write_text(
+        json.dumps({"type": "bundle", "id": "bundle--attack", "objects": objects}),
+        encoding="utf-8",
+    )
+    return path
+
+
+@pytest.fixture(scope="module")
+def model(upstream):
+    repo = RepoContext(upstream)
+    try:
+        return read_tmfk(repo)
+    finally:
+        repo.close()
+
+
+def test_maps_both_ways(model):
+    crosswalk = build_crosswalk(model)
+    assert crosswalk["tmfk_to_attack"]["techniques"] == {
+        "MS-TA9000": [],
+        "MS-TA9001": ["T1078.004"],
+        "MS-TA9003": [],
+        "MS-TA9004": ["T1078.004"],
+    }
+    assert crosswalk["attack_to_tmfk"] == {
+        "techniques": {"T1078.004": ["MS-TA9001", "MS-TA9004"]},
+        "mitigations": {"M1026": ["MS-M9000.001"], "M1035": ["MS-M9000"]},
+    }
+    for kind in ("techniques", "mitigations"):
+        for tmfk_id, attack_ids in crosswalk["tmfk_to_attack"][kind].items():
+            for attack_id in attack_ids:
+                assert tmfk_id in crosswalk["attack_to_tmfk"][kind][attack_id]
+
+    assert crosswalk["parent_to_children"] == {"MS-M9000": ["MS-M9000.001"]}
+    assert crosswalk["child_to_parent"] == {"MS-M9000.001": "MS-M9000"}
+    assert set(crosswalk["stix_ids"]) == set(
+        crosswalk["tmfk_to_attack"]["techniques"]
+    ) | set(crosswalk["tmfk_to_attack"]["mitigations"])
+    assert "validation" not in crosswalk
+
+
+def test_build_writes_the_crosswalk(model, fixture_build):
+    with open(fixture_build / "tmfk_crosswalk.json", encoding="utf-8") as f:
+        assert json.load(f) == build_crosswalk(model)
+
+
+def test_revoked_by_is_followed(attack_bundle):
+    attack = read_attack_ids(attack_bundle)
+    assert attack["T1078.004"]["revoked"]
+    assert attack["T1078.004"]["revoked_by"] == "T1078"
+    assert attack["T1078"]["revoked_by"] is None
+    assert attack["M1035"]["deprecated"]
+
+
+def test_validation(model, attack_bundle):
+    validation = build_crosswalk(model, attack_bundle)["validation"]
+    assert validation == {
+        "attack_bundle": "enterprise-attack.json",
+        "unknown": ["M1026"],
+        "revoked": {"T1078.004": "T1078"},
+        "deprecated": ["M1035"],
+    }
+
+
+def test_attack_bundle_option(upstream, attack_bundle, tmp_path, index_path):
+    out = tmp_path / "out"
+    argv = ["build", "--no-cache", "--upstream", str(upstream), "--out", str(out)]
+    argv += ["--index", str(index_path), "--attack-bundle", str(attack_bundle)]
+    assert main(argv) == 0
+    with open(out / "tmfk_crosswalk.json", encoding="utf-8") as f:
+        assert json.load(f)["validation"]["unknown"] == ["M1026"]
@@ -0,0 +1,132 @@
+import logging
+from datetime import datetime
+
+import pytest
+
+from conftest import _git
+from git_tools import (
+    GitHistoryIndex,
+    GitLog,
+    get_file_creation_date,
+    get_file_modification_date,
+)
+
+
+def _commit(path, message: str, day: int) -> None:
+    _git(path, "add", "-A")
+    _git(path, "commit", "-q", "-m", message, date=f"2023-01-{day:02d}T10:00:00Z")
+
+
+@pytest.fixture(scope="module")
+def repo(tmp_path_factory):
+    """A repository with edits, a rename, a merge and paths with spaces."""
+    path = tmp_path_factory.mktemp("history")
+    _git(path, "init", "-q", "-b", "main")
+    _git(path, "config", "user.email", "tests@example.com")
+    _git(path, "config", "user.name", "tests")
+
+    docs = path / "docs"
+    docs.mkdir()
+    (docs / "MS-M9000 Mitigation 0.md").write_text("first\n", encoding="utf-8")
+    (docs / "old name.md").write_text("a document\n" * 20, encoding="utf-8")
+    (path / "LICENSE").write_text("MIT\n", encoding="utf-8")
+    _commit(path, "documents", 1)
+
+    (docs / "MS-M9000 Mitigation 0.md").write_text("second\n", encoding="utf-8")
+    _commit(path, "edit", 2)
+
+    _git(path, "checkout", "-q", "-b", "topic")
+    (docs / "Technique 1.md").write_text("from a branch\n", encoding="utf-8")
+    _commit(path, "branch", 3)
+    _git(path, "checkout", "-q", "main")
+    _git(path, "mv", "docs/old name.md", "docs/new name.md")
+    _commit(path, "rename", 4)
+    _git(
+        path,
+        "merge",
+        "-q",
+        "--no-ff",
+        "-m",
+        "merge",
+        "topic",
+        date="2023-01-05T10:00:00Z",
+    )
+    return path
+
+
+def _day(day: int) -> datetime:
+    return datetime.fromisoformat(f"2023-01-{day:02d}T10:00:00+00:00")
+
+
+def test_dates_match_the_per_file_walks(repo):
+    history = GitHistoryIndex(repo_path=repo)
+    for name in ("LICENSE", "docs/MS-M9000 Mitigation 0.md", "docs/Technique 1.md"):
+        path = repo / name
+        assert history.get_file_creation_date(path) == get_file_creation_date(
+            repo, str(path)
+        ), name
+        assert history.get_file_modification_date(path) == get_file_modification_date(
+            repo, str(path)
+        ), name
+
+
+def test_paths_with_spaces(repo):
+    history = GitHistoryIndex(repo_path=repo)
+    path = repo / "docs" / "MS-M9000 Mitigation 0.md"
+    assert history.get_file_creation_date(path) == _day(1)
+    assert history.get_file_modification_date(path) == _day(2)
+
+
+def test_renames_keep_the_creation_date(repo):
+    history = GitHistoryIndex(repo_path=repo)
+    path = repo / "docs" / "new name.md"
+    assert history.get_file_creation_date(path) == _day(1)
+    assert history.get_file_modification_date(path) == _day(4)
+    assert history.get_file_creation_date(repo / "docs" / "missing.md") is None
+
+
+def test_merged_branches(repo):
+    history = GitHistoryIndex(repo_path=repo)
+    path = repo / "docs" / "Technique 1.md"
+    assert history.get_file_creation_date(path) == _day(3)
+    assert history.get_file_modification_date(path) == _day(3)
+
+
+def test_older_revisions(repo):
+    history = GitHistoryIndex(repo_path=repo, rev="main~1")
+    assert history.get_file_modification_date(repo / "docs" / "new name.md") == _day(4)
+    assert history.get_file_creation_date(repo / "docs" / "Technique 1.md") is None
+
+
+def test_savings_are_only_estimated_on_demand(repo, caplog, monkeypatch):
+    history = GitHistoryIndex(repo_path=repo)
+    history.get_file_creation_date(repo / "LICENSE")
+    walks = []
+    monkeypatch.setattr(
+        "git_tools.get_file_modification_date", lambda *args: walks.append(args)
+    )
+
+    with caplog.at_level(logging.INFO, logger="git_tools"):
+        history.log_savings()
+    assert not walks
+
+    with caplog.at_level(logging.DEBUG, logger="git_tools"):
+        history.log_savings()
+    assert len(walks) == 1
+    assert "saving about" in caplog.text
+
+
+def test_log_of_a_newer_commit_gives_the_same_dates(repo):
+    log = GitLog(repo_path=repo)
+    assert len(log.commits) == 5
+    for sha, *_ in log.commits:
+        replayed = GitHistoryIndex(repo_path=repo, rev=sha, log=log)
+        logged = GitHistoryIndex(repo_path=repo, rev=sha)
+        assert replayed._dates == logged._dates, sha
+        assert replayed.commits == logged.commits, sha
+
+
+def test_log_without_the_commit_is_not_used(repo):
+    log = GitLog(repo_path=repo, rev="main~1")
+    history = GitHistoryIndex(repo_path=repo, rev="main", log=log)
+    assert history.get_file_creation_date(repo / "docs" / "Technique 1.md") == _day(3)
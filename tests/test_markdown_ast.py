@@ -0,0 +1,86 @@
+import pytest
+from marko.ext.gfm import gfm
+
+from markdown_ast import UnsupportedMarkup, _walk, parse_document, parse_document_html
+
+TECHNIQUE = """# Exec into container
+
+!!! info inline end
+
+ID: MS-TA9001<br>
+Tactic: [Execution](../tactics/Execution/index.md)<br>
+MITRE technique: [T1609](https://attack.mitre.org/techniques/T1609/)
+
+Attackers can run `kubectl exec` inside a pod, then `sh -c` in it.
+
+Second paragraph with &amp; entities, ’quotes’ and unicode é.
+"""
+
+LISTS = """# Mitigations
+
+- first item with [a link](https://example.com)
+- second item with `code`
+
+1. ordered
+2. list
+
+Paragraph after the lists.
+"""
+
+TABLE = """# Mitigation
+
+ID: MS-M9001<br>
+MITRE mitigation: [M1035](https://attack.mitre.org/mitigations/M1035/)
+
+## Techniques Addressed by Mitigation
+
+| ID | Name | Use |
+|--|--|--|
+| [MS-TA9001](../techniques/Exec%20into%20container.md) | Exec into container | Restrict `exec`. |
+| [MS-TA9002](x) | Bash or cmd | Two<br>lines |
+"""
+
+INLINE_HTML = """# Technique
+
+ID: MS-TA9003<br>
+Tactic: <b>Persistence</b>
+
+Attackers <span class="x">hide</span> things.
+"""
+
+HTML_BLOCK = """# Technique
+
+<div>
+a raw block
+</div>
+
+After the block.
+"""
+
+LINKS = """# Links
+
+See <https://example.com/auto> and [the docs](https://example.com/docs "title").
+A soft break
+in the same paragraph.
+"""
+
+
+@pytest.mark.parametrize(
+    "content",
+    [TECHNIQUE, LISTS, TABLE, INLINE_HTML, HTML_BLOCK, LINKS],
+    ids=["code-spans-br", "lists", "table", "inline-html", "html-block", "links"],
+)
+def test_ast_matches_html_round_trip(content):
+    assert parse_document(content) == parse_document_html(content)
+
+
+@pytest.mark.parametrize("content", [INLINE_HTML, HTML_BLOCK])
+def test_raw_html_falls_back(content):
+    with pytest.raises(UnsupportedMarkup):
+        _walk(gfm.parse(content))
+
+
+def test_br_is_supported():
+    document = _walk(gfm.parse(TECHNIQUE))
+    assert document.headings[0].value == "Exec into container"
+    assert document.paragraphs[2].codes == ["kubectl exec", "sh -c"]
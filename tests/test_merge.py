@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+from bundle_check import check_bundle
+from bundle_io import iter_bundle_objects
+from merge import merge_bundles
+
+TMFK = Path(__file__).parent.parent / "build" / "tmfk_attack_compatible.json"
+
+ATTACK_TECHNIQUE = {
+    "type": "attack-pattern",
+    "spec_version": "2.1",
+    "id": "attack-pattern--56e0d8b8-3e25-49dd-9050-3aa2b5a2b7c1",
+    "created": "2021-03-31T00:00:00.000Z",
+    "modified": "2023-04-15T00:00:00.000Z",
+    "name": "Deploy Container",
+    "external_references": [{"source_name": "mitre-attack", "external_id": "T1610"}],
+}
+MARKING = {
+    "type": "marking-definition",
+    "spec_version": "2.1",
+    "id": "marking-definition--fa42a846-8d90-4e51-bc29-71d5b4802168",
+    "definition_type": "statement",
+    "definition": {"statement": "Copyright"},
+}
+# Names a TMFK id in x_mitre_ids: TMFK objects are not ATT&CK objects.
+CUSTOM = {
+    "type": "attack-pattern",
+    "spec_version": "2.1",
+    "id": "attack-pattern--9d2a3c1e-5b6f-4a7d-8e9f-0a1b2c3d4e5f",
+    "created": "2024-01-01T00:00:00.000Z",
+    "modified": "2024-01-01T00:00:00.000Z",
+    "name": "Custom technique",
+    "external_references": [{"source_name": "custom", "external_id": "C-1"}],
+    "x_mitre_ids": ["MS-TA9020"],
+}
+
+
+def _write(path: Path, objects: list[dict]) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "bundle", "id": "bundle--1", "objects": objects}, f)
+    return path
+
+
+def test_merge_with_attack(tmp_path):
+    attack = _write(tmp_path / "attack.json", [ATTACK_TECHNIQUE, MARKING, CUSTOM])
+    output = tmp_path / "merged.json"
+    merge_bundles([TMFK, attack], output)
+
+    objects = {obj["id"]: obj for obj in iter_bundle_objects(output)}
+    assert MARKING["id"] in objects
+    tmfk_ids = {obj["id"] for obj in iter_bundle_objects(TMFK)}
+    related = [
+        obj
+        for obj in objects.values()
+        if obj["type"] == "relationship" and obj["relationship_type"] == "related-to"
+    ]
+    assert related
+    assert {obj["target_ref"] for obj in related} == {ATTACK_TECHNIQUE["id"]}
+    assert not {obj["source_ref"] for obj in related} - tmfk_ids
+    # The marking definition has no created nor modified, as in its bundle.
+    errors = check_bundle(output)
+    assert [error for error in errors if not error.startswith(MARKING["id"])] == []
+
+
+def test_undated_duplicates_keep_the_first(tmp_path):
+    first = _write(tmp_path / "first.json", [MARKING])
+    second = _write(
+        tmp_path / "second.json",
+        [{**MARKING, "definition": {"statement": "Other"}}],
+    )
+    output = tmp_path / "merged.json"
+    merge_bundles([first, second], output)
+    markings = [
+        obj
+        for obj in iter_bundle_objects(output)
+        if obj["type"] == "marking-definition"
+    ]
+    assert markings == [MARKING]
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+import metrics
+from cli import main
+from parse import list_documents
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    """The recorder of the process, disabled and emptied for the test."""
+    for name, value in vars(metrics.Metrics()).items():
+        monkeypatch.setattr(metrics.METRICS, name, value)
+    return metrics.METRICS
+
+
+def _build(upstream, tmp_path, index_path, *options: str) -> int:
+    return main(
+        [
+            "build",
+            *options,
+            "--no-cache",
+            "--upstream",
+            str(upstream),
+            "--out",
+            str(tmp_path / "out"),
+            "--index",
+            str(index_path),
+        ]
+    )
+
+
+def test_nothing_is_recorded_by_default(recorder, upstream, tmp_path, index_path):
+    assert _build(upstream, tmp_path, index_path) == 0
+    assert not recorder.enabled
+    assert recorder.events == []
+    assert not recorder.counters
+    assert not recorder.files
+    assert metrics.span("disabled", "test") is metrics._DISABLED
+
+
+def test_trace_of_a_parallel_build(recorder, upstream, tmp_path, index_path):
+    trace_path = tmp_path / "trace.json"
+    metrics_path = tmp_path / "metrics.json"
+    options = ["--trace", str(trace_path), "--metrics", str(metrics_path)]
+    assert _build(upstream, tmp_path, index_path, *options, "--workers", "2") == 0
+
+    with open(trace_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    names = {event["name"] for event in spans}
+    assert {"imports", "read upstream", "bundle", "index", "git log"} <= names
+    assert all(event["dur"] >= 0 and event["ts"] >= 0 for event in spans)
+
+    extracts = [event for event in spans if event["name"] == "extract"]
+    assert len(extracts) == len(list_documents(upstream))
+    assert {event["pid"] for event in extracts} - {os.getpid()}
+    assert all(event["args"]["file"].endswith(".md") for event in extracts)
+
+    with open(metrics_path, encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["spans"]["extract"]["count"] == len(extracts)
+    assert summary["counters"]["git history lookups"] > 0
+    assert any(values.get("bytes") for values in summary["files"].values())
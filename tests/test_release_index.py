@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+import shutil
+
+import pytest
+
+from conftest import REPO_PATH
+from release_index import check_compressions, regenerate_index, zstandard
+
+
+@pytest.fixture
+def build_path(tmp_path):
+    """The versioned bundles of the build folder of the repository."""
+    path = tmp_path / "build"
+    path.mkdir()
+    for bundle in (REPO_PATH / "build").glob("tmfk_*_*.json"):
+        shutil.copyfile(bundle, path / bundle.name)
+    return path
+
+
+def local_versions(index: dict, build_path) -> list[tuple[dict, object]]:
+    return [
+        (version, build_path / version["url"].rpartition("/")[2])
+        for entry in index["collections"]
+        for version in entry["versions"]
+        if (build_path / version["url"].rpartition("/")[2]).exists()
+    ]
+
+
+def test_versions_match_their_bundles(index_path, build_path):
+    index = regenerate_index(index_path, build_path, ["gz"])
+    versions = local_versions(index, build_path)
+    assert len(versions) == 2
+    for version, path in versions:
+        data = path.read_bytes()
+        assert version["sha256"] == hashlib.sha256(data).hexdigest()
+        assert version["size"] == path.stat().st_size == len(data)
+        assert version["objects"] == len(json.loads(data)["objects"]) == 193
+
+        compressed = version["compressed"]["gzip"]
+        archive = path.with_name(f"{path.name}.gz")
+        assert compressed["url"].endswith(f"/{archive.name}")
+        assert compressed["size"] == archive.stat().st_size
+        assert compressed["sha256"] == hashlib.sha256(archive.read_bytes()).hexdigest()
+        assert gzip.decompress(archive.read_bytes()) == data
+
+    with open(index_path, encoding="utf-8") as f:
+        assert json.load(f) == index
+
+
+def test_regeneration_is_stable(index_path, build_path):
+    first = regenerate_index(index_path, build_path, ["gz"])
+    written = index_path.read_bytes()
+    assert regenerate_index(index_path, build_path, ["gz"]) == first
+    assert index_path.read_bytes() == written
+
+
+def test_matches_the_committed_index(index_path, build_path):
+    with open(REPO_PATH / "index.json", encoding="utf-8") as f:
+        committed = json.load(f)
+    assert regenerate_index(index_path, build_path) == committed
+
+
+def test_deltas_are_listed(index_path, build_path):
+    delta = build_path / "tmfk_strict_aaaaaaa_b885d18.delta.json"
+    delta.write_text("{}", encoding="utf-8")
+    index = regenerate_index(index_path, build_path)
+    deltas = {
+        path.name: version.get("delta")
+        for version, path in local_versions(index, build_path)
+    }
+    assert deltas["tmfk_strict_b885d18.json"]["url"].endswith(f"/{delta.name}")
+    assert deltas["tmfk_strict_b885d18.json"]["from"].endswith(
+        "/tmfk_strict_aaaaaaa.json"
+    )
+    assert deltas["tmfk_attack_compatible_b885d18.json"] is None
+
+
+@pytest.mark.skipif(zstandard is not None, reason="zstandard is installed")
+def test_zst_needs_zstandard(index_path, build_path):
+    with pytest.raises(RuntimeError):
+        check_compressions(["zst"])
+    with pytest.raises(RuntimeError):
+        regenerate_index(index_path, build_path, ["zst"])
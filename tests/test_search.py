@@ -0,0 +1,147 @@
+import pytest
+
+from git_tools import RepoContext
+from parse import read_tmfk, search_documents
+from search import SearchIndex, build_search_index, tokenize, write_search_index
+
+
+def _document(tmfk_id: str, name: str, description: str, **properties) -> dict:
+    return {
+        "id": f"attack-pattern--{tmfk_id}",
+        "tmfk_id": tmfk_id,
+        "type": "attack-pattern",
+        "name": name,
+        "description": description,
+        "attack_ids": [],
+        **properties,
+    }
+
+
+@pytest.fixture(scope="module")
+def index(fixture_build) -> SearchIndex:
+    return SearchIndex.from_file(fixture_build / "tmfk_search.json")
+
+
+def _ids(results: list[tuple]) -> list[str]:
+    return [document["tmfk_id"] for _, document in results]
+
+
+def test_tokenize():
+    assert tokenize("MS-TA9001 uses T1078.004, ’quoted’") == [
+        "ms",
+        "ta9001",
+        "uses",
+        "t1078",
+        "004",
+        "quoted",
+    ]
+
+
+def test_build_writes_the_index(upstream, fixture_build, index, tmp_path):
+    repo = RepoContext(upstream)
+    try:
+        model = read_tmfk(repo)
+    finally:
+        repo.close()
+    path = tmp_path / "tmfk_search.json"
+    write_search_index(path, build_search_index(search_documents(model)))
+    assert path.read_bytes() == (fixture_build / "tmfk_search.json").read_bytes()
+    assert len(index.documents) == len(model.techniques) + len(model.mitigations) + sum(
+        map(len, model.mitigation_folders)
+    )
+
+
+def test_words(index):
+    assert _ids(index.search("kubectl")) == ["MS-TA9000", "MS-TA9003"]
+    assert sorted(_ids(index.search("T1078.004"))) == ["MS-TA9001", "MS-TA9004"]
+    assert _ids(index.search("MS-M9000.001"))[0] == "MS-M9000.001"
+    assert index.search("nothing matches this") == []
+
+
+def test_ranking(index):
+    results = index.search("technique 1")
+    assert _ids(results)[0] == "MS-TA9001"
+    scores = [score for score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+    assert _ids(index.search("technique 1", limit=2)) == _ids(results)[:2]
+
+
+def test_scores_add_up(index):
+    (both,) = [
+        s for s, d in index.search("kubectl pods") if d["tmfk_id"] == "MS-TA9000"
+    ]
+    (kubectl,) = [s for s, d in index.search("kubectl") if d["tmfk_id"] == "MS-TA9000"]
+    (pods,) = [s for s, d in index.search("pods") if d["tmfk_id"] == "MS-TA9000"]
+    assert both == pytest.approx(kubectl + pods)
+
+
+def test_fields_are_weighted():
+    documents = [
+        _document("MS-TA9000", "Other", "A pod."),
+        _document("MS-TA9001", "Pod", "Other."),
+        _document("MS-TA9002", "Other", "Other."),
+        _document("MS-TA9003", "Other", "Other.", attack_ids=["POD"]),
+    ]
+    index = SearchIndex(build_search_index(documents))
+    assert _ids(index.search("pod")) == ["MS-TA9003", "MS-TA9001", "MS-TA9000"]
+
+
+def test_term_frequency_and_length():
+    documents = [
+        _document("MS-TA9000", "Other", "Pod with other words around it."),
+        _document("MS-TA9001", "Other", "Pod pod with other words around."),
+        _document("MS-TA9002", "Other", "Pod."),
+        _document("MS-TA9003", "Other", "Other."),
+    ]
+    index = SearchIndex(build_search_index(documents))
+    assert _ids(index.search("pod")) == ["MS-TA9002", "MS-TA9001", "MS-TA9000"]
+
+
+def test_ties_keep_the_document_order(index):
+    results = index.search("restricts")
+    assert _ids(results) == ["MS-M9000", "MS-M9001"]
+    assert results[0][0] == results[1][0]
+    assert _ids(index.search("limits")) == ["MS-M9003"]
+
+
+def test_phrases(index):
+    assert _ids(index.search('"run kubectl"')) == ["MS-TA9000", "MS-TA9003"]
+    assert index.search('"kubectl run"') == []
+    assert _ids(index.search('"sentence two" technique 1'))[0] == "MS-TA9001"
+    assert "MS-M9001" not in _ids(index.search('"sentence two" technique 1'))
+    assert _ids(index.search('"Technique 4"')) == ["MS-TA9004"]
+    assert _ids(index.search('"technique 0" "then foohappens"')) == ["MS-TA9000"]
+
+
+def test_phrases_stay_in_one_field():
+    documents = [
+        _document("MS-TA9000", "Exposed", "Dashboard."),
+        _document("MS-TA9001", "Other", "Exposed dashboard."),
+    ]
+    index = SearchIndex(build_search_index(documents))
+    assert _ids(index.search("exposed dashboard")) == ["MS-TA9000", "MS-TA9001"]
+    assert _ids(index.search('"exposed dashboard"')) == ["MS-TA9001"]
+
+
+def test_type_filter(index):
+    mitigations = index.search("MS", limit=100, type="course-of-action")
+    assert sorted(_ids(mitigations)) == [
+        "MS-M9000",
+        "MS-M9000.001",
+        "MS-M9001",
+        "MS-M9003",
+    ]
+    techniques = index.search("MS", limit=100, type="attack-pattern")
+    assert sorted(_ids(techniques)) == [
+        "MS-TA9000",
+        "MS-TA9001",
+        "MS-TA9003",
+        "MS-TA9004",
+    ]
+    assert index.search("kubectl", type="course-of-action") == []
+    assert index.search("MS", limit=100, type="x-mitre-tactic") == []
+
+
+def test_unsupported_version():
+    with pytest.raises(ValueError, match="version"):
+        SearchIndex({"version": 0, "documents": [], "scores": {}, "positions": {}})
@@ -0,0 +1,118 @@
+import json
+import logging
+import shutil
+from datetime import datetime, timezone
+
+import pytest
+
+from bundle_io import BundleWriter
+from serialization import SerializationCache, canonical_json
+from stix2.v21 import Identity
+from watch import WatchedBuild, poll
+
+CREATED = datetime(2022, 10, 20, 8, tzinfo=timezone.utc)
+TECHNIQUE = "docs/techniques/Technique 1.md"
+
+
+def _identity(**properties) -> Identity:
+    return Identity(
+        id="identity--00000000-0000-4000-8000-000000000000",
+        name="Microsoft",
+        identity_class="organization",
+        created=CREATED,
+        modified=CREATED,
+        **properties,
+    )
+
+
+def test_equal_objects_serialize_the_same():
+    first = _identity(description="Creator", labels=["b", "a"])
+    second = _identity(labels=["b", "a"], description="Creator")
+    assert first is not second
+    assert canonical_json(first) == canonical_json(second)
+    assert canonical_json(first) == canonical_json(json.loads(canonical_json(second)))
+
+
+def test_layout():
+    serialized = canonical_json(_identity(description="Créateur"))
+    decoded = json.loads(serialized)
+    assert list(decoded) == sorted(decoded)
+    assert decoded["created"] == "2022-10-20T08:00:00.000Z"
+    assert decoded["spec_version"] == "2.1"
+    assert '\n    "description": "Cr\\u00e9ateur",\n' in serialized
+
+
+@pytest.mark.parametrize("name", ["tmfk_strict.json", "tmfk_attack_compatible.json"])
+def test_bundles_are_canonical(fixture_build, tmp_path, name):
+    """Objects read back from a bundle serialize to the bytes of the bundle."""
+    path = fixture_build / name
+    with open(path, encoding="utf-8") as f:
+        bundle = json.load(f)
+    rewritten = tmp_path / name
+    with open(rewritten, "w", encoding="utf-8") as f:
+        with BundleWriter(f, bundle_id=bundle["id"]) as writer:
+            for obj in bundle["objects"]:
+                writer.write_serialized(canonical_json(obj))
+    assert rewritten.read_bytes() == path.read_bytes()
+
+
+def test_text_is_reused():
+    cache = SerializationCache()
+    identity = _identity()
+    serialized = cache.serialize(identity)
+    assert serialized == canonical_json(identity)
+    assert cache.serialize(identity) is serialized
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    # Entries are keyed by identity: an equal object is serialized again.
+    assert cache.serialize(_identity()) == serialized
+    assert (cache.misses, cache.hits) == (2, 1)
+
+
+def test_log_stats(caplog):
+    cache = SerializationCache()
+    identity = _identity()
+    for _ in range(3):
+        cache.serialize(identity)
+    with caplog.at_level(logging.INFO, logger="serialization"):
+        cache.log_stats()
+    assert "Serialized 1 objects, reused 2 serializations" in caplog.text
+
+
+def test_prune_forgets_unused_objects():
+    cache = SerializationCache()
+    kept, dropped = _identity(), _identity(description="Dropped")
+    kept_text = cache.serialize(kept)
+    cache.serialize(dropped)
+    cache.prune()
+    assert len(cache._entries) == 2
+
+    assert cache.serialize(kept) is kept_text
+    cache.prune()
+    assert [entry[0] for entry in cache._entries.values()] == [kept]
+
+    cache.prune()
+    assert cache._entries == {}
+
+
+def test_watch_prunes_replaced_objects(upstream, tmp_path):
+    checkout = tmp_path / "upstream"
+    shutil.copytree(upstream, checkout)
+    output_path = tmp_path / "watched"
+    output_path.mkdir()
+    build = WatchedBuild(tmfk_path=checkout, output_path=output_path)
+    documents = poll(build, {})
+    serializer = build.serializer
+    entries = len(serializer._entries)
+    assert entries == serializer.misses
+
+    for i in range(3):
+        document = checkout / TECHNIQUE
+        document.write_text(
+            document.read_text(encoding="utf-8") + f"\nEdit {i}.\n", encoding="utf-8"
+        )
+        hits, misses = serializer.hits, serializer.misses
+        documents = poll(build, documents)
+        assert serializer.hits > hits
+        assert 0 < serializer.misses - misses < entries
+        assert len(serializer._entries) == entries
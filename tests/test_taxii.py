@@ -0,0 +1,187 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import REPO_PATH
+from taxii import API_ROOT, TaxiiStore, start_server
+
+STRICT_ID = "8702c9a3-cf7b-4e79-99e2-191d79c6042b"
+ROOT = f"/{API_ROOT}/collections/{STRICT_ID}"
+
+
+@pytest.fixture(scope="module")
+def store() -> TaxiiStore:
+    return TaxiiStore.from_index(REPO_PATH / "index.json", REPO_PATH / "build")
+
+
+@pytest.fixture(scope="module")
+def bundle() -> list[dict]:
+    """Objects of the strict bundle served by ``store``."""
+    with open(REPO_PATH / "build" / "tmfk_strict_b885d18.json", encoding="utf-8") as f:
+        return json.load(f)["objects"]
+
+
+def get(store: TaxiiStore, target: str) -> tuple[int, dict]:
+    response = store.handle(target)
+    return response.status, json.loads(response.body)
+
+
+def get_all(store: TaxiiStore, target: str) -> list[dict]:
+    """Objects of every page of ``target``, following the ``next`` cursors."""
+    objects = []
+    separator = "&" if "?" in target else "?"
+    status, body = get(store, target)
+    while True:
+        assert status == 200
+        objects += body["objects"]
+        if not body["more"]:
+            return objects
+        status, body = get(store, f"{target}{separator}next={body['next']}")
+
+
+def added(obj: dict) -> datetime:
+    return datetime.fromisoformat(obj.get("modified", obj.get("created")))
+
+
+def test_discovery_and_collections(store):
+    assert get(store, "/taxii2/")[1]["default"] == f"/{API_ROOT}/"
+    status, body = get(store, f"/{API_ROOT}/collections/")
+    assert status == 200
+    assert STRICT_ID in {collection["id"] for collection in body["collections"]}
+    assert get(store, f"{ROOT}/")[1]["id"] == STRICT_ID
+
+
+def test_pages_cover_the_collection_once(store, bundle):
+    objects = get_all(store, f"{ROOT}/objects/?limit=7")
+    assert len(objects) == len(bundle)
+    assert {obj["id"] for obj in objects} == {obj["id"] for obj in bundle}
+
+    status, body = get(store, f"{ROOT}/objects/?limit=7")
+    assert body["more"] and len(body["objects"]) == 7
+    assert body["next"].startswith("b885d18.")
+
+
+def test_filters(store, bundle):
+    objects = get_all(store, f"{ROOT}/objects/?match[type]=course-of-action&limit=5")
+    assert sorted(obj["id"] for obj in objects) == sorted(
+        obj["id"] for obj in bundle if obj["type"] == "course-of-action"
+    )
+
+    ids = sorted(obj["id"] for obj in bundle)[:3]
+    objects = get_all(store, f"{ROOT}/objects/?match[id]={','.join(ids)}&limit=2")
+    assert sorted(obj["id"] for obj in objects) == ids
+
+    status, body = get(store, f"{ROOT}/objects/{ids[0]}/")
+    assert status == 200
+    assert [obj["id"] for obj in body["objects"]] == [ids[0]]
+
+    manifest = get_all(store, f"{ROOT}/manifest/?match[type]=x-mitre-tactic")
+    assert len(manifest) == sum(obj["type"] == "x-mitre-tactic" for obj in bundle)
+
+
+def test_added_after(store, bundle):
+    middle = sorted(added(obj) for obj in bundle)[len(bundle) // 2]
+    after = middle.isoformat().replace("+00:00", "Z")
+    objects = get_all(store, f"{ROOT}/objects/?added_after={after}&limit=10")
+    assert sorted(obj["id"] for obj in objects) == sorted(
+        obj["id"] for obj in bundle if added(obj) > middle
+    )
+
+    response = store.handle(f"{ROOT}/objects/?added_after={after}&limit=1")
+    assert (
+        datetime.fromisoformat(dict(response.headers)["X-TAXII-Date-Added-First"])
+        > middle
+    )
+
+
+@pytest.mark.parametrize("after", ["2024-01-01", "2024-01-01T00:00:00"])
+def test_added_after_without_offset_is_utc(store, bundle, after):
+    objects = get_all(store, f"{ROOT}/objects/?added_after={after}")
+    limit = datetime.fromisoformat(after).replace(tzinfo=timezone.utc)
+    assert len(objects) == sum(added(obj) > limit for obj in bundle)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "added_after=yesterday",
+        "limit=0",
+        "limit=-3",
+        "limit=ten",
+        "next=zz",
+        "next=0000000.1",
+    ],
+)
+def test_bad_requests(store, query):
+    status, body = get(store, f"{ROOT}/objects/?{query}")
+    assert status == 400
+    assert body["http_status"] == "400"
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "/nowhere/",
+        f"/{API_ROOT}/collections/{STRICT_ID}/status/",
+        f"/{API_ROOT}/collections/00000000-0000-0000-0000-000000000000/objects/",
+        f"{ROOT}/objects/attack-pattern--00000000-0000-0000-0000-000000000000/",
+    ],
+)
+def test_not_found(store, target):
+    assert get(store, target)[0] == 404
+
+
+async def raw(store: TaxiiStore, request: bytes) -> bytes:
+    """Bytes answered by a server on a free port to the raw ``request``."""
+    server = await start_server(store)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+    return data
+
+
+def responses(data: bytes) -> list[tuple[str, dict, bytes]]:
+    """Status line, headers and body of the responses of ``data``."""
+    parsed = []
+    while data:
+        head, _, data = data.partition(b"\r\n\r\n")
+        status, *lines = head.decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in lines)
+        length = int(headers["Content-Length"])
+        parsed.append((status, headers, data[:length]))
+        data = data[length:]
+    return parsed
+
+
+def test_server_keeps_the_connection_alive(store):
+    request = (
+        b"GET /taxii2/ HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        + f"GET {ROOT}/objects/?added_after=2024-01-01 HTTP/1.1\r\n\r\n".encode()
+        + f"GET {ROOT}/objects/?limit=x HTTP/1.1\r\n\r\n".encode()
+        + b"POST /taxii2/ HTTP/1.1\r\nConnection: close\r\n\r\n"
+    )
+    answers = responses(asyncio.run(raw(store, request)))
+    assert [status for status, _, _ in answers] == [
+        "HTTP/1.1 200 OK",
+        "HTTP/1.1 200 OK",
+        "HTTP/1.1 400 Bad Request",
+        "HTTP/1.1 405 Method Not Allowed",
+    ]
+    assert json.loads(answers[0][2])["default"] == f"/{API_ROOT}/"
+    assert answers[-1][1]["Connection"] == "close"
+
+
+def test_server_head_has_no_body(store):
+    expected = store.handle(f"{ROOT}/objects/").body
+    request = f"HEAD {ROOT}/objects/ HTTP/1.1\r\nConnection: close\r\n\r\n"
+    data = asyncio.run(raw(store, request.encode()))
+    head, _, body = data.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert f"Content-Length: {len(expected)}".encode() in head.split(b"\r\n")
+    assert body == b""
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from tmfk_index import TmfkIndex, get_external_id
+
+
+@pytest.fixture(scope="module")
+def objects(fixture_build) -> list[dict]:
+    path = fixture_build / "tmfk_attack_compatible.json"
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["objects"]
+
+
+@pytest.fixture(scope="module")
+def index(fixture_build) -> TmfkIndex:
+    return TmfkIndex.from_file(fixture_build / "tmfk_attack_compatible.json")
+
+
+def _ids(objects: list[dict]) -> list[str]:
+    return sorted(obj["id"] for obj in objects)
+
+
+def test_ids_and_external_ids(index, objects):
+    for obj in objects:
+        assert index.get(obj["id"]) == obj
+    technique = index.get_by_external_id("MS-TA9001")
+    assert technique["type"] == "attack-pattern"
+    assert get_external_id(technique) == "MS-TA9001"
+    assert index.get_by_external_id("MS-M9000.001")["type"] == "course-of-action"
+    assert get_external_id(index.get_by_external_id("MS-T0100")) == "MS-T0100"
+    assert index.get_by_external_id("MS-TA0000") is None
+    assert index.get("attack-pattern--00000000-0000-0000-0000-000000000000") is None
+
+
+def test_tactics(index):
+    assert get_external_id(index.get_tactic("initial-access")) == "MS-T0100"
+    assert index.get_tactic("reconnaissance") is None
+    assert [get_external_id(t) for t in index.get_techniques_by_tactic("impact")] == [
+        "MS-TA9000"
+    ]
+    assert index.get_techniques_by_tactic("discovery") == []
+
+
+def test_attack_ids(index):
+    assert sorted(
+        get_external_id(obj) for obj in index.get_by_attack_id("T1078.004")
+    ) == ["MS-TA9001", "MS-TA9004"]
+    assert [get_external_id(obj) for obj in index.get_by_attack_id("M1035")] == [
+        "MS-M9000"
+    ]
+    assert index.get_by_attack_id("T0000") == []
+
+
+def test_relationships(index, objects):
+    relationships = [obj for obj in objects if obj["type"] == "relationship"]
+    technique = index.get_by_external_id("MS-TA9001")["id"]
+    mitigation = index.get_by_external_id("MS-M9000")["id"]
+
+    assert _ids(index.get_relationships(target_ref=technique)) == _ids(
+        r for r in relationships if r["target_ref"] == technique
+    )
+    assert _ids(index.get_relationships(source_ref=mitigation)) == _ids(
+        r for r in relationships if r["source_ref"] == mitigation
+    )
+    assert _ids(index.get_relationships(mitigation, technique)) == _ids(
+        r
+        for r in relationships
+        if r["source_ref"] == mitigation and r["target_ref"] == technique
+    )
+    assert index.get_relationships(technique, mitigation) == []
+
+    assert sorted(get_external_id(m) for m in index.get_mitigations(technique)) == [
+        "MS-M9000",
+        "MS-M9003",
+    ]
+    assert sorted(
+        get_external_id(t) for t in index.get_mitigated_techniques(mitigation)
+    ) == ["MS-TA9001", "MS-TA9004"]
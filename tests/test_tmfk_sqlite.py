@@ -0,0 +1,62 @@
+import pytest
+
+from constants import Mode
+from tmfk_index import TmfkIndex
+from tmfk_sqlite import TmfkDatabase, write_sqlite
+
+
+def _ids(objects: list[dict]) -> list[str]:
+    return sorted(obj["id"] for obj in objects)
+
+
+@pytest.mark.parametrize("mode", [mode.name.lower() for mode in Mode])
+def test_queries_match_the_index(fixture_build, mode):
+    index = TmfkIndex.from_file(fixture_build / f"tmfk_{mode}.json")
+    with TmfkDatabase(fixture_build / f"tmfk_{mode}.sqlite") as database:
+        for stix_id, obj in index.by_id.items():
+            assert database.get(stix_id) == obj
+        for external_id, obj in index.by_external_id.items():
+            assert database.get_by_external_id(external_id) == obj
+        assert database.get("identity--00000000-0000-0000-0000-000000000000") is None
+
+        for shortname in index.tactics:
+            assert database.get_tactic(shortname) == index.get_tactic(shortname)
+            assert _ids(database.get_techniques_by_tactic(shortname)) == _ids(
+                index.get_techniques_by_tactic(shortname)
+            )
+        for attack_id in [*index.by_attack_id, "T0000"]:
+            assert _ids(database.get_by_attack_id(attack_id)) == _ids(
+                index.get_by_attack_id(attack_id)
+            )
+
+        relationships = [
+            obj for obj in index.by_id.values() if obj["type"] == "relationship"
+        ]
+        assert relationships
+        for relationship in relationships:
+            source, target = relationship["source_ref"], relationship["target_ref"]
+            assert _ids(database.get_relationships(source_ref=source)) == _ids(
+                index.get_relationships(source_ref=source)
+            )
+            assert _ids(database.get_relationships(target_ref=target)) == _ids(
+                index.get_relationships(target_ref=target)
+            )
+            assert _ids(database.get_relationships(source, target)) == _ids(
+                index.get_relationships(source, target)
+            )
+            assert _ids(database.get_mitigations(target)) == _ids(
+                index.get_mitigations(target)
+            )
+            assert _ids(database.get_mitigated_techniques(source)) == _ids(
+                index.get_mitigated_techniques(source)
+            )
+
+
+def test_rewrite_replaces_the_file(fixture_build, tmp_path):
+    index = TmfkIndex.from_file(fixture_build / "tmfk_strict.json")
+    path = tmp_path / "tmfk.sqlite"
+    write_sqlite(path, [])
+    write_sqlite(path, index.by_id.values())
+    with TmfkDatabase(path) as database:
+        assert all(database.get(stix_id) == obj for stix_id, obj in index.by_id.items())
+    assert [p.name for p in tmp_path.iterdir()] == ["tmfk.sqlite"]
@@ -0,0 +1,72 @@
+import shutil
+
+import pytest
+
+import watch
+from parse import run_build
+from watch import RETRY, WatchedBuild, poll
+
+TECHNIQUE = "docs/techniques/Technique 1.md"
+BUNDLES = ["tmfk_strict.json", "tmfk_attack_compatible.json"]
+
+
+@pytest.fixture
+def checkout(upstream, tmp_path):
+    """A copy of ``upstream`` with its history, to edit documents in."""
+    path = tmp_path / "upstream"
+    shutil.copytree(upstream, path)
+    return path
+
+
+def _edit(path) -> None:
+    document = path / TECHNIQUE
+    document.write_text(
+        document.read_text(encoding="utf-8") + "\nA paragraph added in an edit.\n",
+        encoding="utf-8",
+    )
+
+
+def _assert_same_as_full_build(checkout, output_path, tmp_path, index_path) -> None:
+    full = tmp_path / "full"
+    run_build(
+        tmfk_path=checkout, output_path=full, index_path=index_path, use_cache=False
+    )
+    for name in BUNDLES:
+        assert (output_path / name).read_bytes() == (full / name).read_bytes(), name
+
+
+def test_edit_rebuilds_like_a_full_build(checkout, tmp_path, index_path):
+    output_path = tmp_path / "watched"
+    output_path.mkdir()
+    build = WatchedBuild(tmfk_path=checkout, output_path=output_path)
+    documents = poll(build, {})
+    before = (output_path / BUNDLES[0]).read_bytes()
+
+    _edit(checkout)
+    documents = poll(build, documents)
+    assert (output_path / BUNDLES[0]).read_bytes() != before
+    assert b"A paragraph added in an edit." in (output_path / BUNDLES[0]).read_bytes()
+    assert poll(build, documents) is documents
+    _assert_same_as_full_build(checkout, output_path, tmp_path, index_path)
+
+
+def test_failed_documents_are_retried(checkout, tmp_path, index_path, monkeypatch):
+    output_path = tmp_path / "watched"
+    output_path.mkdir()
+    build = WatchedBuild(tmfk_path=checkout, output_path=output_path)
+    documents = poll(build, {})
+
+    def fail(*args, **kwargs):
+        raise OSError("transient")
+
+    extract_documents = watch.extract_documents
+    monkeypatch.setattr(watch, "extract_documents", fail)
+    _edit(checkout)
+    documents = poll(build, documents)
+    changed = [path for path, stat in documents.items() if stat == RETRY]
+    assert len(changed) == 1 and changed[0].endswith("Technique 1.md")
+
+    monkeypatch.setattr(watch, "extract_documents", extract_documents)
+    documents = poll(build, documents)
+    assert RETRY not in documents.values()
+    _assert_same_as_full_build(checkout, output_path, tmp_path, index_path)